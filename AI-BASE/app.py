@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from fastapi import FastAPI, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
@@ -7,7 +8,21 @@ from dotenv import load_dotenv
 import uvicorn
 from services.scraper import WebScraper
 from services.ai_generator import AIGenerator
+from services.llm_cache import LLMResponseCache
+from services.llm_limiter import LLMRateLimiter
 from services.google_docs import GoogleDocsService
+from services.http_client import HttpClient
+from services.host_scheduler import HostScheduler
+from services.browser_pool import BrowserPool
+from services.page_loader import PageLoader
+from services.parse_pool import ParsePool
+from services.scrape_cache import ScrapeCache
+from services.site_profiles import SiteProfileStore
+from services.image_probe import ImageProber
+from services.image_dedup import ImageDeduplicator
+from services.subpage_crawler import SubpageCrawler
+from services.discovery import DiscoveryService
+from services.batch_generation import BatchGenerationService
 from models.article_request import ArticleRequest
 from models.article_response import ArticleResponse
 
@@ -20,10 +35,86 @@ app = FastAPI(title="アニメ記事生成支援サービス", version="1.0.0")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# サービスの初期化
-scraper = WebScraper()
-ai_generator = AIGenerator()
-google_docs = GoogleDocsService()
+# サービスの初期化（外部HTTP接続はスクレイパーと画像ダウンロードで共有）
+host_scheduler = HostScheduler()
+http_client = HttpClient(scheduler=host_scheduler)
+browser_pool = BrowserPool()
+page_loader = PageLoader()
+parse_pool = ParsePool()
+scrape_cache = ScrapeCache()
+site_profiles = SiteProfileStore()
+image_prober = ImageProber(http_client=http_client)
+image_deduplicator = ImageDeduplicator(http_client=http_client)
+subpage_crawler = SubpageCrawler()
+scraper = WebScraper(
+    http_client=http_client,
+    browser_pool=browser_pool,
+    page_loader=page_loader,
+    parse_pool=parse_pool,
+    scrape_cache=scrape_cache,
+    site_profiles=site_profiles,
+    image_prober=image_prober,
+    image_deduplicator=image_deduplicator,
+    subpage_crawler=subpage_crawler
+)
+llm_cache = LLMResponseCache()
+llm_limiter = LLMRateLimiter()
+ai_generator = AIGenerator(llm_cache=llm_cache, limiter=llm_limiter)
+google_docs = GoogleDocsService(http_client=http_client)
+
+async def run_article_pipeline(article_request: ArticleRequest) -> str:
+    """スクレイピング→AI生成→Google Docs保存を実行し、DocsのURLを返す"""
+    # 1. スクレイピング
+    scraped_data = await scraper.scrape_url(article_request.url, article_request.crawl_subpages)
+    
+    # 2. AI生成
+    generated_content = await ai_generator.generate_article(
+        scraped_data, 
+        article_request.format_type,
+        article_request.category,
+        force_regenerate=article_request.force_regenerate
+    )
+    
+    # 3. Google Docsに保存
+    return await google_docs.create_document(generated_content)
+
+async def generate_discovered_article(url: str) -> str:
+    """一覧ページ巡回で見つかった記事をポップアップストア形式で生成"""
+    return await run_article_pipeline(ArticleRequest(url=url, format_type="popup", category="POP UP"))
+
+# 一覧ページを巡回し、新しい記事を自動で生成する
+discovery = DiscoveryService(scraper, generate=generate_discovered_article)
+
+# 急がない記事はバッチジョブでまとめて生成し、完了後にGoogle Docsへ保存する
+batch_generation = BatchGenerationService(scraper, ai_generator, on_result=google_docs.create_document)
+
+@app.on_event("startup")
+async def startup():
+    """常駐リソースの起動"""
+    try:
+        await parse_pool.start()
+    except Exception as e:
+        # 起動できない場合はこのプロセス内でパースする
+        print(f"パースワーカー起動エラー: {e}")
+    
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        # 起動に失敗しても初回の動的スクレイピング時に再試行する
+        print(f"ブラウザプール起動エラー: {e}")
+    
+    await discovery.start()
+    await batch_generation.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """共有リソースの解放"""
+    await discovery.close()
+    await batch_generation.close()
+    await ai_generator.close()
+    await browser_pool.close()
+    await parse_pool.close()
+    await http_client.close()
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -33,7 +124,9 @@ async def index(request: Request):
 @app.post("/generate-article")
 async def generate_article(
     url: str = Form(...),
-    format_type: str = Form(...)
+    format_type: str = Form(...),
+    crawl_subpages: Optional[bool] = Form(None),
+    force_regenerate: bool = Form(False)
 ):
     """記事生成エンドポイント"""
     try:
@@ -41,21 +134,12 @@ async def generate_article(
         article_request = ArticleRequest(
             url=url,
             format_type=format_type,
-            category="POP UP"  # デフォルトでPOP UP
+            category="POP UP",  # デフォルトでPOP UP
+            crawl_subpages=crawl_subpages,
+            force_regenerate=force_regenerate
         )
         
-        # 1. スクレイピング
-        scraped_data = await scraper.scrape_url(article_request.url)
-        
-        # 2. AI生成
-        generated_content = await ai_generator.generate_article(
-            scraped_data, 
-            article_request.format_type,
-            article_request.category
-        )
-        
-        # 3. Google Docsに保存
-        docs_url = await google_docs.create_document(generated_content)
+        docs_url = await run_article_pipeline(article_request)
         
         # レスポンスの作成
         response = ArticleResponse(
@@ -69,10 +153,59 @@ async def generate_article(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/discovery/run")
+async def run_discovery():
+    """一覧ページを今すぐ巡回し、新しく見つかった記事URLを返す"""
+    try:
+        new_urls = await discovery.run_once()
+        return {"new_urls": new_urls, "queued": discovery.queue.qsize()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/batch")
+async def submit_batch(urls: str = Form(...)):
+    """改行区切りのURLをバッチ生成に回し、ジョブIDを返す"""
+    url_list = [url for url in urls.splitlines() if url.strip()]
+    if not url_list:
+        raise HTTPException(status_code=400, detail="URLが指定されていません")
+    try:
+        job_id = await batch_generation.submit(url_list)
+        return {"job_id": job_id, "urls": len(url_list)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/batch/{job_id}")
+async def get_batch(job_id: str):
+    """バッチジョブの状態と記事ごとの結果"""
+    job = batch_generation.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    return job
+
 @app.get("/health")
 async def health_check():
     """ヘルスチェックエンドポイント"""
     return {"status": "healthy", "message": "サービスは正常に動作しています"}
 
+@app.get("/stats")
+async def stats():
+    """各サービスの統計情報"""
+    return {
+        "host_scheduler": host_scheduler.get_stats(),
+        "browser_pool": browser_pool.get_stats(),
+        "dynamic_scrape": page_loader.get_stats(),
+        "parse_pool": parse_pool.get_stats(),
+        "scrape_cache": scrape_cache.get_stats(),
+        "site_profiles": site_profiles.get_stats(),
+        "image_probe": image_prober.get_stats(),
+        "image_dedup": image_deduplicator.get_stats(),
+        "subpage_crawl": subpage_crawler.get_stats(),
+        "discovery": discovery.get_stats(),
+        "batch_generation": batch_generation.get_stats(),
+        "ai_generator": ai_generator.get_stats(),
+        "llm_cache": llm_cache.get_stats(),
+        "llm_limiter": llm_limiter.get_stats()
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
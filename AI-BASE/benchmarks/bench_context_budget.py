@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+本文のトークン予算（PromptContextBuilder）の効果の計測
+
+ページを静的スクレイピングと同じ処理で解析し、プロンプトに渡す本文を予算ごとに
+絞り込んだときのトークン数・処理時間と、記事に必要な情報（会期・会場・特典条件・
+ノベルティ・描き下ろし）が残っているかを表示する。
+
+    python benchmarks/bench_context_budget.py [予算 ...]
+"""
+
+import io
+import os
+import sys
+import time
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_structured_prompt import build_event_page
+from services.scraper import WebScraper
+from services.prompt_context import PromptContextBuilder
+
+# build_event_pageの本文に含まれ、記事に必要な情報
+KEY_FACTS = {
+    '会期': '2025年3月1日',
+    '会場': '渋谷マルイ',
+    '特典条件': '3,000円以上',
+    'ノベルティ': 'ポストカード',
+    '描き下ろし': '描き下ろし',
+}
+
+
+def run(name: str, text: str, budgets):
+    repeat = int(os.getenv('BENCH_REPEAT', '5'))
+    for budget in budgets:
+        builder = PromptContextBuilder(token_budget=budget, enabled=True)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            context, report = builder.build(text)
+        elapsed = (time.perf_counter() - started) / repeat
+
+        missing = [label for label, fact in KEY_FACTS.items() if fact in text and fact not in context]
+        before, after = report['context_tokens_before'], report['context_tokens_after']
+        print(
+            f"[{name}] 予算={budget} 本文={before}→{after}トークン "
+            f"削減={(1 - after / before) * 100:.1f}% 断片={report['context_chunks_used'] or '-'}/{report['context_chunks'] or '-'} "
+            f"{elapsed * 1000:.1f}ms "
+            + (f"欠落: {', '.join(missing)}" if missing else "必要な情報はすべて残存")
+        )
+
+
+def main():
+    budgets = [int(arg) for arg in sys.argv[1:]] or [300, 1000, 3000]
+    scraper = WebScraper()
+    print(f"トークン数の計算: {PromptContextBuilder(enabled=True).counter.backend}")
+    for goods_count in (30, 100, 300):
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraped_data = scraper._parse_page(build_event_page(goods_count, with_json_ld=False), 'https://example.com/popup/')
+        run(f"goods-{goods_count}", scraped_data.text_content or '', budgets)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+WebScraper._extract_images のベンチマーク
+
+旧実装（セレクタごとの複数回走査）と現在の1回走査実装の結果が一致することを確認し、
+処理時間を比較する。保存済みのHTMLファイルを引数に渡すと実ページで計測する。
+
+    python benchmarks/bench_extract_images.py [page1.html page2.html ...]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import contextlib
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.scraper import WebScraper
+from services.html_document import ParsedDocument
+
+
+def legacy_extract_images(self, soup, base_url: str) -> List[str]:
+    """画像URLの抽出（強化版）- 元サイトでの位置と重要度を考慮"""
+    images = []
+    seen_urls = set()
+    
+    # 画像を重要度とソースごとに分類
+    main_content_images = []
+    article_images = []
+    general_images = []
+    meta_images = []
+    
+    # メインコンテンツエリアを特定
+    main_content_selectors = [
+        'main',
+        'article', 
+        '.content',
+        '.main-content',
+        '.article-content',
+        '.post-content',
+        '.entry-content',
+        '#content',
+        '#main',
+        '#article',
+        '.container .content',
+        '.wrapper .content'
+    ]
+    
+    main_content = None
+    for selector in main_content_selectors:
+        try:
+            main_content = soup.select_one(selector)
+            if main_content:
+                print(f"メインコンテンツエリアを発見: {selector}")
+                break
+        except:
+            continue
+    
+    # メインコンテンツエリア内の画像を優先的に取得
+    if main_content:
+        for img in main_content.find_all('img'):
+            src = self._extract_image_src(img, base_url)
+            if src and self._is_valid_image_url(src) and src not in seen_urls:
+                seen_urls.add(src)
+                main_content_images.append(src)
+                print(f"メインコンテンツ画像: {src}")
+    
+    # 記事・商品関連の特定エリアの画像
+    article_selectors = [
+        '.goods', '.product', '.item', '.merchandise',
+        '.gallery', '.photos', '.images',
+        '.character', '.anime', '.collaboration',
+        '.popup', '.store', '.campaign',
+        '.novelty', '.special', '.limited',
+        '.featured', '.highlight'
+    ]
+    
+    for selector in article_selectors:
+        try:
+            areas = soup.select(selector)
+            for area in areas:
+                for img in area.find_all('img'):
+                    src = self._extract_image_src(img, base_url)
+                    if src and self._is_valid_image_url(src) and src not in seen_urls:
+                        seen_urls.add(src)
+                        article_images.append(src)
+                        print(f"記事関連画像: {src}")
+        except:
+            continue
+    
+    # 一般的なimgタグから画像を取得（メインコンテンツ以外）
+    for img in soup.find_all('img'):
+        # メインコンテンツ内の画像は既に処理済みなのでスキップ
+        if main_content and img in main_content.find_all('img'):
+            continue
+        
+        src = self._extract_image_src(img, base_url)
+        if src and self._is_valid_image_url(src) and src not in seen_urls:
+            # 画像の親要素から重要度を判定
+            importance = self._calculate_image_importance(img)
+            if importance > 0:  # 重要度が正の場合のみ追加
+                seen_urls.add(src)
+                general_images.append((src, importance))
+    
+    # メタデータから画像を取得
+    meta_selectors = [
+        ('meta[property="og:image"]', 'content'),
+        ('meta[name="twitter:image"]', 'content'),
+        ('meta[name="twitter:image:src"]', 'content')
+    ]
+    
+    for selector, attr in meta_selectors:
+        try:
+            meta_tag = soup.select_one(selector)
+            if meta_tag:
+                src = meta_tag.get(attr, '')
+                if src and self._is_valid_image_url(src) and src not in seen_urls:
+                    seen_urls.add(src)
+                    meta_images.append(src)
+                    print(f"メタ画像: {src}")
+        except:
+            continue
+    
+    # 背景画像も取得（CSS style属性から）
+    bg_images = []
+    for element in soup.find_all(attrs={'style': True}):
+        style = element.get('style', '')
+        if 'background-image' in style:
+            import re
+            bg_matches = re.findall(r'background-image:\s*url\(["\']?([^"\']+)["\']?\)', style)
+            for bg_url in bg_matches:
+                if self._is_valid_image_url(bg_url) and bg_url not in seen_urls:
+                    seen_urls.add(bg_url)
+                    bg_images.append(bg_url)
+    
+    # 画像を重要度順に統合
+    final_images = []
+    
+    # 1. メインコンテンツの画像（最重要）
+    final_images.extend(main_content_images[:5])  # 最大5枚
+    
+    # 2. 記事関連エリアの画像
+    final_images.extend(article_images[:3])  # 最大3枚
+    
+    # 3. 一般画像（重要度でソート）
+    general_images.sort(key=lambda x: x[1], reverse=True)
+    final_images.extend([img[0] for img in general_images[:3]])  # 最大3枚
+    
+    # 4. メタ画像（補完用）
+    if len(final_images) < 3:
+        final_images.extend(meta_images[:2])
+    
+    # 5. 背景画像（最後の手段）
+    if len(final_images) < 2:
+        final_images.extend(bg_images[:1])
+    
+    # 最終的な品質フィルタリング
+    quality_images = []
+    for img_url in final_images:
+        if img_url not in [qi[0] for qi in quality_images]:  # 重複除去
+            quality_score = self._calculate_image_quality_score(img_url)
+            if quality_score > 0:  # スコアが正の場合のみ
+                quality_images.append((img_url, quality_score))
+    
+    # 品質スコアでソートして返す
+    quality_images.sort(key=lambda x: x[1], reverse=True)
+    result = [img[0] for img in quality_images[:10]]  # 最大10枚まで
+    
+    print(f"最終選択画像: {len(result)}枚")
+    for i, img_url in enumerate(result):
+        print(f"  選択画像{i+1}: {img_url}")
+    
+    return result
+
+
+def build_synthetic_page(image_count: int = 600, seed: int = 0) -> str:
+    """グッズ一覧の多い大きなページを生成"""
+    rng = random.Random(seed)
+    areas = ['goods', 'product', 'item', 'gallery', 'novelty', 'campaign', 'news', 'sidebar', 'footer']
+    classes = ['main', 'thumb', 'icon', 'hero', 'goods-img', 'banner', '']
+    parts = [
+        '<html><head><title>ポップアップストア</title>',
+        '<meta property="og:image" content="https://example.com/images/ogp_1200x630.jpg">',
+        '<meta name="twitter:image" content="https://example.com/images/twitter_card.png">',
+        '</head><body><header><img src="/common/logo.png" class="logo"></header>',
+    ]
+    parts.append('<div class="wrapper"><main><h1>POP UP STORE</h1>')
+    for i in range(image_count):
+        area = rng.choice(areas)
+        size = rng.choice(['', 'width="120" height="120"', 'width="640" height="480"'])
+        name = rng.choice(['goods', 'item', 'thumb', 'photo', 'visual', 'character'])
+        src_attr = rng.choice(['src', 'data-src', 'data-original'])
+        if i % 7 == 0:
+            parts.append('</main><section class="%s">' % area)
+        parts.append(
+            '<div class="%s"><p>商品%d</p><img %s="/images/%s/%s_%04d_%dx%d.jpg" class="%s" alt="goods %d" %s></div>'
+            % (area, i, src_attr, area, name, i, rng.choice([300, 800]), rng.choice([300, 600]), rng.choice(classes), i, size)
+        )
+        if i % 7 == 6:
+            parts.append('</section><main>')
+        if i % 50 == 0:
+            parts.append('<div style="background-image: url(\'/images/bg/bg_%d.jpg\')"></div>' % i)
+    parts.append('</main></div><footer><img src="/common/footer_banner.png"></footer></body></html>')
+    return ''.join(parts)
+
+
+def measure(func, repeat: int) -> float:
+    """printを抑止して平均処理時間（秒）を返す"""
+    elapsed = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            func()
+            elapsed.append(time.perf_counter() - started)
+    return sum(elapsed) / len(elapsed)
+
+
+def run(name: str, html: str, base_url: str, repeat: int):
+    scraper = WebScraper()
+    doc = ParsedDocument(html, base_url, parser='html.parser')
+    soup = doc.soup
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = legacy_extract_images(scraper, soup, base_url)
+        actual = scraper._extract_images(doc, base_url)
+    if expected != actual:
+        print(f"[{name}] 結果が一致しません")
+        print(f"  旧実装: {expected}")
+        print(f"  新実装: {actual}")
+        sys.exit(1)
+
+    def extract_images():
+        # 文書単位のキャッシュを消して毎回DOMを走査させる
+        doc._memo.clear()
+        return scraper._extract_images(doc, base_url)
+
+    legacy_time = measure(lambda: legacy_extract_images(scraper, soup, base_url), repeat)
+    current_time = measure(extract_images, repeat)
+    img_count = len(soup.find_all('img'))
+    print(
+        f"[{name}] img={img_count} 旧実装={legacy_time * 1000:.1f}ms "
+        f"新実装={current_time * 1000:.1f}ms 高速化={legacy_time / current_time:.1f}x 結果一致={len(actual)}枚"
+    )
+
+
+def main():
+    repeat = int(os.getenv('BENCH_REPEAT', '5'))
+    paths = sys.argv[1:]
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as f:
+                html = f.read().decode('utf-8', errors='replace')
+            run(os.path.basename(path), html, os.getenv('BENCH_BASE_URL', 'https://example.com/'), repeat)
+        return
+
+    for count in (100, 300, 1000):
+        run(f"synthetic-{count}", build_synthetic_page(count), 'https://example.com/popup/', repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+画像スコアリングのキーワード照合のマイクロベンチマーク
+
+旧実装（キーワードのリスト・辞書を呼び出しごとに走査）と、WebScraper生成時に
+構築したKeywordMatcherで1回だけ走査する現在の実装を、数千件の画像候補で比較する。
+スコアが完全に一致することも確認する。
+
+    python benchmarks/bench_keyword_scoring.py [候補数]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import contextlib
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bs4 import BeautifulSoup
+from services.scraper import WebScraper
+
+
+def legacy_image_importance(self, img_tag) -> int:
+    """画像の重要度を計算（DOM位置、クラス、親要素から判定）"""
+    importance = 0
+    
+    # alt属性の内容
+    alt_text = img_tag.get('alt', '').lower()
+    if alt_text:
+        important_alt_keywords = [
+            'goods', 'product', 'item', 'merchandise',
+            'character', 'anime', 'collaboration', 'collab',
+            'popup', 'store', 'campaign', 'event',
+            'novelty', 'special', 'limited', 'exclusive',
+            'new', 'latest', 'featured', 'main'
+        ]
+        
+        for keyword in important_alt_keywords:
+            if keyword in alt_text:
+                importance += 3
+                break
+    
+    # クラス名から判定
+    class_names = ' '.join(img_tag.get('class', [])).lower()
+    if class_names:
+        important_class_keywords = [
+            'main', 'hero', 'featured', 'primary',
+            'goods', 'product', 'item', 'gallery',
+            'character', 'anime', 'artwork',
+            'campaign', 'special', 'highlight'
+        ]
+        
+        unimportant_class_keywords = [
+            'thumb', 'thumbnail', 'small', 'mini',
+            'icon', 'logo', 'brand', 'header', 'footer',
+            'nav', 'menu', 'ad', 'banner', 'sidebar'
+        ]
+        
+        for keyword in important_class_keywords:
+            if keyword in class_names:
+                importance += 2
+        
+        for keyword in unimportant_class_keywords:
+            if keyword in class_names:
+                importance -= 3
+    
+    # 親要素から判定
+    parent = img_tag.parent
+    if parent:
+        parent_class = ' '.join(parent.get('class', [])).lower()
+        parent_id = parent.get('id', '').lower()
+        
+        important_parent_patterns = [
+            'gallery', 'photos', 'images', 'slideshow',
+            'goods', 'products', 'items', 'merchandise',
+            'main', 'content', 'article', 'featured',
+            'hero', 'banner', 'highlight'
+        ]
+        
+        for pattern in important_parent_patterns:
+            if pattern in parent_class or pattern in parent_id:
+                importance += 2
+                break
+    
+    # 画像サイズ（width, height属性）
+    width = img_tag.get('width')
+    height = img_tag.get('height')
+    
+    if width and height:
+        try:
+            w, h = int(width), int(height)
+            if w >= 400 or h >= 300:
+                importance += 2
+            elif w >= 200 or h >= 150:
+                importance += 1
+            elif w < 100 and h < 100:
+                importance -= 2
+        except ValueError:
+            pass
+    
+    return importance
+
+def legacy_is_valid_image_url(self, url: str) -> bool:
+    """画像URLの有効性をチェック（緩和版）"""
+    if not url or len(url) < 10:
+        return False
+    
+    url_lower = url.lower()
+    
+    # 重要：除外パターンを大幅に緩和
+    exclude_patterns = [
+        'data:image',  # base64画像
+        'placeholder',
+        'loading',
+        'spinner',
+        '.svg',  # SVGは除外
+        '1x1',   # トラッキングピクセル
+        'pixel',  # トラッキングピクセル
+        'spacer',  # スペーサー画像
+        'blank',  # 空白画像
+        'transparent',  # 透明画像
+        'favicon',  # ファビコン
+        'noimage',  # 画像なし
+        'analytics',  # アナリティクス
+        'tracking',  # トラッキング
+    ]
+    
+    # URLパスから除外パターンをチェック（緩和）
+    if any(pattern in url_lower for pattern in exclude_patterns):
+        print(f"除外対象画像: {url}")
+        return False
+    
+    # ファイル名から除外パターンをチェック（緩和）
+    filename = url_lower.split('/')[-1].split('?')[0]  # クエリパラメータを除去
+    filename_exclude_patterns = [
+        'btn_',  # ボタン画像
+        'spacer_',  # スペーサー
+        'blank_',  # 空白画像
+    ]
+    
+    if any(pattern in filename for pattern in filename_exclude_patterns):
+        print(f"ファイル名による除外: {url}")
+        return False
+    
+    # 有効な拡張子をチェック
+    valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']
+    if any(ext in url_lower for ext in valid_extensions):
+        print(f"有効な画像URL: {url}")
+        return True
+    
+    # 拡張子がない場合でも、画像っぽいパスなら有効とする
+    image_keywords = ['image', 'img', 'photo', 'picture', 'gallery', 'media']
+    if any(keyword in url_lower for keyword in image_keywords):
+        print(f"画像キーワードマッチ: {url}")
+        return True
+    
+    return False
+
+def legacy_image_quality_score(self, url: str) -> int:
+    """画像の品質スコアを計算（緩和版）"""
+    score = 10  # ベーススコアを上げる
+    url_lower = url.lower()
+    
+    # 高品質を示すキーワード（スコア上昇）
+    quality_keywords = {
+        'large': 4,
+        'big': 3,
+        'full': 4,
+        'original': 5,
+        'high': 3,
+        'main': 4,
+        'hero': 5,
+        'featured': 4,
+        'gallery': 3,
+        'photo': 3,
+        'image': 2,
+        'picture': 2,
+        'visual': 2,
+        'artwork': 4,
+        'character': 4,  # キャラクター画像
+        'anime': 4,  # アニメ関連
+        'goods': 4,  # グッズ画像
+        'product': 4,  # 商品画像
+        'item': 3,   # アイテム画像
+        'merchandise': 3,  # 商品
+        'collaboration': 3,  # コラボ関連
+        'event': 3,  # イベント関連
+        'popup': 4,  # ポップアップ関連
+        'store': 2,  # ストア関連
+        'campaign': 3,  # キャンペーン
+        'special': 3,  # 特別な
+        'limited': 3,  # 限定
+        'exclusive': 3,  # 限定
+        'new': 2,    # 新商品
+        'latest': 2,  # 最新
+        'banner': 2,  # バナー（緩和）
+        'logo': 1,   # ロゴ（完全除外から緩和）
+        'icon': 1,   # アイコン（完全除外から緩和）
+    }
+    
+    for keyword, points in quality_keywords.items():
+        if keyword in url_lower:
+            score += points
+    
+    # 低品質を示すキーワード（減点を緩和）
+    low_quality_keywords = {
+        'thumb': -2,  # -4から-2に緩和
+        'thumbnail': -2,  # -4から-2に緩和
+        'small': -1,  # -3から-1に緩和
+        'mini': -1,   # -3から-1に緩和
+        'tiny': -2,   # -4から-2に緩和
+        'pixel': -5,  # トラッキングピクセルは厳格に
+        'tracking': -5,  # トラッキングは厳格に
+        'spacer': -5,    # スペーサーは厳格に
+        'blank': -5,     # 空白画像は厳格に
+        'placeholder': -3,  # プレースホルダーは減点
+        'default': -1,      # デフォルト画像は軽減点
+    }
+    
+    for keyword, points in low_quality_keywords.items():
+        if keyword in url_lower:
+            score += points
+    
+    # URLの構造による判定
+    path_parts = url_lower.split('/')
+    
+    # 深い階層にある画像は詳細画像の可能性が高い
+    if len(path_parts) > 5:
+        score += 2
+    
+    # CDNやメディアサーバーの画像は品質が高い可能性
+    if any(cdn in url_lower for cdn in ['cdn', 'media', 'assets', 'static', 'images']):
+        score += 2
+    
+    # ファイル名に数字が多い場合（商品コードなど）
+    filename = path_parts[-1].split('?')[0] if path_parts else ''
+    if len([c for c in filename if c.isdigit()]) >= 3:
+        score += 1
+    
+    # URLの長さ（長いURLは詳細な画像の可能性）
+    if len(url) > 100:
+        score += 1
+    elif len(url) > 150:
+        score += 2
+    
+    # 画像サイズの推測（URLに含まれるサイズ情報）
+    size_patterns = [
+        r'(\d{3,4})x(\d{3,4})',  # 640x480のような形式
+        r'w(\d{3,4})',  # w640のような形式
+        r'h(\d{3,4})',  # h480のような形式
+    ]
+    
+    import re
+    for pattern in size_patterns:
+        matches = re.findall(pattern, url_lower)
+        if matches:
+            if isinstance(matches[0], tuple):
+                width, height = int(matches[0][0]), int(matches[0][1])
+                # 大きな画像にボーナス
+                if width >= 800 or height >= 600:
+                    score += 3
+                elif width >= 400 or height >= 300:
+                    score += 1
+            else:
+                size = int(matches[0])
+                if size >= 800:
+                    score += 3
+                elif size >= 400:
+                    score += 1
+    
+    return max(5, score)  # 最低スコアを5に設定（0から変更）
+
+
+
+def build_candidates(count: int, seed: int = 0):
+    """画像URLとimgタグの候補を生成"""
+    rng = random.Random(seed)
+    dirs = ['images', 'uploads/2025/04', 'assets/goods', 'media/campaign', 'common/img', 'static/item']
+    names = ['goods', 'thumb', 'main_visual', 'novelty', 'banner', 'icon', 'character', 'photo', 'btn_close', 'spacer']
+    urls = []
+    for i in range(count):
+        host = rng.choice(['https://www.example.com', 'https://cdn.example.jp', 'https://shop.example.net'])
+        url = '%s/%s/%s_%04d_%dx%d.%s' % (
+            host, rng.choice(dirs), rng.choice(names), i,
+            rng.choice([150, 640, 1200]), rng.choice([150, 480, 900]),
+            rng.choice(['jpg', 'png', 'webp', 'svg'])
+        )
+        if rng.random() < 0.3:
+            url += '?w=%d&v=%d' % (rng.choice([300, 800]), i)
+        urls.append(url)
+
+    html = ''.join(
+        '<div class="%s" id="area%d"><img src="%s" class="%s" alt="%s" width="%d" height="%d"></div>' % (
+            rng.choice(['gallery', 'goods-list', 'sidebar', 'header-nav', '']), i, url,
+            rng.choice(['main-visual', 'thumb small', 'product-image', 'logo', '']),
+            rng.choice(['グッズ goods', 'novelty', 'logo', '']),
+            rng.choice([80, 300, 640]), rng.choice([80, 200, 480])
+        )
+        for i, url in enumerate(urls)
+    )
+    imgs = BeautifulSoup(html, 'html.parser').find_all('img')
+    return urls, imgs
+
+
+def measure(func, repeat: int) -> float:
+    """printを抑止して平均処理時間（秒）を返す"""
+    elapsed = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            func()
+            elapsed.append(time.perf_counter() - started)
+    return sum(elapsed) / len(elapsed)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(os.getenv('BENCH_REPEAT', '5'))
+    scraper = WebScraper()
+    urls, imgs = build_candidates(count)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for url in urls:
+            assert legacy_is_valid_image_url(scraper, url) == scraper._is_valid_image_url(url), url
+            assert legacy_image_quality_score(scraper, url) == scraper._calculate_image_quality_score(url), url
+        for img in imgs:
+            assert legacy_image_importance(scraper, img) == scraper._calculate_image_importance(img), img
+
+    cases = [
+        ('_is_valid_image_url',
+         lambda: [legacy_is_valid_image_url(scraper, url) for url in urls],
+         lambda: [scraper._is_valid_image_url(url) for url in urls]),
+        ('_calculate_image_quality_score',
+         lambda: [legacy_image_quality_score(scraper, url) for url in urls],
+         lambda: [scraper._calculate_image_quality_score(url) for url in urls]),
+        ('_calculate_image_importance',
+         lambda: [legacy_image_importance(scraper, img) for img in imgs],
+         lambda: [scraper._calculate_image_importance(img) for img in imgs]),
+    ]
+
+    print(f"候補数={count} 照合方式={scraper.keyword_matcher.backend} スコア一致")
+    for name, legacy, current in cases:
+        legacy_time = measure(legacy, repeat)
+        current_time = measure(current, repeat)
+        print(
+            f"  {name}: 旧実装={legacy_time * 1000:.1f}ms 新実装={current_time * 1000:.1f}ms "
+            f"高速化={legacy_time / current_time:.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
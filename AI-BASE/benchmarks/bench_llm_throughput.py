@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+記事生成のスループット計測
+
+設定されたLLMバックエンド（LLM_BASE_URL等）に対して、同時に複数の記事を生成し、
+毎秒の記事数・所要時間の分布・フォールバック数・レート制限の待ち時間を表示する。
+APIの利用枠を使わないよう、通常はモックサーバーに向けて実行する。
+
+    python benchmarks/mock_llm_server.py --rate-limit-rate 0.05 &
+    LLM_BASE_URL=http://127.0.0.1:8900/v1 python benchmarks/bench_llm_throughput.py [記事数] [同時実行数]
+"""
+
+import io
+import os
+import sys
+import time
+import asyncio
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_structured_prompt import build_event_page
+from services.scraper import WebScraper
+from services.ai_generator import AIGenerator
+from services.llm_cache import LLMResponseCache
+
+
+def percentile(values, ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))] if ordered else 0.0
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    scraper = WebScraper()
+    # 毎回APIを呼ぶよう生成結果キャッシュは使わない
+    generator = AIGenerator(llm_cache=LLMResponseCache(enabled=False))
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraped_data = scraper._parse_page(build_event_page(30), 'https://example.com/popup/')
+
+    semaphore = asyncio.Semaphore(concurrency)
+    durations, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.monotonic()
+            content = await generator.generate_article(scraped_data, 'popup', 'POP UP', force_regenerate=True)
+            durations.append(time.monotonic() - started)
+            if content.get('error') or 'prompt_tokens' not in content.get('generation', {}):
+                failures += 1
+
+    backend = generator.backend.describe()
+    print(f"{backend} に{total}件（同時{concurrency}件、{generator.generation_mode}モード）")
+    started = time.monotonic()
+    # 標準出力の差し替えはタスクごとに行うと順序が入れ替わるため、全体で1回だけ行う
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.monotonic() - started
+
+    stats = generator.get_stats()
+    limiter = generator.limiter.get_stats()
+    print(
+        f"{elapsed:.2f}秒 {total / elapsed:.2f}件/秒 "
+        f"所要時間 p50={percentile(durations, 0.5):.2f}秒 p95={percentile(durations, 0.95):.2f}秒 "
+        f"最大={max(durations):.2f}秒"
+    )
+    print(
+        f"API呼び出し{stats['calls']}回 エラー{stats['errors']}回 フォールバック{stats['fallbacks']}件（集計{failures}件） "
+        f"再試行{limiter['retries']}回 {limiter['retry_errors']} 待ち平均{limiter['avg_queue_wait_seconds']}秒 "
+        f"入力{stats['prompt_tokens']}トークン（キャッシュ{stats['cached_prompt_tokens']}） 出力{stats['completion_tokens']}トークン"
+    )
+    await generator.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
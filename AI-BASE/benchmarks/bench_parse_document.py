@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+静的スクレイピングの解析処理のベンチマーク
+
+旧実装（html.parserでパースし、本文抽出でdecompose()したツリーからメタデータを読む）と
+ParsedDocument（設定されたパーサーで1度だけパースし、ツリーを変更しない）を比較する。
+抽出結果が一致することを確認し、1ページあたりのCPU時間を表示する。
+
+    python benchmarks/bench_parse_document.py [page1.html page2.html ...]
+"""
+
+import io
+import os
+import re
+import sys
+import time
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bs4 import BeautifulSoup
+from services.scraper import WebScraper
+from services.content_distiller import ContentDistiller
+from services.html_document import ParsedDocument, resolve_parser
+from bench_extract_images import build_synthetic_page, legacy_extract_images
+
+
+def legacy_extract(scraper: WebScraper, content: bytes, url: str) -> dict:
+    """旧実装の解析処理"""
+    soup = BeautifulSoup(content, 'html.parser')
+    doc = ParsedDocument.__new__(ParsedDocument)
+    doc.soup = soup
+    doc._memo = {}
+
+    title = scraper._extract_title(doc)
+    description = scraper._extract_description(doc)
+    images = legacy_extract_images(scraper, soup, url)
+
+    text_content = None
+    main_content = (
+        soup.find('main') or
+        soup.find('article') or
+        soup.find('div', class_=re.compile(r'content|main|article', re.I)) or
+        soup.find('div', id=re.compile(r'content|main|article', re.I))
+    )
+    if main_content:
+        for tag in main_content.find_all(['script', 'style', 'nav', 'header', 'footer']):
+            tag.decompose()
+        text_content = main_content.get_text().strip()
+
+    full_content = re.sub(r'\s+', ' ', soup.get_text()).strip()
+    return {
+        'title': title,
+        'description': description,
+        'images': images,
+        'text_content': text_content,
+        'full_content': full_content,
+    }
+
+
+def current_extract(scraper: WebScraper, content: bytes, url: str, parser: str) -> dict:
+    """現在の解析処理"""
+    doc = ParsedDocument(content, url, parser=parser)
+    return {
+        'title': scraper._extract_title(doc),
+        'description': scraper._extract_description(doc),
+        'images': scraper._extract_images(doc, url),
+        'text_content': scraper._extract_text_content(doc),
+        'full_content': scraper._extract_metadata(doc, url).get('full_content'),
+    }
+
+
+def cpu_time(func, repeat: int) -> float:
+    """printを抑止して平均CPU時間（秒）を返す"""
+    elapsed = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.process_time()
+            func()
+            elapsed.append(time.process_time() - started)
+    return sum(elapsed) / len(elapsed)
+
+
+def run(name: str, content: bytes, url: str, repeat: int):
+    scraper = WebScraper()
+    # 旧実装には本文抽出（サイト共通部分の除去）がないため、パーサーの差だけを比べる
+    scraper.content_distiller = ContentDistiller(enabled=False)
+    parser = resolve_parser()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = legacy_extract(scraper, content, url)
+        same_parser = current_extract(scraper, content, url, 'html.parser')
+        actual = current_extract(scraper, content, url, parser)
+
+    if expected != same_parser:
+        print(f"[{name}] html.parserでの抽出結果が旧実装と一致しません")
+        sys.exit(1)
+    differs = [key for key in expected if expected[key] != actual[key]]
+
+    legacy_time = cpu_time(lambda: legacy_extract(scraper, content, url), repeat)
+    current_time = cpu_time(lambda: current_extract(scraper, content, url, parser), repeat)
+    print(
+        f"[{name}] {len(content) // 1024}KB 旧実装(html.parser)={legacy_time * 1000:.1f}ms "
+        f"現在({parser})={current_time * 1000:.1f}ms 高速化={legacy_time / current_time:.1f}x"
+        + (f" 差分あり: {', '.join(differs)}" if differs else " 結果一致")
+    )
+
+
+def main():
+    repeat = int(os.getenv('BENCH_REPEAT', '5'))
+    paths = sys.argv[1:]
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as f:
+                content = f.read()
+            run(os.path.basename(path), content, os.getenv('BENCH_BASE_URL', 'https://example.com/'), repeat)
+        return
+
+    for count in (100, 300, 1000):
+        content = build_synthetic_page(count).encode('utf-8')
+        run(f"synthetic-{count}", content, 'https://example.com/popup/', repeat)
+
+
+if __name__ == '__main__':
+    main()
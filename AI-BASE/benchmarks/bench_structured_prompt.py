@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+構造化データによるプロンプト削減量の計測
+
+ページを静的スクレイピングと同じ処理で解析し、構造化データ（JSON-LD・microdata・
+OpenGraph）を使った場合と使わない場合のプロンプト文字数を比較する。
+本文のトークン予算（AI_CONTEXT_TOKEN_BUDGET）は従来側まで削ってしまうため、既定では
+両方とも予算なしで比較する。BENCH_CONTEXT_BUDGETを指定すると両方に同じ予算をかける。
+予算そのものの効果は bench_context_budget.py で計測する。
+
+    [BENCH_CONTEXT_BUDGET=3000] python benchmarks/bench_structured_prompt.py [page1.html page2.html ...]
+"""
+
+import io
+import os
+import sys
+import json
+import contextlib
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# プロンプトの構築のみでAPIは呼ばない
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from services.scraper import WebScraper
+from services.ai_generator import AIGenerator
+from services.prompt_context import PromptContextBuilder
+from models.scraped_data import ScrapedData
+
+
+def build_event_page(goods_count: int = 30, with_json_ld: bool = True) -> str:
+    """開催情報・グッズ一覧・アクセス案内を含むポップアップストアのページ"""
+    goods = [
+        {'name': f"アクリルスタンド 第{i + 1}弾 キャラクター{i + 1}", 'price': 1650 + (i % 5) * 110}
+        for i in range(goods_count)
+    ]
+    json_ld = {
+        '@context': 'https://schema.org',
+        '@type': 'Event',
+        'name': 'TVアニメ「サンプル」POP UP STORE in 渋谷',
+        'startDate': '2025-03-01',
+        'endDate': '2025-03-16',
+        'location': {
+            '@type': 'Place',
+            'name': '渋谷マルイ 8F イベントスペース',
+            'address': {'@type': 'PostalAddress', 'addressRegion': '東京都', 'addressLocality': '渋谷区', 'streetAddress': '神南1-22-6'},
+        },
+        'organizer': {'@type': 'Organization', 'name': 'サンプルグッズ株式会社'},
+        'image': ['/images/key-visual.jpg'],
+        'offers': [
+            {'@type': 'Offer', 'price': item['price'], 'priceCurrency': 'JPY', 'itemOffered': {'@type': 'Product', 'name': item['name']}}
+            for item in goods
+        ],
+    }
+    goods_rows = ''.join(
+        f"<tr><td>{item['name']}</td><td>{item['price']:,}円(税込)</td><td>サイズ：約W80×H150mm 素材：アクリル 発売元：サンプルグッズ株式会社</td></tr>"
+        for item in goods
+    )
+    notes = ''.join(
+        f"<p>注意事項{i + 1}：混雑状況により入場を制限させていただく場合がございます。予めご了承ください。</p>"
+        for i in range(20)
+    )
+    head = f'<script type="application/ld+json">{json.dumps(json_ld, ensure_ascii=False)}</script>' if with_json_ld else ''
+    return f"""<html><head><title>TVアニメ「サンプル」POP UP STORE in 渋谷 開催決定</title>
+<meta property="og:title" content="TVアニメ「サンプル」POP UP STORE in 渋谷">
+<meta property="og:site_name" content="サンプルグッズ公式">
+<meta property="og:image" content="https://example.com/images/ogp.jpg">{head}</head>
+<body><main><article>
+<h1>TVアニメ「サンプル」POP UP STORE in 渋谷 開催決定！</h1>
+<p>TVアニメ「サンプル」のポップアップストアが、2025年3月1日(土)から3月16日(日)まで渋谷マルイ 8F イベントスペースにて開催されます。描き下ろしイラストを使用した限定グッズを販売します。</p>
+<h2>開催概要</h2>
+<table><tr><th>会期</th><td>2025年3月1日(土)〜3月16日(日)</td></tr>
+<tr><th>会場</th><td>渋谷マルイ 8F イベントスペース</td></tr>
+<tr><th>住所</th><td>東京都 渋谷区 神南1-22-6</td></tr>
+<tr><th>主催</th><td>サンプルグッズ株式会社</td></tr></table>
+<h2>販売グッズ</h2><table>{goods_rows}</table>
+<h2>購入特典</h2><p>税込3,000円以上お買い上げごとに、ノベルティ「ポストカード」(全8種)をランダムで1枚プレゼント。</p>
+{notes}
+</article></main></body></html>"""
+
+
+def prompt_size(generator: AIGenerator, scraped_data, use_structured: bool) -> int:
+    data = scraped_data.model_copy() if hasattr(scraped_data, 'model_copy') else scraped_data.copy()
+    if not use_structured:
+        data.structured_data = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        return len(generator._build_popup_prompt(data))
+
+
+def template_size(generator: AIGenerator, url: str) -> int:
+    """サイト情報を含まない固定部分の文字数"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return len(generator._build_popup_prompt(ScrapedData(url=url)))
+
+
+def run(name: str, html: str, url: str, context_budget: Optional[int] = None):
+    scraper = WebScraper()
+    # 構造化データの効果だけを比べるよう、予算は両方に同じ条件でかける（既定は予算なし）
+    generator = AIGenerator(context_builder=PromptContextBuilder(
+        token_budget=context_budget, enabled=context_budget is not None
+    ))
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraped_data = scraper._parse_page(html, url)
+
+    structured = scraped_data.structured_data
+    without = prompt_size(generator, scraped_data, use_structured=False)
+    with_structured = prompt_size(generator, scraped_data, use_structured=True) if structured else without
+    fixed = template_size(generator, url)
+    sources = ', '.join(structured.sources) if structured else 'なし'
+    print(
+        f"[{name}] 構造化データ={sources} 本文={len(scraped_data.text_content or '')}文字 "
+        f"プロンプト: 従来={without}文字 構造化データ使用={with_structured}文字 "
+        f"削減={(1 - with_structured / without) * 100:.1f}% "
+        f"(固定部分{fixed}文字を除くと {without - fixed}→{with_structured - fixed}文字 "
+        f"削減={(1 - (with_structured - fixed) / (without - fixed)) * 100:.1f}%)"
+    )
+
+
+def main():
+    context_budget = int(os.environ['BENCH_CONTEXT_BUDGET']) if os.getenv('BENCH_CONTEXT_BUDGET') else None
+    paths = sys.argv[1:]
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as f:
+                html = f.read().decode('utf-8', errors='replace')
+            run(os.path.basename(path), html, os.getenv('BENCH_BASE_URL', 'https://example.com/'), context_budget)
+        return
+
+    for goods_count in (10, 30, 100):
+        run(f"json-ld-{goods_count}", build_event_page(goods_count, with_json_ld=True), 'https://example.com/popup/', context_budget)
+    run("opengraph-only-30", build_event_page(30, with_json_ld=False), 'https://example.com/popup/', context_budget)
+
+
+if __name__ == '__main__':
+    main()
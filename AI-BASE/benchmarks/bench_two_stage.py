@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+記事生成モードの比較（HTML全体の生成 / 項目抽出＋テンプレート）
+
+同じページについて、LLMに記事のHTML全体を出力させる従来の方法と、差し込み項目の
+JSONだけを出力させてHTMLをローカルで組み立てる方法の、生成時間と出力トークン数を比較する。
+
+既定ではAPIを呼ばず、出力トークン数に比例して時間のかかる模擬クライアントで計測する
+（BENCH_FIRST_TOKEN_SECONDS・BENCH_TOKENS_PER_SECONDで調整）。--liveを付けると
+設定されたLLMバックエンド（OPENAI_API_KEY・LLM_BASE_URL）を呼ぶ（キャッシュは使わない）。
+
+    python benchmarks/bench_two_stage.py [--live] [回数]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import contextlib
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+LIVE = '--live' in sys.argv
+if not LIVE:
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from bench_structured_prompt import build_event_page
+from services.scraper import WebScraper
+from services.ai_generator import AIGenerator
+from services.llm_cache import LLMResponseCache
+from services.article_renderer import PopupArticleRenderer
+from services.prompt_context import TokenCounter
+from models.popup_slots import PopupSlots
+
+FIRST_TOKEN_SECONDS = float(os.getenv('BENCH_FIRST_TOKEN_SECONDS', '0.5'))
+TOKENS_PER_SECOND = float(os.getenv('BENCH_TOKENS_PER_SECOND', '60'))
+
+# 模擬クライアントが返す項目（ベンチマーク用ページの内容。mock_llm_server.pyも使う）
+SAMPLE_SLOTS = PopupSlots(
+    work_title="サンプル",
+    author="サンプル作者",
+    maker="サンプルグッズ株式会社",
+    event_name="TVアニメ「サンプル」POP UP STORE in 渋谷",
+    store="渋谷マルイ 8F イベントスペース",
+    start_date="2025-03-01",
+    end_date="2025-03-16",
+    price_threshold=3000,
+    novelty_name="ポストカード",
+    novelty_count=8,
+    new_illustration=True,
+)
+
+
+class SimulatedCompletions:
+    """出力トークン数に比例して待つchat.completions"""
+
+    def __init__(self, counter: TokenCounter, url: str):
+        self.counter = counter
+        self.article = PopupArticleRenderer().render(SAMPLE_SLOTS, url)
+        self.slots_json = json.dumps(SAMPLE_SLOTS.model_dump() if hasattr(SAMPLE_SLOTS, 'model_dump') else SAMPLE_SLOTS.dict(), ensure_ascii=False)
+
+    async def create(self, **request):
+        content = self.slots_json if 'response_format' in request else self.article
+        prompt = ''.join(message['content'] for message in request['messages'])
+        completion_tokens = self.counter.count(content)
+        await asyncio.sleep(FIRST_TOKEN_SECONDS + completion_tokens / TOKENS_PER_SECOND)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=self.counter.count(prompt), completion_tokens=completion_tokens),
+        )
+
+
+async def measure(generator: AIGenerator, scraped_data, mode: str, runs: int):
+    generator.generation_mode = mode
+    seconds, prompt_tokens, completion_tokens = [], [], []
+    for _ in range(runs):
+        started = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            content = await generator.generate_article(scraped_data, 'popup', 'POP UP', force_regenerate=True)
+        seconds.append(time.monotonic() - started)
+        report = content.get('generation', {})
+        prompt_tokens.append(report.get('prompt_tokens', 0))
+        completion_tokens.append(report.get('completion_tokens', 0))
+    return sum(seconds) / runs, sum(prompt_tokens) / runs, sum(completion_tokens) / runs
+
+
+async def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--live']
+    runs = int(args[0]) if args else 3
+    url = 'https://example.com/popup/'
+
+    scraper = WebScraper()
+    generator = AIGenerator(llm_cache=LLMResponseCache(enabled=False))
+    if not LIVE:
+        generator.backend.client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=SimulatedCompletions(generator.context_builder.counter, url).create))
+        )
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraped_data = scraper._parse_page(build_event_page(30), url)
+
+    print(f"{'実API' if LIVE else '模擬クライアント'}で各{runs}回生成")
+    results = {}
+    for mode in ('html', 'slots'):
+        results[mode] = await measure(generator, scraped_data, mode, runs)
+        avg_seconds, avg_prompt, avg_completion = results[mode]
+        print(f"[{mode}] 平均 {avg_seconds:.2f}秒 入力{avg_prompt:.0f}トークン 出力{avg_completion:.0f}トークン")
+
+    html_seconds, _, html_completion = results['html']
+    slots_seconds, _, slots_completion = results['slots']
+    if html_seconds and html_completion:
+        print(
+            f"項目抽出モード: 時間 {(1 - slots_seconds / html_seconds) * 100:.1f}%短縮 "
+            f"出力トークン {(1 - slots_completion / html_completion) * 100:.1f}%削減"
+        )
+    if LIVE:
+        await generator.close()
+    else:
+        await generator.backend._http_client.aclose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+負荷試験用のOpenAI互換モックサーバー
+
+/v1/chat/completions に、用意したポップアップストア記事（JSONモードでは差し込み項目）を
+返す。最初のトークンまでの時間・毎秒トークン数・エラー（500/429/応答なし）の発生率を
+指定でき、APIの利用枠を使わずにパイプラインのスループットを計測できる。
+同じ先頭部分のプロンプトにはプロンプトキャッシュ相当のcached_tokensを返す。
+/v1/files・/v1/batches ではBatch APIを模擬する（投入した行を順に処理し、出力ファイルを返す）。
+
+    python benchmarks/mock_llm_server.py [--port 8900] [--latency 0.5] [--tokens-per-second 50]
+        [--error-rate 0.05] [--rate-limit-rate 0.05] [--timeout-rate 0.01] [--articles DIR]
+
+アプリ側は LLM_BASE_URL=http://127.0.0.1:8900/v1 で接続する（APIキーは不要）。
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from services.article_renderer import PopupArticleRenderer
+from services.prompt_context import TokenCounter
+from bench_two_stage import SAMPLE_SLOTS
+
+# 記事のURLは生成側で置き換える（AIGeneratorのSOURCE_URL_PLACEHOLDERと同じ）
+SOURCE_URL_PLACEHOLDER = "[公式サイトURL]"
+
+# プロンプトキャッシュの単位（文字数）と、キャッシュが効く最小トークン数
+PREFIX_BLOCK_CHARS = 256
+PREFIX_CACHE_MIN_TOKENS = 1024
+PREFIX_CACHE_ENTRIES = 10000
+
+# ストリーミングで1回に送る文字数
+STREAM_CHUNK_CHARS = 8
+
+
+class MockLLM:
+    """返す記事・遅延・エラー発生の設定と、呼び出しの統計"""
+
+    def __init__(self, latency: float, tokens_per_second: float, error_rate: float, rate_limit_rate: float,
+                 timeout_rate: float, hang_seconds: float, articles_dir: str = None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.counter = TokenCounter()
+        self.articles = self._load_articles(articles_dir)
+        self.slots_json = json.dumps(
+            SAMPLE_SLOTS.model_dump() if hasattr(SAMPLE_SLOTS, 'model_dump') else SAMPLE_SLOTS.dict(),
+            ensure_ascii=False
+        )
+        self._next_article = 0
+        self._prefixes: 'OrderedDict[str, None]' = OrderedDict()
+        self.files = {}
+        self.batches = {}
+        self.stats = {'requests': 0, 'streamed': 0, 'errors': 0, 'rate_limited': 0, 'timeouts': 0,
+                      'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+
+    def _load_articles(self, articles_dir: str = None):
+        articles = []
+        if articles_dir:
+            for name in sorted(os.listdir(articles_dir)):
+                if name.endswith('.html'):
+                    with open(os.path.join(articles_dir, name), encoding='utf-8') as f:
+                        articles.append(f.read())
+        return articles or [PopupArticleRenderer().render(SAMPLE_SLOTS, SOURCE_URL_PLACEHOLDER)]
+
+    def content_for(self, body: dict) -> str:
+        if (body.get('response_format') or {}).get('type') == 'json_object':
+            return self.slots_json
+        article = self.articles[self._next_article % len(self.articles)]
+        self._next_article += 1
+        return article
+
+    def cached_tokens(self, prompt: str) -> int:
+        """以前のリクエストと共通する先頭部分のトークン数（最小トークン数未満なら0）"""
+        cached_chars = 0
+        for end in range(PREFIX_BLOCK_CHARS, len(prompt) + 1, PREFIX_BLOCK_CHARS):
+            key = hashlib.sha1(prompt[:end].encode('utf-8')).hexdigest()
+            if key in self._prefixes and cached_chars == end - PREFIX_BLOCK_CHARS:
+                cached_chars = end
+            self._prefixes[key] = None
+            self._prefixes.move_to_end(key)
+        while len(self._prefixes) > PREFIX_CACHE_ENTRIES:
+            self._prefixes.popitem(last=False)
+        tokens = self.counter.count(prompt[:cached_chars])
+        return tokens if tokens >= PREFIX_CACHE_MIN_TOKENS else 0
+
+    def usage(self, prompt: str, content: str) -> dict:
+        prompt_tokens = self.counter.count(prompt)
+        completion_tokens = self.counter.count(content)
+        cached = self.cached_tokens(prompt)
+        self.stats['prompt_tokens'] += prompt_tokens
+        self.stats['completion_tokens'] += completion_tokens
+        self.stats['cached_tokens'] += cached
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': cached},
+        }
+
+    async def inject_failure(self):
+        """設定した確率でエラー応答を返す（応答なしは長時間待たせる）"""
+        roll = random.random()
+        if roll < self.timeout_rate:
+            self.stats['timeouts'] += 1
+            await asyncio.sleep(self.hang_seconds)
+        roll -= self.timeout_rate
+        if roll < self.rate_limit_rate:
+            self.stats['rate_limited'] += 1
+            return JSONResponse(
+                {'error': {'message': 'Rate limit reached (mock)', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                status_code=429,
+                headers={'retry-after-ms': str(random.randint(200, 1000))}
+            )
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            self.stats['errors'] += 1
+            return JSONResponse({'error': {'message': 'Internal error (mock)', 'type': 'server_error'}}, status_code=500)
+        return None
+
+    def completion(self, body: dict) -> dict:
+        """ストリーミングしない場合の応答"""
+        prompt = ''.join(message.get('content') or '' for message in body.get('messages', []))
+        content = self.content_for(body)
+        return {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': self.usage(prompt, content),
+        }
+
+    def create_file(self, data: bytes, purpose: str) -> dict:
+        file = {'id': f"file-{uuid.uuid4().hex[:24]}", 'object': 'file', 'bytes': len(data),
+                'created_at': int(time.time()), 'filename': 'batch.jsonl', 'purpose': purpose}
+        self.files[file['id']] = (file, data)
+        return file
+
+    async def process_batch(self, batch: dict):
+        """入力の各行を順に処理し、出力・エラーファイルを作る（エラー発生率はここでも有効）"""
+        _, data = self.files[batch['input_file_id']]
+        lines = [json.loads(line) for line in data.decode('utf-8').splitlines() if line.strip()]
+        batch['status'] = 'in_progress'
+        batch['request_counts']['total'] = len(lines)
+        outputs, errors = [], []
+        for line in lines:
+            await asyncio.sleep(self.latency)
+            if random.random() < self.error_rate:
+                batch['request_counts']['failed'] += 1
+                errors.append({'id': f"batch_req_{uuid.uuid4().hex[:16]}", 'custom_id': line['custom_id'],
+                               'response': {'status_code': 500, 'body': {'error': {'message': 'Internal error (mock)'}}},
+                               'error': None})
+                continue
+            batch['request_counts']['completed'] += 1
+            outputs.append({'id': f"batch_req_{uuid.uuid4().hex[:16]}", 'custom_id': line['custom_id'],
+                            'response': {'status_code': 200, 'body': self.completion(line['body'])}, 'error': None})
+        for key, rows in (('output_file_id', outputs), ('error_file_id', errors)):
+            if rows:
+                payload = ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode('utf-8')
+                batch[key] = self.create_file(payload, 'batch_output')['id']
+        batch['status'] = 'completed'
+        batch['completed_at'] = int(time.time())
+
+
+def create_app(mock: MockLLM) -> FastAPI:
+    app = FastAPI(title="Mock LLM Server")
+
+    @app.get("/v1/models")
+    async def models():
+        return {'object': 'list', 'data': [{'id': 'mock', 'object': 'model', 'owned_by': 'mock'}]}
+
+    @app.get("/stats")
+    async def stats():
+        return mock.stats
+
+    @app.post("/v1/files")
+    async def upload_file(file: UploadFile = File(...), purpose: str = Form(...)):
+        return mock.create_file(await file.read(), purpose)
+
+    @app.get("/v1/files/{file_id}/content")
+    async def file_content(file_id: str):
+        if file_id not in mock.files:
+            raise HTTPException(status_code=404)
+        return PlainTextResponse(mock.files[file_id][1].decode('utf-8'))
+
+    @app.post("/v1/batches")
+    async def create_batch(request: Request):
+        body = await request.json()
+        if body.get('input_file_id') not in mock.files:
+            raise HTTPException(status_code=400, detail='input file not found')
+        batch = {
+            'id': f"batch_{uuid.uuid4().hex[:24]}",
+            'object': 'batch',
+            'endpoint': body.get('endpoint'),
+            'input_file_id': body['input_file_id'],
+            'completion_window': body.get('completion_window', '24h'),
+            'status': 'validating',
+            'created_at': int(time.time()),
+            'output_file_id': None,
+            'error_file_id': None,
+            'metadata': body.get('metadata'),
+            'request_counts': {'total': 0, 'completed': 0, 'failed': 0},
+        }
+        mock.batches[batch['id']] = batch
+        asyncio.create_task(mock.process_batch(batch))
+        return batch
+
+    @app.get("/v1/batches/{batch_id}")
+    async def retrieve_batch(batch_id: str):
+        if batch_id not in mock.batches:
+            raise HTTPException(status_code=404)
+        return mock.batches[batch_id]
+
+    @app.post("/v1/batches/{batch_id}/cancel")
+    async def cancel_batch(batch_id: str):
+        if batch_id not in mock.batches:
+            raise HTTPException(status_code=404)
+        mock.batches[batch_id]['status'] = 'cancelled'
+        return mock.batches[batch_id]
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        mock.stats['requests'] += 1
+        failure = await mock.inject_failure()
+        if failure is not None:
+            return failure
+
+        if not body.get('stream'):
+            response = mock.completion(body)
+            await asyncio.sleep(mock.latency + response['usage']['completion_tokens'] / mock.tokens_per_second)
+            return response
+
+        model = body.get('model', 'mock')
+        prompt = ''.join(message.get('content') or '' for message in body.get('messages', []))
+        content = mock.content_for(body)
+        usage = mock.usage(prompt, content)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        mock.stats['streamed'] += 1
+        include_usage = (body.get('stream_options') or {}).get('include_usage', False)
+
+        def chunk(delta: dict, finish_reason=None, chunk_usage=None) -> str:
+            payload = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [] if chunk_usage else [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+            if chunk_usage:
+                payload['usage'] = chunk_usage
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            await asyncio.sleep(mock.latency)
+            yield chunk({'role': 'assistant', 'content': ''})
+            for start in range(0, len(content), STREAM_CHUNK_CHARS):
+                piece = content[start:start + STREAM_CHUNK_CHARS]
+                await asyncio.sleep(mock.counter.count(piece) / mock.tokens_per_second)
+                yield chunk({'content': piece})
+            yield chunk({}, finish_reason='stop')
+            if include_usage:
+                yield chunk({}, chunk_usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type='text/event-stream')
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="負荷試験用のOpenAI互換モックサーバー")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.5, help="最初のトークンまでの秒数")
+    parser.add_argument('--tokens-per-second', type=float, default=50, help="出力の毎秒トークン数")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="500を返す割合")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="429を返す割合")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="応答せずに待たせる割合")
+    parser.add_argument('--hang-seconds', type=float, default=600, help="応答しない場合の待ち秒数")
+    parser.add_argument('--articles', help="返す記事（.html）を置いたディレクトリ")
+    parser.add_argument('--seed', type=int, help="エラー発生の乱数シード")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    mock = MockLLM(args.latency, args.tokens_per_second, args.error_rate, args.rate_limit_rate,
+                   args.timeout_rate, args.hang_seconds, args.articles)
+
+    import uvicorn
+    uvicorn.run(create_app(mock), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,8 @@ class ArticleRequest(BaseModel):
     url: str
     format_type: str  # "popup", "news", "event"
     category: str     # "POP UP", "NEWS", "EVENT"
+    crawl_subpages: Optional[bool] = None  # 関連ページも取得する（Noneなら設定に従う）
+    force_regenerate: bool = False  # 生成結果のキャッシュを使わずに生成し直す
     
     class Config:
         schema_extra = {
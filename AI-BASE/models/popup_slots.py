@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class PopupSlots(BaseModel):
+    """ポップアップストア記事テンプレートの差し込み項目（LLMが抽出するJSON）"""
+    work_title: Optional[str] = None       # 作品名
+    author: Optional[str] = None           # 作者名
+    maker: Optional[str] = None            # メーカー名
+    event_name: Optional[str] = None       # イベント名
+    store: Optional[str] = None            # 店舗名
+    start_date: Optional[str] = None       # 開始日（YYYY-MM-DD）
+    end_date: Optional[str] = None         # 終了日（YYYY-MM-DD）
+    price_threshold: Optional[int] = None  # 特典の購入金額（税込・円）
+    novelty_name: Optional[str] = None     # ノベルティ名
+    novelty_count: Optional[int] = None    # ノベルティの種類数
+    new_illustration: Optional[bool] = None  # 描き下ろしイラストか
+    characters: List[str] = []             # 描き下ろしでない場合に挙げるキャラ名
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "work_title": "XXX",
+                "author": "作者名",
+                "maker": "メーカー名",
+                "event_name": "アニメ「XXX」ポップアップストア",
+                "store": "渋谷マルイ 8F イベントスペース",
+                "start_date": "2025-03-01",
+                "end_date": "2025-03-16",
+                "price_threshold": 3000,
+                "novelty_name": "ポストカード",
+                "novelty_count": 8,
+                "new_illustration": True,
+                "characters": []
+            }
+        }
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional
+from models.structured_data import StructuredData
 
 class ScrapedData(BaseModel):
     """スクレイピングされたデータのモデル"""
@@ -9,6 +10,7 @@ class ScrapedData(BaseModel):
     images: List[str] = []
     text_content: Optional[str] = None
     metadata: dict = {}
+    structured_data: Optional[StructuredData] = None
     
     class Config:
         schema_extra = {
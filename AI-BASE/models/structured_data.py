@@ -0,0 +1,47 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class StructuredProduct(BaseModel):
+    """構造化データから取得した商品"""
+    name: Optional[str] = None
+    price: Optional[str] = None
+    currency: Optional[str] = None
+    image: Optional[str] = None
+
+class StructuredData(BaseModel):
+    """ページに埋め込まれた構造化データ（JSON-LD・microdata・OpenGraph）から取得した情報"""
+    event_name: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    venue_name: Optional[str] = None
+    venue_address: Optional[str] = None
+    organizer: Optional[str] = None
+    description: Optional[str] = None
+    site_name: Optional[str] = None
+    page_title: Optional[str] = None
+    images: List[str] = []
+    products: List[StructuredProduct] = []
+    sources: List[str] = []
+    
+    @property
+    def has_event(self) -> bool:
+        """イベント名・開催期間・会場が揃っているか"""
+        return bool(self.event_name and self.start_date and self.venue_name)
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "event_name": "アニメ「XXX」ポップアップストア",
+                "start_date": "2025-03-01",
+                "end_date": "2025-03-16",
+                "venue_name": "渋谷マルイ 8F イベントスペース",
+                "venue_address": "東京都渋谷区神南1-22-6",
+                "organizer": "メーカー名",
+                "description": "描き下ろしイラストを使用した新作グッズを販売",
+                "site_name": "メーカー公式サイト",
+                "page_title": "アニメ「XXX」ポップアップストア開催",
+                "images": ["https://example.com/key-visual.jpg"],
+                "products": [{"name": "アクリルスタンド", "price": "1650", "currency": "JPY", "image": None}],
+                "sources": ["json-ld", "opengraph"]
+            }
+        }
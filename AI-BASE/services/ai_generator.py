@@ -1,58 +1,50 @@
 import os
-import openai
+import time
 from models.scraped_data import ScrapedData
-from typing import Dict, Any
+from models.structured_data import StructuredData
+from typing import Dict, Any, Optional, List, Callable
+import re
 import json
 import asyncio
+from services.llm_cache import LLMResponseCache, get_llm_cache, llm_cache_key
+from services.prompt_context import PromptContextBuilder
+from services.llm_limiter import LLMRateLimiter, get_llm_limiter
+from services.llm_backend import LLMBackend, create_llm_backend
+from services.article_renderer import PopupArticleRenderer
+from models.popup_slots import PopupSlots
 
-class AIGenerator:
-    """AI生成サービス（POP UP専用）"""
-    
-    def __init__(self):
-        """AIコンテンツ生成サービスの初期化"""
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    
-    async def generate_article(self, scraped_data: ScrapedData, format_type: str, category: str) -> Dict[str, Any]:
-        """記事を生成（POP UP専用）"""
-        try:
-            print(f"AI生成開始: format_type={format_type}, category={category}")
-            print(f"スクレイピングデータ確認: url={scraped_data.url}, text_length={len(scraped_data.text_content or '')}, images={len(scraped_data.images)}")
-            
-            # POP UPプロンプトを構築
-            prompt = self._build_popup_prompt(scraped_data)
-            print(f"プロンプト構築完了: {len(prompt)}文字")
-            
-            # OpenAI APIで記事生成
-            print("OpenAI API呼び出し開始...")
-            response = await self._generate_with_openai(prompt)
-            print(f"OpenAI API呼び出し完了: {len(response)}文字")
-            
-            # 生成されたコンテンツを構造化
-            structured_content = self._structure_content(response, scraped_data)
-            
-            print(f"AI生成完了: title={structured_content.get('title', 'N/A')}")
-            return structured_content
-            
-        except Exception as e:
-            print(f"AI生成エラー（詳細）: {type(e).__name__}: {str(e)}")
-            import traceback
-            print(f"エラートレースバック: {traceback.format_exc()}")
-            return self._create_fallback_content(scraped_data)
-    
-    def _build_popup_prompt(self, scraped_data: ScrapedData) -> str:
-        """POP UP専用プロンプト"""
-        
-        # サイト全体のテキストを取得
-        full_content = scraped_data.text_content or ""
-        
-        # URLの取得（urlフィールドまたはmetadataから）
-        source_url = scraped_data.url or scraped_data.metadata.get('source_url', '')
-        
-        print(f"全文テキスト長: {len(full_content)}文字")
-        print(f"POP UPプロンプト構築中...")
-        print(f"ソースURL: {source_url}")
-        
-        return f"""
+# プロンプトに含める構造化データの商品数の上限
+STRUCTURED_PRODUCT_LIMIT = 30
+
+# 構造化データの値を除いた後、これ未満の文字しか残らない行は本文から除く
+REMAINDER_MIN_NEW_CHARS = 15
+
+# 残りの文字数に数えない記号・曜日
+LEFTOVER_IGNORE_PATTERN = re.compile(r'[\s\W_〜～月火水木金土日祝]')
+
+ISO_DATE_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+
+# 記事生成の条件（モデルとともにキャッシュキーにも含める）
+SYSTEM_PROMPT = "あなたは日本のアニメポップアップストア専門のライターです。"
+GENERATION_MAX_TOKENS = 2000
+GENERATION_TEMPERATURE = 0.7
+
+# 項目抽出モード（LLMはテンプレートの差し込み項目のJSONだけを出力し、HTMLはローカルで組み立てる）
+SLOT_SYSTEM_PROMPT = "あなたは日本のアニメポップアップストアの告知ページから記事の項目を抽出するアシスタントです。JSONのみを出力します。"
+SLOT_MAX_TOKENS = 400
+SLOT_TEMPERATURE = 0.0
+
+# 整数で受け取る項目（「3,000円」等の表記から数字を取り出す）
+SLOT_INT_FIELDS = ('price_threshold', 'novelty_count')
+
+JSON_OBJECT_PATTERN = re.compile(r'\{.*\}', re.DOTALL)
+
+# 公式サイトURLの差し込み位置（生成後に置き換える）
+SOURCE_URL_PLACEHOLDER = "[公式サイトURL]"
+
+# プロンプトの固定部分（リクエストごとに変わるURL・本文は末尾に付けるため、
+# 先頭からこの部分までが全リクエストで同一になり、APIのプロンプトキャッシュが効く）
+POPUP_PROMPT_PREFIX = """
 あなたは日本のアニメポップアップストア専門のライターです。
 
 以下のサイト情報から、ポップアップストアの記事を生成してください。
@@ -94,10 +86,10 @@ class AIGenerator:
 <div>-適切な画像を挿入ー</div>
 
 <h3>開催情報</h3>
-<p>公式サイト：<a href="{source_url}" target="_blank">特設ページ</a></p>
+<p>公式サイト：<a href="[公式サイトURL]" target="_blank">特設ページ</a></p>
 <p>開催場所：[店舗名]</p>
 <p>開催期間：[開催期間]</p>
-<p>お問い合わせ：<a href="{source_url}" target="_blank">[メーカー名]</a>にお問い合わせください。</p>
+<p>お問い合わせ：<a href="[公式サイトURL]" target="_blank">[メーカー名]</a>にお問い合わせください。</p>
 
 <p>以下広告のあとに記事が続きます</p>
 
@@ -109,49 +101,550 @@ class AIGenerator:
 - 画像プレースホルダー「-適切な画像を挿入ー」を3箇所に配置してください
 - 推測や創作はせず、実際の情報のみを使用してください
 - HTMLタグは正しく閉じてください
+- [公式サイトURL]はそのまま出力してください（元サイトのURLに置き換えます）
 
 【元サイト情報】
-URL: {source_url}
-サイト全文: {full_content}
 """
+
+SLOT_PROMPT_PREFIX = """
+以下のサイト情報から、ポップアップストア記事の項目を抽出し、次の形式のJSONのみを出力してください。
+
+{
+  "work_title": "作品名",
+  "author": "原作の作者名（「先生」は付けない）",
+  "maker": "メーカー名（グッズの販売元・主催）",
+  "event_name": "イベント名",
+  "store": "店舗名（会場名・フロア）",
+  "start_date": "開始日（YYYY-MM-DD）",
+  "end_date": "終了日（YYYY-MM-DD）",
+  "price_threshold": 特典がもらえる購入金額（税込・円の整数）,
+  "novelty_name": "ノベルティ名",
+  "novelty_count": ノベルティの種類数（整数）,
+  "new_illustration": 描き下ろしイラストを使用したグッズか（true/false）,
+  "characters": ["描き下ろしでない場合に紹介するキャラクター名（最大3名）"]
+}
+
+【重要】
+- サイトに記載のない項目はnull（charactersは空の配列）にしてください
+- 推測や創作はせず、実際の情報のみを使用してください
+
+【元サイト情報】
+"""
+
+
+def _date_variants(value: Optional[str]) -> List[str]:
+    """ISO形式の日付と、本文での表記（2025年3月1日・3月1日・2025/3/1・2025.3.1）"""
+    if not value:
+        return []
+    variants = [value]
+    match = ISO_DATE_PATTERN.search(value)
+    if match:
+        year, month, day = match.group(1), int(match.group(2)), int(match.group(3))
+        variants.extend([
+            f"{year}年{month}月{day}日",
+            f"{month}月{day}日",
+            f"{year}/{month}/{day}",
+            f"{year}.{month}.{day}",
+        ])
+    return variants
+
+class AIGenerator:
+    """AI生成サービス（POP UP専用）"""
+    
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        stream: Optional[bool] = None,
+        llm_cache: Optional[LLMResponseCache] = None,
+        context_builder: Optional[PromptContextBuilder] = None,
+        generation_mode: Optional[str] = None,
+        limiter: Optional[LLMRateLimiter] = None,
+        backend: Optional[LLMBackend] = None
+    ):
+        """AIコンテンツ生成サービスの初期化"""
+        # 呼び出し先（OpenAI API・互換エンドポイント・負荷試験用のモック）は設定で切り替える
+        self.backend = backend or create_llm_backend()
+        
+        # 同時に実行するAPI呼び出しの上限
+        self.max_in_flight = max_in_flight or int(os.getenv('OPENAI_MAX_IN_FLIGHT', '32'))
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if stream is None:
+            stream = os.getenv('OPENAI_STREAM', 'false').lower() == 'true'
+        self.stream = stream
+        # ページが変わっていなければ同じプロンプトになるため、生成結果を使い回す
+        self.llm_cache = llm_cache or get_llm_cache()
+        # 複数の編集者から同時に依頼があっても毎分の上限内で順番に送る
+        self.limiter = limiter or get_llm_limiter()
+        # 長いページの本文は記事の項目に関係する部分をトークン予算内で選ぶ
+        self.context_builder = context_builder or PromptContextBuilder(model=self.backend.model)
+        # html: 記事のHTML全体を生成 / slots: 項目だけを抽出してテンプレートに差し込む
+        self.generation_mode = (generation_mode or os.getenv('AI_GENERATION_MODE', 'html')).lower()
+        # 構造化データでイベント情報が揃っている場合にプロンプトへ含める本文の上限（文字数）
+        self.structured_text_limit = int(os.getenv('AI_STRUCTURED_TEXT_LIMIT', '3000'))
+        self.renderer = PopupArticleRenderer()
+        
+        self._in_flight = 0
+        self._stats = {
+            'calls': 0,
+            'errors': 0,
+            'fallbacks': 0,
+            'max_in_flight_seen': 0,
+            'total_seconds': 0.0,
+            'first_token_seconds': 0.0,
+            'streamed_calls': 0,
+            'prompts': 0,
+            'context_trimmed': 0,
+            'context_tokens_before': 0,
+            'context_tokens_after': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'cached_prompt_tokens': 0,
+            'slot_articles': 0,
+            'slot_parse_errors': 0,
+            'batch_results': 0,
+        }
     
-    async def _generate_with_openai(self, prompt: str) -> str:
-        """OpenAI APIを使用してコンテンツを生成"""
+    async def generate_article(
+        self,
+        scraped_data: ScrapedData,
+        format_type: str,
+        category: str,
+        on_delta: Optional[Callable[[str], None]] = None,
+        force_regenerate: bool = False
+    ) -> Dict[str, Any]:
+        """記事を生成（POP UP専用）
+
+        on_delta: ストリーミング時に生成されたテキストの断片を受け取る関数
+        force_regenerate: 生成結果のキャッシュを使わずに生成し直す
+        """
         try:
-            print("OpenAI API呼び出し準備中...")
-            
-            # APIキーの確認
-            api_key = os.getenv('OPENAI_API_KEY')
-            if not api_key:
-                print("OPENAI_API_KEYが設定されていません。フォールバックコンテンツを生成します。")
-                return self._generate_fallback_html_content()
-            
-            print(f"APIキー確認OK (先頭10文字: {api_key[:10]}...)")
+            context_report = {}
+            generation_report = {'mode': self.generation_mode}
+            if self.generation_mode == 'slots':
+                # 項目を抽出してテンプレートからHTMLを組み立てる
+                response = await self._generate_from_slots(scraped_data, context_report, generation_report, on_delta, force_regenerate)
+            else:
+                # POP UPプロンプトを構築
+                prompt = self._build_popup_prompt(scraped_data, context_report)
+                
+                # OpenAI APIで記事生成
+                response = await self._generate_with_openai(prompt, on_delta, force_regenerate, report=generation_report)
+                source_url = scraped_data.url or scraped_data.metadata.get('source_url', '')
+                response = response.replace(SOURCE_URL_PLACEHOLDER, source_url)
             
-            def call_openai_api():
-                print("同期的なAPI呼び出し開始...")
-                response = self.client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": "あなたは日本のアニメポップアップストア専門のライターです。"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=2000,
-                    temperature=0.7
-                )
-                print("同期的なAPI呼び出し完了")
-                return response.choices[0].message.content
-            
-            # 同期的なAPI呼び出しを非同期で実行
-            print("asyncio.to_thread実行開始...")
-            result = await asyncio.to_thread(call_openai_api)
-            print(f"asyncio.to_thread実行完了: {len(result)}文字")
-            return result
+            # 生成されたコンテンツを構造化
+            content = self._structure_content(response, scraped_data)
+            content['prompt_context'] = context_report
+            content['generation'] = generation_report
+            return content
             
+        except Exception as e:
+            print(f"AI生成エラー（詳細）: {type(e).__name__}: {str(e)}")
+            import traceback
+            print(f"エラートレースバック: {traceback.format_exc()}")
+            return self._create_fallback_content(scraped_data)
+    
+    def _build_popup_prompt(self, scraped_data: ScrapedData, context_report: Optional[Dict[str, Any]] = None) -> str:
+        """POP UP専用プロンプト
+
+        context_report: 渡された場合、本文に使ったトークン数等を書き込む
+        """
+        # 固定部分の後ろにリクエストごとの情報を付ける
+        return POPUP_PROMPT_PREFIX + self._build_site_info(scraped_data, context_report) + "\n"
+    
+    def _build_site_info(self, scraped_data: ScrapedData, context_report: Optional[Dict[str, Any]] = None) -> str:
+        """プロンプト末尾の元サイト情報（URL・構造化データ・本文）"""
+        # サイト全体のテキストを取得
+        full_content = scraped_data.text_content or ""
+        
+        # URLの取得（urlフィールドまたはmetadataから）
+        source_url = scraped_data.url or scraped_data.metadata.get('source_url', '')
+        
+        # 構造化データがあれば確定情報として渡し、本文は残りの情報だけに絞る
+        structured_block = self._build_structured_block(scraped_data.structured_data)
+        content_label = "サイト全文"
+        if structured_block:
+            full_content = self._text_remainder(full_content, scraped_data.structured_data)
+            content_label = "サイト本文（構造化データ以外の情報）"
+        
+        # トークン予算を超える本文は関連度の高い部分だけを元の順序で渡す
+        full_content, report = self.context_builder.build(full_content)
+        self._record_context(report)
+        if context_report is not None:
+            context_report.update(report)
+        
+        return f"URL: {source_url}\n{structured_block}{content_label}: {full_content}"
+    
+    def _build_structured_block(self, structured_data: Optional[StructuredData]) -> str:
+        """構造化データをプロンプト用の項目一覧に（使える項目がなければ空文字）"""
+        if structured_data is None:
+            return ""
+        
+        lines = []
+        if structured_data.event_name:
+            lines.append(f"イベント名: {structured_data.event_name}")
+        if structured_data.start_date or structured_data.end_date:
+            lines.append(f"開催期間: {structured_data.start_date or ''} 〜 {structured_data.end_date or ''}")
+        if structured_data.venue_name or structured_data.venue_address:
+            venue = structured_data.venue_name or ''
+            if structured_data.venue_address:
+                venue += f"（{structured_data.venue_address}）"
+            lines.append(f"会場: {venue}")
+        if structured_data.organizer:
+            lines.append(f"主催: {structured_data.organizer}")
+        if structured_data.site_name:
+            lines.append(f"サイト名: {structured_data.site_name}")
+        if structured_data.page_title and structured_data.page_title != structured_data.event_name:
+            lines.append(f"ページタイトル: {structured_data.page_title}")
+        if structured_data.description:
+            lines.append(f"概要: {structured_data.description}")
+        
+        products = structured_data.products[:STRUCTURED_PRODUCT_LIMIT]
+        if products:
+            lines.append("商品:")
+            for product in products:
+                price = ''
+                if product.price:
+                    price = f" {product.price}{'円' if product.currency in (None, 'JPY') else ' ' + product.currency}"
+                lines.append(f"- {product.name}{price}")
+        
+        if not lines:
+            return ""
+        return "構造化データ（ページに埋め込まれた確定情報）:\n" + "\n".join(lines) + "\n"
+    
+    def _text_remainder(self, full_content: str, structured_data: StructuredData) -> str:
+        """構造化データで分かっている情報だけの行を除いた本文（イベント情報が揃っていれば上限文字数まで）"""
+        known_values = [
+            value for value in (
+                structured_data.event_name,
+                structured_data.venue_name,
+                structured_data.venue_address,
+                structured_data.organizer,
+                structured_data.page_title,
+            ) if value
+        ]
+        for date in (structured_data.start_date, structured_data.end_date):
+            known_values.extend(_date_variants(date))
+        known_values.sort(key=len, reverse=True)
+        # プロンプトの商品一覧に載せた商品の行だけ除く
+        product_names = [
+            product.name for product in structured_data.products[:STRUCTURED_PRODUCT_LIMIT]
+            if product.name and len(product.name) >= 4
+        ]
+        
+        remainder = []
+        for line in full_content.split('\n'):
+            stripped = line.strip()
+            if not stripped:
+                continue
+            # 構造化データの商品一覧に含まれる商品の行
+            if any(name in stripped for name in product_names):
+                continue
+            # 既知の値を除くと項目名程度しか残らない行（会期・会場等）
+            leftover = stripped
+            for value in known_values:
+                leftover = leftover.replace(value, '')
+            if len(LEFTOVER_IGNORE_PATTERN.sub('', leftover)) < REMAINDER_MIN_NEW_CHARS:
+                continue
+            remainder.append(stripped)
+        text = '\n'.join(remainder)
+        
+        if structured_data.has_event and len(text) > self.structured_text_limit:
+            text = text[:self.structured_text_limit]
+        return text
+    
+    def _build_slots_prompt(self, scraped_data: ScrapedData, context_report: Optional[Dict[str, Any]] = None) -> str:
+        """記事テンプレートの差し込み項目をJSONで抽出させるプロンプト"""
+        return SLOT_PROMPT_PREFIX + self._build_site_info(scraped_data, context_report) + "\n"
+    
+    async def _generate_from_slots(
+        self,
+        scraped_data: ScrapedData,
+        context_report: Dict[str, Any],
+        generation_report: Dict[str, Any],
+        on_delta: Optional[Callable[[str], None]] = None,
+        force_regenerate: bool = False
+    ) -> str:
+        """項目をJSONで抽出し、記事のHTMLをテンプレートから組み立てる"""
+        prompt = self._build_slots_prompt(scraped_data, context_report)
+        response = await self._generate_with_openai(
+            prompt,
+            force_regenerate=force_regenerate,
+            report=generation_report,
+            model=self.backend.slot_model,
+            system_prompt=SLOT_SYSTEM_PROMPT,
+            max_tokens=SLOT_MAX_TOKENS,
+            temperature=SLOT_TEMPERATURE,
+            json_mode=True,
+            validate=lambda text: self._parse_slots(text) is not None
+        )
+        
+        html = self._render_slots(scraped_data, response)
+        if on_delta is not None:
+            on_delta(html)
+        return html
+    
+    def _render_slots(self, scraped_data: ScrapedData, response: str) -> str:
+        """抽出結果のJSONから記事のHTMLを組み立てる"""
+        slots = self._parse_slots(response)
+        if slots is None:
+            # 抽出できなかった場合も構造化データの分かる範囲で記事にする
+            self._stats['slot_parse_errors'] += 1
+            slots = PopupSlots()
+        slots = self._fill_slots_from_structured(slots, scraped_data.structured_data)
+        self._stats['slot_articles'] += 1
+        
+        source_url = scraped_data.url or scraped_data.metadata.get('source_url', '')
+        return self.renderer.render(slots, source_url)
+    
+    def _parse_slots(self, text: str) -> Optional[PopupSlots]:
+        """LLMの出力から差し込み項目を読み取る（JSONとして読めなければNone）"""
+        match = JSON_OBJECT_PATTERN.search(text or '')
+        if not match:
+            return None
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        
+        for field in SLOT_INT_FIELDS:
+            value = data.get(field)
+            if isinstance(value, str):
+                digits = re.sub(r'\D', '', value.translate(str.maketrans('０１２３４５６７８９', '0123456789')))
+                data[field] = int(digits) if digits else None
+        if not isinstance(data.get('characters'), list):
+            data['characters'] = []
+        data['characters'] = [str(name) for name in data['characters'] if name]
+        try:
+            return PopupSlots(**data)
+        except ValueError:
+            return None
+    
+    def _fill_slots_from_structured(self, slots: PopupSlots, structured_data: Optional[StructuredData]) -> PopupSlots:
+        """抽出できなかった項目を構造化データで補う"""
+        if structured_data is None:
+            return slots
+        candidates = {
+            'event_name': structured_data.event_name,
+            'store': structured_data.venue_name,
+            'maker': structured_data.organizer,
+            'start_date': structured_data.start_date,
+            'end_date': structured_data.end_date,
+        }
+        update = {
+            field: value for field, value in candidates.items()
+            if value and not getattr(slots, field)
+        }
+        return slots.copy(update=update) if update else slots
+    
+    async def _generate_with_openai(
+        self,
+        prompt: str,
+        on_delta: Optional[Callable[[str], None]] = None,
+        force_regenerate: bool = False,
+        report: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None,
+        system_prompt: str = SYSTEM_PROMPT,
+        max_tokens: int = GENERATION_MAX_TOKENS,
+        temperature: float = GENERATION_TEMPERATURE,
+        json_mode: bool = False,
+        validate: Optional[Callable[[str], bool]] = None
+    ) -> str:
+        """OpenAI APIを使用してコンテンツを生成（同じ条件の生成結果がキャッシュにあればそれを返す）
+
+        report: 渡された場合、モデル・トークン数・所要時間を書き込む
+        validate: 生成結果をキャッシュに保存してよいかの判定
+        """
+        if report is None:
+            report = {}
+        model = model or self.backend.model
+        report['model'] = model
+        # APIキー等の確認
+        if not self.backend.available:
+            print("OPENAI_API_KEY（またはLLM_BASE_URL）が設定されていません。フォールバックコンテンツを生成します。")
+            self._stats['fallbacks'] += 1
+            return self._generate_fallback_html_content()
+        
+        request = self._build_request(prompt, model, system_prompt, max_tokens, temperature, json_mode)
+        cache_key = self._request_cache_key(request)
+        if force_regenerate:
+            self.llm_cache.record_bypass()
+        else:
+            cached = await self.llm_cache.get(cache_key)
+            if cached is not None:
+                if on_delta is not None:
+                    on_delta(cached['content'])
+                report.update({**(cached.get('usage') or {}), 'cached': True, 'seconds': 0.0})
+                return cached['content']
+        
+        # ストリーミングで一部を渡し済みなら、やり直すと重複するため再試行しない
+        delivered = []
+        def forward(delta: str):
+            delivered.append(delta)
+            on_delta(delta)
+        
+        async def attempt():
+            async with self._semaphore:
+                self._in_flight += 1
+                self._stats['calls'] += 1
+                self._stats['max_in_flight_seen'] = max(self._stats['max_in_flight_seen'], self._in_flight)
+                started = time.monotonic()
+                try:
+                    if self.stream or on_delta is not None:
+                        result = await self._stream_completion(request, forward if on_delta is not None else None, started)
+                    else:
+                        result = await self.backend.complete(request)
+                except Exception:
+                    self._stats['errors'] += 1
+                    raise
+                finally:
+                    self._in_flight -= 1
+                    self._stats['total_seconds'] += time.monotonic() - started
+                return result
+        
+        # 入力の見積もりと最大出力トークン数で毎分トークン数の枠を確保する
+        estimated_tokens = self.context_builder.counter.count(system_prompt) + self.context_builder.counter.count(prompt) + max_tokens
+        started = time.monotonic()
+        try:
+            content, usage = await self.limiter.run(attempt, estimated_tokens, can_retry=lambda: not delivered)
         except Exception as e:
             print(f"OpenAI API エラー（詳細）: {type(e).__name__}: {str(e)}")
             print("フォールバックコンテンツを生成します...")
+            self._stats['fallbacks'] += 1
             return self._generate_fallback_html_content()
+        elapsed = time.monotonic() - started
+        self.limiter.settle(estimated_tokens, usage.get('prompt_tokens', 0) + usage.get('completion_tokens', 0))
+        
+        self._stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+        self._stats['completion_tokens'] += usage.get('completion_tokens', 0)
+        self._stats['cached_prompt_tokens'] += usage.get('cached_prompt_tokens', 0)
+        report.update({**usage, 'cached': False, 'seconds': round(elapsed, 3)})
+        if validate is None or validate(content):
+            await self.llm_cache.put(cache_key, content, usage)
+        return content
+    
+    def _build_request(
+        self,
+        prompt: str,
+        model: str,
+        system_prompt: str,
+        max_tokens: int,
+        temperature: float,
+        json_mode: bool = False
+    ) -> Dict[str, Any]:
+        """Chat Completionsのリクエスト"""
+        request = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        if json_mode:
+            request["response_format"] = {"type": "json_object"}
+        return request
+    
+    def _request_cache_key(self, request: Dict[str, Any]) -> str:
+        """リクエストに対応する生成結果キャッシュのキー"""
+        messages = request["messages"]
+        return llm_cache_key(request["model"], messages[0]["content"], messages[1]["content"], request["temperature"], request["max_tokens"])
+    
+    def build_batch_request(self, scraped_data: ScrapedData) -> Dict[str, Any]:
+        """バッチ生成に渡すリクエスト（現在の生成モードのプロンプト）"""
+        if self.generation_mode == 'slots':
+            prompt = self._build_slots_prompt(scraped_data)
+            return self._build_request(prompt, self.backend.slot_model, SLOT_SYSTEM_PROMPT, SLOT_MAX_TOKENS, SLOT_TEMPERATURE, json_mode=True)
+        prompt = self._build_popup_prompt(scraped_data)
+        return self._build_request(prompt, self.backend.model, SYSTEM_PROMPT, GENERATION_MAX_TOKENS, GENERATION_TEMPERATURE)
+    
+    async def cached_batch_result(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """同じリクエストの生成結果がキャッシュにあれば返す（バッチに含めずに済ませる）"""
+        return await self.llm_cache.get(self._request_cache_key(request))
+    
+    async def complete_batch_result(
+        self,
+        scraped_data: ScrapedData,
+        request: Dict[str, Any],
+        content: str,
+        usage: Optional[Dict[str, int]] = None,
+        cached: bool = False
+    ) -> Dict[str, Any]:
+        """バッチの生成結果を記事にする（対話的な生成と同じ形式。結果はキャッシュにも保存）"""
+        usage = usage or {}
+        slots_mode = "response_format" in request
+        if not cached:
+            self._stats['batch_results'] += 1
+            self._stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+            self._stats['completion_tokens'] += usage.get('completion_tokens', 0)
+            self._stats['cached_prompt_tokens'] += usage.get('cached_prompt_tokens', 0)
+            if not slots_mode or self._parse_slots(content) is not None:
+                await self.llm_cache.put(self._request_cache_key(request), content, usage)
+        
+        if slots_mode:
+            html = self._render_slots(scraped_data, content)
+        else:
+            source_url = scraped_data.url or scraped_data.metadata.get('source_url', '')
+            html = content.replace(SOURCE_URL_PLACEHOLDER, source_url)
+        
+        result = self._structure_content(html, scraped_data)
+        result['generation'] = {
+            'mode': 'slots' if slots_mode else 'html',
+            'model': request["model"],
+            **usage,
+            'cached': cached,
+            'batch': True,
+        }
+        return result
+    
+    async def _stream_completion(self, request: Dict[str, Any], on_delta: Optional[Callable[[str], None]], started: float):
+        """ストリーミングで生成し、断片をon_deltaに渡しながら連結（本文とトークン数を返す）"""
+        self._stats['streamed_calls'] += 1
+        received = []
+        
+        def handle(delta: str):
+            if not received:
+                self._stats['first_token_seconds'] += time.monotonic() - started
+            received.append(delta)
+            if on_delta is not None:
+                on_delta(delta)
+        
+        return await self.backend.stream(request, handle)
+    
+    def _record_context(self, report: Dict[str, Any]):
+        """プロンプトに含めた本文のトークン数を記録"""
+        self._stats['prompts'] += 1
+        self._stats['context_tokens_before'] += report['context_tokens_before']
+        self._stats['context_tokens_after'] += report['context_tokens_after']
+        if report['context_chunks'] is not None:
+            self._stats['context_trimmed'] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """記事生成の統計情報"""
+        calls = self._stats['calls']
+        streamed = self._stats['streamed_calls']
+        return {
+            **self._stats,
+            'total_seconds': round(self._stats['total_seconds'], 3),
+            'first_token_seconds': round(self._stats['first_token_seconds'], 3),
+            'avg_seconds': round(self._stats['total_seconds'] / calls, 3) if calls else 0.0,
+            'avg_first_token_seconds': round(self._stats['first_token_seconds'] / streamed, 3) if streamed else None,
+            'in_flight': self._in_flight,
+            'max_in_flight': self.max_in_flight,
+            'stream': self.stream,
+            'generation_mode': self.generation_mode,
+            **self.backend.describe(),
+            'prompt_cache_hit_rate': round(self._stats['cached_prompt_tokens'] / self._stats['prompt_tokens'], 3) if self._stats['prompt_tokens'] else 0.0,
+            'context_token_budget': self.context_builder.token_budget,
+            'context_tokenizer': self.context_builder.counter.backend,
+        }
+    
+    async def close(self):
+        """LLMバックエンドの接続プールを閉じる"""
+        await self.backend.close()
     
     def _generate_fallback_html_content(self) -> str:
         """OpenAI APIが利用できない場合のフォールバックHTMLコンテンツ"""
@@ -197,8 +690,6 @@ URL: {source_url}
             # スクレイピングした画像データを取得
             images = scraped_data.images or []
             
-            print(f"構造化: {len(images)}枚の画像を含む")
-            
             return {
                 "title": f"ポップアップストア記事 - {source_url}",
                 "content": response,
@@ -0,0 +1,140 @@
+import re
+from html import escape
+from typing import Optional, Tuple
+from models.popup_slots import PopupSlots
+
+ISO_DATE_PATTERN = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})')
+
+# 項目が抽出できなかった場合の表記
+UNKNOWN_PERIOD = "公式サイトに記載の期間"
+
+
+def _split_date(value: Optional[str]) -> Optional[Tuple[str, int, int]]:
+    match = ISO_DATE_PATTERN.match(value or '')
+    if not match:
+        return None
+    return match.group(1), int(match.group(2)), int(match.group(3))
+
+
+def format_date(value: Optional[str]) -> str:
+    """YYYY-MM-DDを「2025年3月1日」に（それ以外の表記はそのまま）"""
+    parts = _split_date(value)
+    if parts is None:
+        return value or ''
+    return f"{parts[0]}年{parts[1]}月{parts[2]}日"
+
+
+def format_period(start: Optional[str], end: Optional[str]) -> str:
+    """開催期間「2025年3月1日〜3月16日」（年が同じなら終了日の年を省く）"""
+    if not start and not end:
+        return ''
+    start_text = format_date(start)
+    end_text = format_date(end)
+    start_parts, end_parts = _split_date(start), _split_date(end)
+    if start_parts and end_parts and start_parts[0] == end_parts[0]:
+        end_text = f"{end_parts[1]}月{end_parts[2]}日"
+    return f"{start_text}〜{end_text}"
+
+
+class PopupArticleRenderer:
+    """抽出した項目からポップアップストア記事のHTMLを組み立てる
+
+    見出し・広告位置・開催情報等の定型部分はLLMに出力させず、ここで
+    format-for-popup.mdと同じ構成のHTMLにする。
+    """
+
+    def render(self, slots: PopupSlots, source_url: str) -> str:
+        work = escape(slots.work_title or '')
+        author = escape(slots.author or '')
+        maker = escape(slots.maker or '')
+        store = escape(slots.store or '')
+        event_name = escape(slots.event_name or slots.work_title or '')
+        # 作品名が分からなければイベント名で呼ぶ
+        work_quoted = f"「{work}」" if work else (f"「{event_name}」" if event_name else '')
+        anime = f"アニメ{work_quoted}" if work else work_quoted
+        period = escape(format_period(slots.start_date, slots.end_date)) or UNKNOWN_PERIOD
+        start = escape(format_date(slots.start_date))
+        url = escape(source_url or '', quote=True)
+
+        origin = f"{author}先生による人気漫画を原作とした" if author else ''
+        collab = ' × '.join(part for part in (anime, maker) if part)
+        at_store = f"{store}にて" if store else ''
+        intro = f"{origin}{collab}のポップアップストアが、{at_store}{period}まで開催される。"
+        title_suffix = f" in {store}" if store else ''
+        novelty = self._novelty_label(slots)
+
+        if slots.new_illustration:
+            description = f"{intro}{anime}ポップアップストアでは、描き下ろしイラストを使用した新作グッズが多数ラインナップ!"
+            lead = f"{intro}\n{anime}ポップアップストアでは、イベント限定の描き下ろしイラストを使用した新作グッズが多数販売される"
+        else:
+            characters = '・'.join(escape(name) for name in slots.characters[:3])
+            featuring = f"{characters}らの" if characters else ''
+            description = f"{intro}{anime}ポップアップストアでは、{featuring}アニメビジュアルを使用した新作グッズが多数ラインナップ！"
+            lead = f"{intro}\n{f'「{event_name}」' if event_name else 'アニメ'}ポップアップストアでは、作品に登場する人気キャラクターたちのアニメビジュアルを使用したグッズが多数販売される"
+
+        if novelty and slots.price_threshold:
+            lead += f"他、グッズをお買い上げ{slots.price_threshold:,}円(税込)ごとに特典として{novelty}をランダムに1枚プレゼント!"
+            novelty_text = f"{work_quoted}ポップアップストアにて、グッズをお買い上げ{slots.price_threshold:,}円毎に特典として{novelty}がランダムに1枚プレゼントされる。"
+        elif novelty:
+            lead += f"他、グッズをお買い上げの方に特典として{novelty}をプレゼント!"
+            novelty_text = f"{work_quoted}ポップアップストアにて、グッズをお買い上げの方に特典として{novelty}がプレゼントされる。"
+        else:
+            lead += "。"
+            novelty_text = "特典の有無・配布条件は公式サイトをご確認ください。"
+        novelty_heading = f"お買い上げ特典 - {novelty.strip('「」')}/ランダム" if novelty else "お買い上げ特典"
+
+        contact = f'<a href="{url}" target="_blank">{maker}</a>にお問い合わせください。' if maker else f'<a href="{url}" target="_blank">公式サイト</a>をご確認ください。'
+        opening = f"{start}より" if start else ''
+
+        return f"""
+<h2>メタディスクリプション</h2>
+<p>{description}</p>
+
+<h2>リード文</h2>
+<p>{lead}</p>
+
+<h2>{self._store_title(event_name or work)}{title_suffix}のグッズ</h2>
+<p>{opening}{f"「{store}」にて、" if store else ''}{work_quoted}のポップアップストアを開催!</p>
+
+<h3>グッズラインナップ</h3>
+<div>-適切な画像を挿入ー</div>
+
+<p>以下広告のあとに記事が続きます</p>
+
+<h2>{self._store_title(work or event_name)}{title_suffix}のノベルティー</h2>
+<p>{novelty_text}</p>
+
+<h3>{novelty_heading}</h3>
+<div>-適切な画像を挿入ー</div>
+
+<h2 id="pop-up-summary">{self._store_title(work or event_name)}{title_suffix} {opening}開催!</h2>
+<div>-適切な画像を挿入ー</div>
+
+<h3>開催情報</h3>
+<p>公式サイト：<a href="{url}" target="_blank">特設ページ</a></p>
+<p>開催場所：{store or '公式サイトをご確認ください'}</p>
+<p>開催期間：{period}</p>
+<p>お問い合わせ：{contact}</p>
+
+<p>以下広告のあとに記事が続きます</p>
+
+<p>詳細は公式サイトをご確認ください。</p>
+<p>※記事の情報が古い場合がありますのでお手数ですが公式サイトの情報をご確認下さい。</p>
+"""
+
+    def _store_title(self, name: str) -> str:
+        """見出しの「[名前] ポップアップストア」（イベント名に含まれていれば付けない）"""
+        if not name:
+            return "ポップアップストア"
+        if 'ポップアップ' in name or 'POP UP' in name.upper():
+            return name
+        return f"{name} ポップアップストア"
+
+    def _novelty_label(self, slots: PopupSlots) -> str:
+        """「[ノベルティ名] 全[種類数]種」"""
+        if not slots.novelty_name:
+            return ''
+        name = escape(slots.novelty_name)
+        if slots.novelty_count:
+            return f"「{name} 全{slots.novelty_count}種」"
+        return f"「{name}」"
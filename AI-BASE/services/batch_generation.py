@@ -0,0 +1,483 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from models.scraped_data import ScrapedData
+from services.llm_backend import LLMBackend, OpenAIBackend, create_llm_backend
+from services.scrape_cache import _dump_model
+
+# バッチの終了状態（OpenAI Batch APIと同じ）
+TERMINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+# Chat Completionsのエンドポイント（バッチ入力の各行に指定する）
+COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+
+
+def usage_from_body(body: Dict[str, Any]) -> Dict[str, int]:
+    """バッチ結果（JSON）のトークン数をusage_dictと同じ形式に"""
+    usage = body.get('usage') or {}
+    details = usage.get('prompt_tokens_details') or {}
+    return {
+        'prompt_tokens': usage.get('prompt_tokens', 0) or 0,
+        'completion_tokens': usage.get('completion_tokens', 0) or 0,
+        'cached_prompt_tokens': details.get('cached_tokens', 0) or 0,
+    }
+
+
+def _read_jsonl(text: str) -> List[Dict[str, Any]]:
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            try:
+                lines.append(json.loads(line))
+            except ValueError as e:
+                print(f"バッチ結果の解析エラー: {e}")
+    return lines
+
+
+class BatchBackend(ABC):
+    """バッチジョブの投入先
+
+    入力はOpenAI Batch API形式のJSONL（1行に custom_id・method・url・body）。
+    結果も同じ形式（custom_id・response.status_code・response.body・error）で返す。
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    async def submit(self, input_path: str, metadata: Optional[Dict[str, str]] = None) -> str:
+        """入力ファイルを投入し、バッチIDを返す"""
+
+    @abstractmethod
+    async def status(self, batch_id: str) -> Dict[str, Any]:
+        """{'status', 'total', 'completed', 'failed'}"""
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> List[Dict[str, Any]]:
+        """結果の各行（成功・失敗の両方）"""
+
+    async def cancel(self, batch_id: str):
+        pass
+
+    async def close(self):
+        pass
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API（Files APIで入力を渡し、完了後に出力ファイルを取得）"""
+
+    name = 'openai'
+
+    def __init__(self, llm_backend: OpenAIBackend, completion_window: Optional[str] = None):
+        self.client = llm_backend.client
+        self.completion_window = completion_window or os.getenv('BATCH_COMPLETION_WINDOW', '24h')
+
+    async def submit(self, input_path: str, metadata: Optional[Dict[str, str]] = None) -> str:
+        data = await asyncio.to_thread(self._read_file, input_path)
+        uploaded = await self.client.files.create(file=(os.path.basename(input_path), data), purpose='batch')
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=COMPLETIONS_ENDPOINT,
+            completion_window=self.completion_window,
+            metadata=metadata
+        )
+        return batch.id
+
+    def _read_file(self, path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    async def status(self, batch_id: str) -> Dict[str, Any]:
+        batch = await self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            'status': batch.status,
+            'total': getattr(counts, 'total', 0) if counts else 0,
+            'completed': getattr(counts, 'completed', 0) if counts else 0,
+            'failed': getattr(counts, 'failed', 0) if counts else 0,
+        }
+
+    async def results(self, batch_id: str) -> List[Dict[str, Any]]:
+        batch = await self.client.batches.retrieve(batch_id)
+        lines = []
+        # 成功した行は出力ファイル、失敗した行はエラーファイルに入る
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                lines.extend(_read_jsonl(content.text))
+        return lines
+
+    async def cancel(self, batch_id: str):
+        await self.client.batches.cancel(batch_id)
+
+
+class LocalBatchBackend(BatchBackend):
+    """バッチAPIのない環境用の代替（LLMバックエンドを低い同時実行数で順に呼ぶ）
+
+    OpenAI互換のモックサーバーと組み合わせると、投入・完了待ち・結果の対応付けまでを
+    オフラインで確認できる。状態はプロセス内にのみ保持する。
+    """
+
+    name = 'local'
+
+    def __init__(self, llm_backend: Optional[LLMBackend] = None, concurrency: Optional[int] = None):
+        # 渡されたバックエンドは呼び出し側が閉じる
+        self._owns_backend = llm_backend is None
+        self.llm_backend = llm_backend or create_llm_backend()
+        self.concurrency = concurrency or int(os.getenv('BATCH_LOCAL_CONCURRENCY', '2'))
+        self._batches: Dict[str, Dict[str, Any]] = {}
+
+    async def submit(self, input_path: str, metadata: Optional[Dict[str, str]] = None) -> str:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            requests = _read_jsonl(f.read())
+        batch_id = f"batch_local_{uuid.uuid4().hex[:16]}"
+        batch = {'status': 'validating', 'total': len(requests), 'completed': 0, 'failed': 0, 'results': []}
+        batch['task'] = asyncio.create_task(self._process(batch, requests))
+        self._batches[batch_id] = batch
+        return batch_id
+
+    async def _process(self, batch: Dict[str, Any], requests: List[Dict[str, Any]]):
+        batch['status'] = 'in_progress'
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(line: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    content, usage = await self.llm_backend.complete(line['body'])
+                except Exception as e:
+                    batch['failed'] += 1
+                    batch['results'].append({
+                        'custom_id': line['custom_id'],
+                        'response': None,
+                        'error': {'code': type(e).__name__, 'message': str(e)},
+                    })
+                    return
+                batch['completed'] += 1
+                batch['results'].append({
+                    'custom_id': line['custom_id'],
+                    'response': {
+                        'status_code': 200,
+                        'body': {
+                            'model': line['body'].get('model'),
+                            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                            'usage': {
+                                'prompt_tokens': usage.get('prompt_tokens', 0),
+                                'completion_tokens': usage.get('completion_tokens', 0),
+                                'prompt_tokens_details': {'cached_tokens': usage.get('cached_prompt_tokens', 0)},
+                            },
+                        },
+                    },
+                    'error': None,
+                })
+
+        await asyncio.gather(*(run(line) for line in requests))
+        batch['status'] = 'completed'
+
+    async def status(self, batch_id: str) -> Dict[str, Any]:
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            # 再起動前に投入したバッチは引き継げない
+            return {'status': 'expired', 'total': 0, 'completed': 0, 'failed': 0}
+        return {key: batch[key] for key in ('status', 'total', 'completed', 'failed')}
+
+    async def results(self, batch_id: str) -> List[Dict[str, Any]]:
+        batch = self._batches.pop(batch_id, None)
+        return batch['results'] if batch else []
+
+    async def cancel(self, batch_id: str):
+        batch = self._batches.get(batch_id)
+        if batch is not None:
+            batch['task'].cancel()
+            batch['status'] = 'cancelled'
+
+    async def close(self):
+        for batch in self._batches.values():
+            batch['task'].cancel()
+        if self._owns_backend:
+            await self.llm_backend.close()
+
+
+def create_batch_backend(llm_backend: LLMBackend, name: Optional[str] = None) -> BatchBackend:
+    """設定（BATCH_BACKEND）のバッチ投入先を生成"""
+    name = (name or os.getenv('BATCH_BACKEND', 'openai')).lower()
+    if name == 'local':
+        return LocalBatchBackend(llm_backend)
+    if name == 'openai':
+        if not isinstance(llm_backend, OpenAIBackend):
+            raise ValueError("BATCH_BACKEND=openaiにはOpenAIのLLMバックエンドが必要です")
+        return OpenAIBatchBackend(llm_backend)
+    raise ValueError(f"不明なバッチバックエンド: {name}（openai, local）")
+
+
+class BatchGenerationService:
+    """急がない記事をまとめてバッチジョブで生成する
+
+    URLごとにスクレイピングしてプロンプトを作り、1つのJSONLにまとめて投入する。
+    完了するまで一定間隔で状態を確認し、結果をcustom_idで元のURLに対応付けて
+    記事にする（対話的な生成のレート枠を使わない）。ジョブの状態は段階が進むたび・
+    記事を1件保存するたびにファイルに保存し、再起動後は途中から再開する
+    （保存済みの記事は再度保存しない）。
+    """
+
+    def __init__(
+        self,
+        scraper,
+        generator,
+        backend: Optional[BatchBackend] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        store_dir: Optional[str] = None,
+        poll_interval: Optional[float] = None,
+        scrape_concurrency: Optional[int] = None
+    ):
+        self.scraper = scraper
+        self.generator = generator
+        self._backend = backend
+        # 記事ごとに呼ぶ処理（Google Docsへの保存等）。戻り値はジョブの結果に記録する
+        self.on_result = on_result
+        self.store_dir = store_dir or os.getenv('BATCH_STORE_DIR', '.cache/batches')
+        self.poll_interval = poll_interval or float(os.getenv('BATCH_POLL_INTERVAL', '60'))
+        self.scrape_concurrency = scrape_concurrency or int(os.getenv('BATCH_SCRAPE_CONCURRENCY', '4'))
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            'jobs': 0,
+            'items': 0,
+            'items_cached': 0,
+            'items_submitted': 0,
+            'items_completed': 0,
+            'items_failed': 0,
+            'polls': 0,
+        }
+
+    @property
+    def backend(self) -> BatchBackend:
+        # 使うまで生成しない（設定が合わない場合もアプリの起動は妨げない）
+        if self._backend is None:
+            self._backend = create_batch_backend(self.generator.backend)
+        return self._backend
+
+    async def start(self):
+        """途中で終了したジョブ（スクレイピング中・完了待ち・結果の保存中）を再開"""
+        if not os.path.isdir(self.store_dir):
+            return
+        for job_id in os.listdir(self.store_dir):
+            job = self._load_job(job_id)
+            if job is not None and job['status'] in ('scraping', 'submitted', 'collecting'):
+                self._jobs[job_id] = job
+                self._tasks[job_id] = asyncio.create_task(self._run(job))
+                print(f"バッチジョブを再開: {job_id}（{job['status']}）")
+
+    async def close(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
+        if self._backend is not None:
+            await self._backend.close()
+
+    async def submit(self, urls: List[str]) -> str:
+        """URLの一覧をバッチ生成に回し、ジョブIDを返す（処理はバックグラウンドで進む）"""
+        urls = list(dict.fromkeys(url.strip() for url in urls if url.strip()))
+        job_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:8]
+        job = {
+            'job_id': job_id,
+            'status': 'scraping',
+            'created_at': time.time(),
+            'batch_id': None,
+            'items': {
+                f"{index}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}": {'url': url, 'status': 'pending'}
+                for index, url in enumerate(urls)
+            },
+        }
+        self._jobs[job_id] = job
+        self._stats['jobs'] += 1
+        self._stats['items'] += len(urls)
+        # 受け付けた時点で保存し、スクレイピング中に終了しても再起動後に続ける
+        await self._save_job(job)
+        self._tasks[job_id] = asyncio.create_task(self._run(job))
+        return job_id
+
+    async def _run(self, job: Dict[str, Any]):
+        try:
+            if job['status'] == 'scraping':
+                await self._prepare(job)
+            if job['status'] == 'submitted':
+                await self._wait(job)
+            if job['status'] == 'collecting':
+                await self._collect(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"バッチジョブエラー: {job['job_id']} ({e})")
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            await self._save_job(job)
+        finally:
+            self._tasks.pop(job['job_id'], None)
+
+    async def _prepare(self, job: Dict[str, Any]):
+        """スクレイピングしてリクエストを作り、キャッシュにないものをバッチに投入
+
+        再開時は未処理（pending）の記事だけを対象にする。
+        """
+        semaphore = asyncio.Semaphore(self.scrape_concurrency)
+
+        async def scrape(custom_id: str, item: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    return custom_id, await self.scraper.scrape_url(item['url'])
+                except Exception as e:
+                    print(f"バッチ用スクレイピングエラー: {item['url']} ({e})")
+                    item.update({'status': 'failed', 'error': str(e)})
+                    self._stats['items_failed'] += 1
+                    return custom_id, None
+
+        pending = {custom_id: item for custom_id, item in job['items'].items() if item['status'] == 'pending'}
+        scraped = dict(await asyncio.gather(*(scrape(custom_id, item) for custom_id, item in pending.items())))
+        scraped = {custom_id: data for custom_id, data in scraped.items() if data is not None}
+
+        lines = []
+        for custom_id, scraped_data in scraped.items():
+            request = self.generator.build_batch_request(scraped_data)
+            cached = await self.generator.cached_batch_result(request)
+            if cached is not None:
+                # 同じプロンプトの生成結果があればバッチに含めない
+                self._stats['items_cached'] += 1
+                result = await self.generator.complete_batch_result(scraped_data, request, cached['content'], cached.get('usage'), cached=True)
+                await self._deliver(job, job['items'][custom_id], result)
+                continue
+            lines.append({'custom_id': custom_id, 'method': 'POST', 'url': COMPLETIONS_ENDPOINT, 'body': request})
+
+        await asyncio.to_thread(self._write_inputs, job['job_id'], lines, scraped)
+        if not lines:
+            job['status'] = 'completed'
+            await self._save_job(job)
+            return
+
+        job['batch_id'] = await self.backend.submit(self._path(job['job_id'], 'input.jsonl'), {'job_id': job['job_id']})
+        job['status'] = 'submitted'
+        self._stats['items_submitted'] += len(lines)
+        print(f"バッチジョブを投入: {job['job_id']}（{len(lines)}件, {job['batch_id']}）")
+        await self._save_job(job)
+
+    async def _wait(self, job: Dict[str, Any]):
+        """バッチが終了するまで状態を確認"""
+        while True:
+            status = await self.backend.status(job['batch_id'])
+            self._stats['polls'] += 1
+            job['progress'] = status
+            if status['status'] in TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(self.poll_interval)
+        job['status'] = 'collecting'
+        await self._save_job(job)
+
+    async def _collect(self, job: Dict[str, Any]):
+        """結果をcustom_idで元のURLに対応付けて記事にする"""
+        requests, scraped = await asyncio.to_thread(self._read_inputs, job['job_id'])
+        for line in await self.backend.results(job['batch_id']):
+            custom_id = line.get('custom_id')
+            item = job['items'].get(custom_id)
+            if item is None or item['status'] != 'pending':
+                continue
+            response = line.get('response') or {}
+            if response.get('status_code') != 200:
+                error = line.get('error') or response.get('body', {}).get('error') or {}
+                item.update({'status': 'failed', 'error': error.get('message') or str(error)})
+                self._stats['items_failed'] += 1
+                continue
+            body = response['body']
+            content = body['choices'][0]['message']['content'] or ''
+            result = await self.generator.complete_batch_result(
+                scraped[custom_id], requests[custom_id], content, usage_from_body(body)
+            )
+            await self._deliver(job, item, result)
+
+        # 結果に含まれなかった行（期限切れ・取り消し）
+        for item in job['items'].values():
+            if item['status'] == 'pending':
+                item.update({'status': 'failed', 'error': f"バッチが{job.get('progress', {}).get('status')}で終了"})
+                self._stats['items_failed'] += 1
+        job['status'] = 'completed'
+        await self._save_job(job)
+
+    async def _deliver(self, job: Dict[str, Any], item: Dict[str, Any], result: Dict[str, Any]):
+        """記事をon_resultに渡し、戻り値（保存先URL等）を記録
+
+        1件ごとにジョブを保存し、途中で終了しても再開時に同じ記事を二重に保存しない。
+        """
+        try:
+            output = await self.on_result(result) if self.on_result is not None else None
+        except Exception as e:
+            print(f"バッチ生成記事の保存エラー: {item['url']} ({e})")
+            item.update({'status': 'failed', 'error': str(e)})
+            self._stats['items_failed'] += 1
+        else:
+            item.update({'status': 'done', 'output': output, 'generation': result.get('generation')})
+            self._stats['items_completed'] += 1
+        await self._save_job(job)
+
+    def _path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.store_dir, job_id, name)
+
+    def _write_inputs(self, job_id: str, lines: List[Dict[str, Any]], scraped: Dict[str, ScrapedData]):
+        """バッチ入力と、結果の対応付けに使うスクレイピング結果を保存"""
+        os.makedirs(os.path.join(self.store_dir, job_id), exist_ok=True)
+        with open(self._path(job_id, 'input.jsonl'), 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+        with open(self._path(job_id, 'scraped.json'), 'w', encoding='utf-8') as f:
+            json.dump({custom_id: _dump_model(data) for custom_id, data in scraped.items()}, f, ensure_ascii=False, default=str)
+
+    def _read_inputs(self, job_id: str):
+        """投入したリクエストとスクレイピング結果（custom_idごと）を読み込む"""
+        requests = {}
+        with open(self._path(job_id, 'input.jsonl'), 'r', encoding='utf-8') as f:
+            for line in _read_jsonl(f.read()):
+                requests[line['custom_id']] = line['body']
+        with open(self._path(job_id, 'scraped.json'), 'r', encoding='utf-8') as f:
+            scraped = {custom_id: ScrapedData(**data) for custom_id, data in json.load(f).items()}
+        return requests, scraped
+
+    async def _save_job(self, job: Dict[str, Any]):
+        payload = json.dumps(job, ensure_ascii=False, default=str)
+        await asyncio.to_thread(self._write_job, job['job_id'], payload)
+
+    def _write_job(self, job_id: str, payload: str):
+        os.makedirs(os.path.join(self.store_dir, job_id), exist_ok=True)
+        path = self._path(job_id, 'job.json')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"バッチジョブ保存エラー: {e}")
+
+    def _load_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(job_id, 'job.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """ジョブの状態（メモリになければ保存したファイルから）"""
+        if os.path.basename(job_id) != job_id:
+            return None
+        return self._jobs.get(job_id) or self._load_job(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """バッチ生成の統計情報"""
+        return {
+            **self._stats,
+            'backend': self._backend.name if self._backend is not None else os.getenv('BATCH_BACKEND', 'openai'),
+            'active_jobs': len(self._tasks),
+            'poll_interval': self.poll_interval,
+        }
@@ -0,0 +1,132 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+
+class BrowserPool:
+    """常駐Chromiumのプール（リクエストごとに新しいコンテキスト・ページを貸し出す）
+
+    起動に時間のかかるブラウザは使い回し、コンテキストはリクエストごとに作り直す。
+    Cookie・localStorage・sessionStorage・HTTPキャッシュ等をサイト間で持ち越さない。
+    """
+
+    def __init__(
+        self,
+        max_pages: Optional[int] = None,
+        headless: bool = True
+    ):
+        self.max_pages = max_pages or int(os.getenv('BROWSER_POOL_MAX_PAGES', '4'))
+        self.headless = headless
+
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._semaphore = asyncio.Semaphore(self.max_pages)
+        self._start_lock = asyncio.Lock()
+
+        self._stats = {
+            'browser_launches': 0,
+            'contexts_created': 0,
+            'pages_served': 0,
+            'active_pages': 0,
+            'crashes': 0,
+            'disconnects': 0,
+            'page_errors': 0,
+            'wait_time_total': 0.0,
+        }
+
+    @property
+    def is_running(self) -> bool:
+        """ブラウザが起動中かどうか"""
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self):
+        """Playwrightとブラウザを起動（起動済み・接続中なら何もしない）"""
+        async with self._start_lock:
+            if self.is_running:
+                return
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._stats['browser_launches'] += 1
+            print(f"ブラウザプール起動: 最大{self.max_pages}ページ")
+
+    async def close(self):
+        """ブラウザを終了"""
+        async with self._start_lock:
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    print(f"ブラウザ終了エラー: {e}")
+                self._browser = None
+
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    @asynccontextmanager
+    async def page(self):
+        """新しいコンテキスト上のページを貸し出す（同時ページ数は上限まで）"""
+        wait_started = time.monotonic()
+        async with self._semaphore:
+            self._stats['wait_time_total'] += time.monotonic() - wait_started
+
+            await self.start()
+            context = await self._browser.new_context()
+            self._stats['contexts_created'] += 1
+
+            crashed = False
+            self._stats['active_pages'] += 1
+            try:
+                page = await context.new_page()
+
+                def _on_crash(_page):
+                    nonlocal crashed
+                    crashed = True
+
+                page.on('crash', _on_crash)
+                self._stats['pages_served'] += 1
+                yield page
+            except Exception:
+                # 読み込みのタイムアウト等（クラッシュとは数えない）
+                self._stats['page_errors'] += 1
+                raise
+            finally:
+                self._stats['active_pages'] -= 1
+                # クラッシュはページのcrashイベントとブラウザの切断だけを数える
+                if crashed:
+                    self._stats['crashes'] += 1
+                elif not self.is_running:
+                    self._stats['disconnects'] += 1
+                await self._close_context(context)
+
+    async def _close_context(self, context: BrowserContext):
+        """コンテキストを閉じる（失敗は無視）"""
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """プールの統計情報"""
+        return {
+            **self._stats,
+            'running': self.is_running,
+            'max_pages': self.max_pages,
+        }
+
+
+_shared_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """プロセス内で共有するBrowserPoolを取得"""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = BrowserPool()
+    return _shared_pool
@@ -0,0 +1,193 @@
+import os
+import re
+from collections import Counter
+from typing import Optional, Dict, Any, List, Tuple
+from bs4 import NavigableString
+
+# 配下ごと読み飛ばすタグ（ナビゲーション・フッター・スクリプト等のサイト共通部分）
+SKIP_TAGS = {
+    'script', 'style', 'noscript', 'template', 'nav', 'aside', 'footer', 'form',
+    'iframe', 'svg', 'button', 'select', 'option', 'textarea', 'head', 'title', 'meta', 'link'
+}
+
+# ブロックを区切らない（親ブロックのテキストとして扱う）インライン要素
+INLINE_TAGS = {
+    'a', 'span', 'strong', 'b', 'em', 'i', 'u', 's', 'small', 'big', 'mark', 'font',
+    'sup', 'sub', 'time', 'label', 'abbr', 'cite', 'code', 'q', 'ruby', 'rb', 'rt', 'rp',
+    'br', 'wbr', 'img', 'picture', 'source', 'data', 'var', 'kbd', 'del', 'ins'
+}
+
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4'}
+
+# 商品一覧・開催情報の表や箇条書き
+LIST_TAGS = {'li', 'tr', 'td', 'th', 'dt', 'dd'}
+
+# 表の行は「項目名 値」を1行にまとめる
+ROW_CELL_TAGS = {'td', 'th'}
+
+# class/idに含まれると本文らしさが上がる・下がる語（上がる語を先に判定する）
+# popup・bannerはポップアップストアやキャンペーン告知の本文にも使われるため下がる語に含めない
+POSITIVE_HINT_PATTERN = re.compile(
+    r'content|article|main|entry|post|body|detail|event|goods|item|product|merchandise|'
+    r'news|info|schedule|venue|novelty|campaign|popup|collaboration|character|gallery|'
+    r'limited|featured|shop|store',
+    re.IGNORECASE
+)
+NEGATIVE_HINT_PATTERN = re.compile(
+    r'nav|menu|header|footer|breadcrumb|cookie|consent|share|sns|social|related|'
+    r'recommend|ranking|carousel|slider|swiper|pager|pagination|sidebar|side-|widget|'
+    r'\bads?\b|\bad-|advert|modal|overlay|login|signup|cart|comment|tag-?list|copyright',
+    re.IGNORECASE
+)
+
+# 開催情報・グッズ情報に現れる語（ポップアップストア記事で残したい内容）
+CONTENT_KEYWORDS = [
+    '開催', '期間', '会期', '日時', '日程', '会場', '場所', '住所', 'アクセス', '営業時間',
+    '販売', 'グッズ', '商品', '特典', 'ノベルティ', '配布', '先着', '価格', '円', '税込',
+    '予約', '抽選', '整理券', '入場', '購入', '限定', '描き下ろし', 'コラボ', 'ポップアップ',
+    'POP UP', 'POPUP', '〜', '～',
+]
+CONTENT_KEYWORD_PATTERN = re.compile('|'.join(re.escape(keyword) for keyword in CONTENT_KEYWORDS), re.IGNORECASE)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+PUNCTUATION_PATTERN = re.compile(r'[。、．，,.!?！？]')
+
+
+class TextBlock:
+    """本文候補のブロック（ブロック要素直下のテキストをまとめたもの）"""
+
+    __slots__ = ('tag', 'parts', 'link_chars', 'hint', 'in_main')
+
+    def __init__(self, tag: str, hint: int, in_main: bool):
+        self.tag = tag
+        self.parts: List[str] = []
+        self.link_chars = 0
+        self.hint = hint
+        self.in_main = in_main
+
+
+class ContentDistiller:
+    """ブロック単位のスコアリングで本文を抽出する
+
+    開催概要・グッズ一覧・特典・会場情報のブロックを残し、ナビゲーションや
+    繰り返し現れるサイト共通部分を除く。
+    """
+
+    def __init__(self, min_score: Optional[float] = None, min_chars: Optional[int] = None, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.getenv('CONTENT_DISTILL_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.min_score = min_score if min_score is not None else float(os.getenv('CONTENT_DISTILL_MIN_SCORE', '1.5'))
+        # 抽出結果がこれより短い場合は抽出に失敗したとみなし全文を使う
+        self.min_chars = min_chars if min_chars is not None else int(os.getenv('CONTENT_DISTILL_MIN_CHARS', '200'))
+
+    def distill(self, soup, main_content=None) -> Optional[str]:
+        """本文ブロックを文書順に改行区切りで連結（抽出結果が短すぎる場合はNone）"""
+        blocks = self._collect_blocks(soup, main_content)
+
+        texts = []
+        for block in blocks:
+            text = WHITESPACE_PATTERN.sub(' ', ''.join(block.parts)).strip()
+            texts.append(text)
+
+        # 同じ文言が複数回現れる短いブロックはメニュー等の繰り返し部分
+        repeated = Counter(text for text in texts if text and len(text) < 100)
+
+        kept = []
+        seen = set()
+        for block, text in zip(blocks, texts):
+            if not text or text in seen:
+                continue
+            if repeated[text] > 1 and not CONTENT_KEYWORD_PATTERN.search(text):
+                continue
+            if self._score(block, text) >= self.min_score:
+                kept.append(text)
+                seen.add(text)
+
+        distilled = '\n'.join(kept)
+        if len(distilled) < self.min_chars:
+            return None
+        return distilled
+
+    def _collect_blocks(self, soup, main_content) -> List[TextBlock]:
+        """DOMを1回走査し、テキストを最も近いブロック要素ごとにまとめる"""
+        blocks: List[TextBlock] = []
+        main_key = id(main_content) if main_content is not None else None
+        root = TextBlock('root', 0, False)
+        blocks.append(root)
+
+        # (ノード, 所属ブロック, リンク内か, class/idによる重み, 本文エリア内か)
+        stack: List[Tuple[Any, TextBlock, bool, int, bool]] = [
+            (child, root, False, 0, False) for child in reversed(soup.contents)
+        ]
+        while stack:
+            node, block, in_link, hint, in_main = stack.pop()
+
+            if node.name is None:
+                # コメント・CDATA等は除く
+                if type(node) is NavigableString:
+                    block.parts.append(node)
+                    if in_link:
+                        block.link_chars += len(node.strip())
+                continue
+
+            name = node.name
+            if name in SKIP_TAGS:
+                continue
+
+            attrs = node.attrs
+            if attrs.get('hidden') is not None or attrs.get('aria-hidden') == 'true':
+                continue
+
+            classes = attrs.get('class') or ()
+            if isinstance(classes, str):
+                classes = classes.split()
+            hint_text = ' '.join(classes) + ' ' + (attrs.get('id') or '')
+            if name == 'header':
+                hint -= 2
+            elif hint_text.strip():
+                if POSITIVE_HINT_PATTERN.search(hint_text):
+                    hint += 1
+                elif NEGATIVE_HINT_PATTERN.search(hint_text):
+                    hint -= 3
+
+            in_main = in_main or id(node) == main_key
+            if name in ROW_CELL_TAGS and block.tag == 'tr':
+                block.parts.append(' ')
+            elif name not in INLINE_TAGS:
+                block = TextBlock(name, hint, in_main)
+                blocks.append(block)
+            elif name == 'br':
+                block.parts.append(' ')
+
+            child_in_link = in_link or name == 'a'
+            for child in reversed(node.contents):
+                stack.append((child, block, child_in_link, hint, in_main))
+
+        return blocks
+
+    def _score(self, block: TextBlock, text: str) -> float:
+        """本文らしさのスコア（長さ・句読点・開催情報の語・位置・リンク密度）"""
+        score = min(len(text) / 40, 3.0)
+        score += min(len(PUNCTUATION_PATTERN.findall(text)) * 0.5, 2.0)
+        score += min(len(CONTENT_KEYWORD_PATTERN.findall(text)), 3) * 1.0
+        score += max(min(block.hint, 2), -6)
+
+        if block.in_main:
+            score += 1.0
+        if block.tag in HEADING_TAGS:
+            score += 1.5
+        elif block.tag in LIST_TAGS:
+            score += 0.5
+
+        link_density = block.link_chars / max(len(text), 1)
+        score -= min(link_density, 1.0) * 4
+        return score
+
+    def get_report(self, before: str, after: Optional[str]) -> Dict[str, Any]:
+        """抽出前後の文字数"""
+        return {
+            'content_chars_before': len(before),
+            'content_chars_after': len(after) if after is not None else len(before),
+            'content_distilled': after is not None,
+        }
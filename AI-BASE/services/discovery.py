@@ -0,0 +1,367 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from urllib.parse import urlparse, urljoin, urldefrag
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from services.html_document import ParsedDocument, sniff_charset, decode_html
+from services.scrape_cache import normalize_url
+from services.site_profiles import site_domain
+
+# 一覧ページ内の記事リンクらしさを示す語（URL・リンクテキスト）
+DETAIL_LINK_KEYWORDS = [
+    'popup', 'pop-up', 'pop_up', 'event', 'news', 'info', 'topics', 'campaign', 'collabo',
+    'ポップアップ', 'POP UP', 'POPUP', '開催', 'コラボ', 'フェア', 'ストア', '期間限定',
+]
+DETAIL_LINK_PATTERN = re.compile('|'.join(re.escape(keyword) for keyword in DETAIL_LINK_KEYWORDS), re.IGNORECASE)
+
+# ページ送り・カテゴリ一覧等、記事ではないリンク
+LISTING_PATH_PATTERN = re.compile(r'/(page|category|tag|archive|archives|list)(/|$)|[?&](page|p|paged)=', re.IGNORECASE)
+
+NON_PAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.pdf', '.zip', '.css', '.js')
+
+# 一覧ページ内の記事リンクの上限
+MAX_ENTRIES_PER_INDEX = 200
+
+
+def entry_fingerprint(url: str) -> str:
+    """記事URLの指紋（正規化URLのハッシュ）"""
+    return hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()[:16]
+
+
+def extract_entries(content, index_url: str, pattern: Optional[str] = None) -> List[str]:
+    """一覧ページから記事（詳細ページ）へのリンクを文書順に抽出
+
+    patternを指定した場合はURLがそれに一致するリンクのみ、指定しない場合は
+    一覧ページと同じサイトで、一覧ページ配下のパスか記事らしい語を含むリンクを使う。
+    """
+    doc = ParsedDocument(content, index_url)
+    compiled = re.compile(pattern) if pattern else None
+    site = site_domain(index_url)
+    index_page = urldefrag(index_url)[0]
+    index_path = urlparse(index_url).path
+    index_dir = index_path if index_path.endswith('/') else index_path.rsplit('/', 1)[0] + '/'
+
+    entries = []
+    for anchor in doc.soup.find_all('a', href=True):
+        href = anchor['href'].strip()
+        if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
+            continue
+        url = urldefrag(urljoin(index_url, href))[0]
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or url == index_page:
+            continue
+
+        if compiled is not None:
+            if compiled.search(url):
+                entries.append(url)
+            continue
+
+        if site_domain(url) != site or parsed.path in ('', '/'):
+            continue
+        if parsed.path.lower().endswith(NON_PAGE_EXTENSIONS) or LISTING_PATH_PATTERN.search(url):
+            continue
+        if anchor.find_parent(['nav', 'header', 'footer']) is not None:
+            continue
+
+        under_index = parsed.path.startswith(index_dir) and parsed.path.rstrip('/') != index_path.rstrip('/')
+        text = anchor.get_text(' ', strip=True)
+        if under_index or DETAIL_LINK_PATTERN.search(f"{parsed.path} {text}"):
+            entries.append(url)
+
+    return list(dict.fromkeys(entries))[:MAX_ENTRIES_PER_INDEX]
+
+
+class DiscoveryService:
+    """一覧ページを定期的に巡回し、新しいポップアップ記事のURLを記事生成キューに入れる
+
+    既に見た記事は指紋としてローカルに保存し、一覧ページ自体は条件付きGET
+    （ETag / Last-Modified）で未更新なら解析しない。同時実行数を制限し、
+    同じホストへの送信間隔はHttpClientのホスト別スケジューラに従う。
+    """
+
+    def __init__(
+        self,
+        scraper,
+        generate: Optional[Callable[[str], Awaitable[Any]]] = None,
+        index_pages: Optional[List[Dict[str, Any]]] = None,
+        store_path: Optional[str] = None,
+        interval: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        generation_workers: Optional[int] = None,
+        queue_existing: Optional[bool] = None,
+        enabled: Optional[bool] = None
+    ):
+        if enabled is None:
+            enabled = os.getenv('DISCOVERY_ENABLED', 'false').lower() == 'true'
+        self.enabled = enabled
+        self.scraper = scraper
+        # 新しい記事URLごとに呼ぶ処理（スクレイピング→記事生成→保存）
+        self.generate = generate
+        self.index_pages = index_pages if index_pages is not None else self._load_index_pages()
+        self.store_path = store_path or os.getenv('DISCOVERY_STORE_PATH', '.cache/discovery.json')
+        self.interval = interval or float(os.getenv('DISCOVERY_INTERVAL', '1800'))
+        self.max_concurrency = max_concurrency or int(os.getenv('DISCOVERY_CONCURRENCY', '8'))
+        self.generation_workers = generation_workers or int(os.getenv('DISCOVERY_GENERATION_WORKERS', '1'))
+        # 初回巡回時に一覧に載っている既存の記事も生成するか（通常は既読扱いにする）
+        if queue_existing is None:
+            queue_existing = os.getenv('DISCOVERY_QUEUE_EXISTING', 'false').lower() == 'true'
+        self.queue_existing = queue_existing
+        self.seen_ttl = float(os.getenv('DISCOVERY_SEEN_TTL_DAYS', '180')) * 86400
+
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._store: Optional[Dict[str, Any]] = None
+        self._save_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._tasks: List[asyncio.Task] = []
+        self._run_lock = asyncio.Lock()
+        self._stats = {
+            'runs': 0,
+            'index_fetched': 0,
+            'index_not_modified': 0,
+            'index_unchanged': 0,
+            'index_errors': 0,
+            'entries_found': 0,
+            'entries_new': 0,
+            'generated': 0,
+            'generation_errors': 0,
+            'last_run_seconds': None,
+        }
+
+    def _load_index_pages(self) -> List[Dict[str, Any]]:
+        """巡回する一覧ページ（DISCOVERY_INDEX_URLS・DISCOVERY_INDEX_FILE）"""
+        pages = [
+            {'url': url.strip()} for url in os.getenv('DISCOVERY_INDEX_URLS', '').split(',') if url.strip()
+        ]
+        path = os.getenv('DISCOVERY_INDEX_FILE', '')
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    # ["https://...", {"url": "https://...", "pattern": "/news/\\d+"}] の形式
+                    for entry in json.load(f):
+                        pages.append({'url': entry} if isinstance(entry, str) else entry)
+            except (OSError, ValueError) as e:
+                print(f"一覧ページ設定読み込みエラー: {e}")
+        return pages
+
+    def _load(self) -> Dict[str, Any]:
+        """既読の記事と一覧ページの検証子を読み込む（初回のみ）"""
+        if self._store is None:
+            try:
+                with open(self.store_path, 'r', encoding='utf-8') as f:
+                    self._store = json.load(f)
+            except FileNotFoundError:
+                self._store = {}
+            except (OSError, ValueError) as e:
+                print(f"既読ストア読み込みエラー: {e}")
+                self._store = {}
+            self._store.setdefault('indexes', {})
+            self._store.setdefault('seen', {})
+        return self._store
+
+    async def start(self):
+        """記事生成ワーカーと定期巡回を開始（無効時も手動巡回の結果は生成する）
+
+        前回の終了時に生成待ちだった記事はキューに戻す。
+        """
+        if self._tasks:
+            return
+        store = self._load()
+        pending = [entry['url'] for entry in store['seen'].values() if entry.get('status') == 'queued']
+        for url in pending:
+            self.queue.put_nowait(url)
+        if pending:
+            print(f"生成待ちの記事をキューに戻しました: {len(pending)}件")
+        for _ in range(self.generation_workers):
+            self._tasks.append(asyncio.create_task(self._generation_worker()))
+        if self.enabled and self.index_pages:
+            self._tasks.append(asyncio.create_task(self._schedule_loop()))
+            print(f"一覧ページ巡回を開始: {len(self.index_pages)}ページ / {self.interval:.0f}秒ごと")
+
+    async def close(self):
+        """巡回・生成タスクを停止"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _schedule_loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"一覧ページ巡回エラー: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> List[str]:
+        """全一覧ページを1回巡回し、キューに入れた新しい記事URLを返す"""
+        async with self._run_lock:
+            self._stats['runs'] += 1
+            started = time.monotonic()
+            store = self._load()
+            results = await asyncio.gather(
+                *(self._visit_index(page) for page in self.index_pages),
+                return_exceptions=True
+            )
+
+            new_urls = []
+            for page, result in zip(self.index_pages, results):
+                if isinstance(result, Exception):
+                    self._stats['index_errors'] += 1
+                    print(f"一覧ページ取得エラー: {page.get('url')} ({result})")
+                    continue
+                new_urls.extend(result)
+
+            self._prune(store)
+            await self._save()
+            self._stats['last_run_seconds'] = round(time.monotonic() - started, 2)
+            if new_urls:
+                print(f"新しい記事を検出: {len(new_urls)}件")
+            return new_urls
+
+    async def _visit_index(self, page: Dict[str, Any]) -> List[str]:
+        """一覧ページを取得し、未読の記事URLをキューに入れる"""
+        url = page['url']
+        store = self._load()
+        index_state = store['indexes'].get(url, {})
+
+        headers = {}
+        if index_state.get('etag'):
+            headers['If-None-Match'] = index_state['etag']
+        if index_state.get('last_modified'):
+            headers['If-Modified-Since'] = index_state['last_modified']
+
+        # 同じホストへの送信間隔はHttpClientのホスト別スケジューラが制御する
+        async with self._semaphore:
+            response = await self.scraper.http_client.get_capped(
+                url, self.scraper.max_page_bytes, headers=headers or None, timeout=10
+            )
+        if response.status_code == 304:
+            self._stats['index_not_modified'] += 1
+            self._touch_index(store, url)
+            return []
+        response.raise_for_status()
+        self._stats['index_fetched'] += 1
+
+        content = response.content
+        charset = sniff_charset(content, response.headers.get('content-type', ''))
+        content = decode_html(content, charset)
+        entries = await asyncio.to_thread(extract_entries, content, url, page.get('pattern'))
+        self._stats['entries_found'] += len(entries)
+
+        # 検証子が使えないサイトでも、記事リンクが変わっていなければ何もしない
+        digest = hashlib.sha1('\n'.join(entries).encode('utf-8')).hexdigest()
+        first_visit = url not in store['indexes']
+        store['indexes'][url] = {
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+            'digest': digest,
+            'checked_at': time.time(),
+        }
+        if index_state.get('digest') == digest:
+            self._stats['index_unchanged'] += 1
+            self._touch_index(store, url)
+            return []
+
+        now = time.time()
+        new_urls = []
+        for entry_url in entries:
+            fingerprint = entry_fingerprint(entry_url)
+            entry = store['seen'].get(fingerprint)
+            if entry is not None:
+                # 一覧に載り続けている記事は期限切れで削除しない
+                entry['last_seen'] = now
+                continue
+            # 生成が終わるまでは生成待ち（再起動後もキューに戻す）として保存する
+            skip = first_visit and not self.queue_existing
+            store['seen'][fingerprint] = {
+                'url': entry_url,
+                'index': url,
+                'first_seen': now,
+                'last_seen': now,
+                'status': 'skipped' if skip else 'queued',
+            }
+            if skip:
+                continue
+            new_urls.append(entry_url)
+            self.queue.put_nowait(entry_url)
+
+        self._stats['entries_new'] += len(new_urls)
+        return new_urls
+
+    async def _generation_worker(self):
+        """キューの記事URLを順に記事生成へ渡す"""
+        while True:
+            url = await self.queue.get()
+            try:
+                if self.generate is not None:
+                    print(f"検出した記事の生成を開始: {url}")
+                    await self.generate(url)
+                    self._stats['generated'] += 1
+                self._mark_generated(url)
+            except Exception as e:
+                self._stats['generation_errors'] += 1
+                print(f"検出した記事の生成エラー: {url} ({e})")
+                self._forget(url)
+            finally:
+                self.queue.task_done()
+            await self._save()
+
+    def _mark_generated(self, url: str):
+        """生成が終わった記事を生成済みにする"""
+        entry = self._load()['seen'].get(entry_fingerprint(url))
+        if entry is not None:
+            entry['status'] = 'generated'
+
+    def _touch_index(self, store: Dict[str, Any], index_url: str):
+        """一覧ページが変わっていない場合、その一覧の記事はすべて載り続けているとみなす"""
+        now = time.time()
+        for entry in store['seen'].values():
+            if entry.get('index') == index_url:
+                entry['last_seen'] = now
+
+    def _forget(self, url: str):
+        """生成に失敗した記事を未読に戻し、次回の巡回で再度キューに入れる"""
+        store = self._load()
+        entry = store['seen'].pop(entry_fingerprint(url), None)
+        if entry is not None:
+            # 一覧ページが未更新でも解析し直すよう検証子を破棄（初回巡回の扱いにはしない）
+            store['indexes'][entry['index']] = {}
+
+    def _prune(self, store: Dict[str, Any]):
+        """一覧から消えて期限が過ぎた既読記事を削除（生成待ちの記事は残す）"""
+        cutoff = time.time() - self.seen_ttl
+        store['seen'] = {
+            fingerprint: entry for fingerprint, entry in store['seen'].items()
+            if entry.get('status') == 'queued' or entry.get('last_seen', entry['first_seen']) >= cutoff
+        }
+
+    async def _save(self):
+        """既読ストアをファイルに保存"""
+        payload = json.dumps(self._store, ensure_ascii=False)
+        async with self._save_lock:
+            await asyncio.to_thread(self._write, payload)
+
+    def _write(self, payload: str):
+        directory = os.path.dirname(self.store_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.store_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.store_path)
+        except OSError as e:
+            print(f"既読ストア保存エラー: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """一覧ページ巡回の統計情報"""
+        return {
+            **self._stats,
+            'enabled': self.enabled,
+            'index_pages': len(self.index_pages),
+            'queued': self.queue.qsize(),
+            'seen': len(self._store['seen']) if self._store is not None else None,
+        }
@@ -1,5 +1,4 @@
 import os
-import requests
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
@@ -7,16 +6,19 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 import pickle
 import base64
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import tempfile
 import urllib.request
 import re
 from datetime import datetime
+from services.http_client import HttpClient, get_http_client
 
 class GoogleDocsService:
     """Google Docs連携サービス"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[HttpClient] = None):
+        # 画像ダウンロードはWebScraperと接続プールを共有する
+        self.http_client = http_client or get_http_client()
         self.SCOPES = [
             'https://www.googleapis.com/auth/documents',
             'https://www.googleapis.com/auth/drive'
@@ -821,7 +823,7 @@ class GoogleDocsService:
             print(f"画像ダウンロード開始: {image_url}")
             
             # 画像の形式とサイズをチェック
-            response = requests.head(image_url, timeout=15, allow_redirects=True)
+            response = await self.http_client.head(image_url, timeout=15)
             content_type = response.headers.get('content-type', '')
             content_length = int(response.headers.get('content-length', 0))
             
@@ -853,7 +855,7 @@ class GoogleDocsService:
             
             with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
                 print(f"画像ダウンロード中...")
-                response = requests.get(image_url, timeout=30, allow_redirects=True)
+                response = await self.http_client.get(image_url, timeout=30)
                 response.raise_for_status()
                 tmp_file.write(response.content)
                 tmp_file_path = tmp_file.name
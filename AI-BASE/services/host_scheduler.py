@@ -0,0 +1,302 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+
+# Retry-Afterを見るステータス
+RETRY_STATUSES = {429, 503}
+
+
+def _host_key(url: str) -> str:
+    """スケジューリング単位のホスト（ポート込み、小文字）"""
+    return urlparse(url).netloc.lower()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After（秒数またはHTTP日付）を待ち時間（秒）に変換"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def parse_crawl_delay(robots_txt: str) -> Optional[float]:
+    """robots.txtの「User-agent: *」グループのCrawl-delay（秒。小数も可）"""
+    agents, in_agents, delay = set(), False, None
+    for line in robots_txt.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        key, value = (part.strip() for part in line.split(':', 1))
+        key = key.lower()
+        if key == 'user-agent':
+            # 連続するUser-agent行は同じグループ
+            if not in_agents:
+                agents = set()
+            agents.add(value)
+            in_agents = True
+            continue
+        in_agents = False
+        if key == 'crawl-delay' and '*' in agents:
+            try:
+                delay = float(value)
+            except ValueError:
+                pass
+    return delay
+
+
+def parse_host_limits(spec: str) -> Dict[str, Tuple[int, float]]:
+    """"example.com=1:0.5,shop.example.jp=2:1" を {ホスト: (同時接続数, 毎秒リクエスト数)} に"""
+    limits = {}
+    for entry in spec.split(','):
+        if '=' not in entry:
+            continue
+        host, values = entry.split('=', 1)
+        concurrency, _, rps = values.partition(':')
+        try:
+            limits[host.strip().lower()] = (int(concurrency), float(rps) if rps else 0.0)
+        except ValueError:
+            print(f"ホスト別制限の設定エラー: {entry}")
+    return limits
+
+
+class TokenBucket:
+    """トークンバケット（待ち時間を予約して返すので、同時に待つリクエストも順番に間隔が空く）"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, cost: float = 1) -> float:
+        """トークンをcost個取り、使えるまでの待ち時間（秒）を返す"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(cost, self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def refund(self, cost: float):
+        """予約したトークンのうち使わなかった分を戻す"""
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+
+class HostState:
+    """ホストごとの同時接続数・送信間隔・一時停止の状態"""
+
+    __slots__ = ('semaphore', 'bucket', 'blocked_until', 'robots_checked', 'robots_lock', 'crawl_delay',
+                 'requests', 'wait_seconds', 'max_wait')
+
+    def __init__(self, concurrency: int, rate: float, burst: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.blocked_until = 0.0
+        self.robots_checked = 0.0
+        self.robots_lock = asyncio.Lock()
+        self.crawl_delay: Optional[float] = None
+        self.requests = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+
+
+class HostScheduler:
+    """外部ホストへのリクエストをホスト単位で制御する
+
+    ホストごとに同時接続数とトークンバケットによる毎秒リクエスト数を制限し、
+    429/503のRetry-Afterの間はそのホストへの送信を止める。robots.txtの
+    Crawl-delayはキャッシュして送信間隔に反映する。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        burst: Optional[float] = None,
+        respect_robots: Optional[bool] = None,
+        robots_ttl: Optional[float] = None,
+        max_retry_after: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        host_limits: Optional[Dict[str, Tuple[int, float]]] = None,
+        robots_fetcher: Optional[Callable[[str], Awaitable[Optional[str]]]] = None,
+        enabled: Optional[bool] = None
+    ):
+        if enabled is None:
+            enabled = os.getenv('HOST_SCHEDULER_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.max_concurrency = max_concurrency or int(os.getenv('HOST_MAX_CONCURRENCY', '4'))
+        self.requests_per_second = requests_per_second if requests_per_second is not None else float(os.getenv('HOST_REQUESTS_PER_SECOND', '4'))
+        self.burst = burst or float(os.getenv('HOST_BURST', '4'))
+        if respect_robots is None:
+            respect_robots = os.getenv('HOST_RESPECT_ROBOTS', 'true').lower() == 'true'
+        self.respect_robots = respect_robots
+        self.robots_ttl = robots_ttl or float(os.getenv('HOST_ROBOTS_TTL', '86400'))
+        # これより長いRetry-Afterは待たずにそのまま失敗させる（ホストは停止させる）
+        self.max_retry_after = max_retry_after if max_retry_after is not None else float(os.getenv('HOST_MAX_RETRY_AFTER', '30'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('HOST_MAX_RETRIES', '1'))
+        # Retry-Afterのない429で止める秒数
+        self.default_backoff = float(os.getenv('HOST_DEFAULT_BACKOFF', '5'))
+        # 極端に長いCrawl-delayで画像取得等が止まらないよう上限を設ける
+        self.max_crawl_delay = float(os.getenv('HOST_MAX_CRAWL_DELAY', '5'))
+        self.host_limits = host_limits if host_limits is not None else parse_host_limits(os.getenv('HOST_LIMITS', ''))
+        # robots.txtの取得（HttpClientがスケジューラを通さずに取得する関数を登録する）
+        self.robots_fetcher = robots_fetcher
+
+        self._hosts: Dict[str, HostState] = {}
+        self._stats = {
+            'requests': 0,
+            'waited': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'retry_after': 0,
+            'retries': 0,
+            'robots_fetched': 0,
+            'robots_crawl_delays': 0,
+        }
+
+    def _limits(self, host: str) -> Tuple[int, float]:
+        """ホストの(同時接続数, 毎秒リクエスト数)（HOST_LIMITSはサブドメインにも適用）"""
+        name = host.split(':', 1)[0]
+        for pattern, limits in self.host_limits.items():
+            if name == pattern or name.endswith('.' + pattern):
+                return limits
+        return self.max_concurrency, self.requests_per_second
+
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            concurrency, rate = self._limits(host)
+            state = HostState(concurrency, rate, self.burst)
+            self._hosts[host] = state
+        return state
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """ホストの送信枠を確保してからリクエストする（async withで使用）"""
+        host = _host_key(url)
+        state = self._state(host)
+        started = time.monotonic()
+
+        if self.respect_robots and self.robots_fetcher is not None:
+            await self._apply_robots(url, state)
+
+        async with state.semaphore:
+            wait = state.bucket.reserve()
+            blocked = state.blocked_until - time.monotonic()
+            if blocked > wait:
+                wait = blocked
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._record_wait(state, time.monotonic() - started)
+            yield
+
+    def _record_wait(self, state: HostState, waited: float):
+        state.requests += 1
+        state.wait_seconds += waited
+        state.max_wait = max(state.max_wait, waited)
+        self._stats['requests'] += 1
+        self._stats['wait_seconds'] += waited
+        if waited >= 0.001:
+            self._stats['waited'] += 1
+        self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited)
+
+    async def _apply_robots(self, url: str, state: HostState):
+        """robots.txtのCrawl-delayを取得して送信間隔に反映（TTLの間はキャッシュ）"""
+        if state.robots_checked and time.monotonic() - state.robots_checked < self.robots_ttl:
+            return
+        async with state.robots_lock:
+            if state.robots_checked and time.monotonic() - state.robots_checked < self.robots_ttl:
+                return
+            parsed = urlparse(url)
+            delay = None
+            try:
+                text = await self.robots_fetcher(f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+                self._stats['robots_fetched'] += 1
+                if text:
+                    delay = parse_crawl_delay(text)
+            except Exception as e:
+                print(f"robots.txt取得エラー: {parsed.netloc} ({e})")
+            state.robots_checked = time.monotonic()
+
+            state.crawl_delay = min(delay, self.max_crawl_delay) if delay else None
+            # Crawl-delayの方が厳しい場合のみ間隔を広げる（1件ずつ送る）
+            _, rate = self._limits(_host_key(url))
+            if state.crawl_delay and (rate <= 0 or 1.0 / state.crawl_delay < rate):
+                state.bucket.rate = 1.0 / state.crawl_delay
+                state.bucket.capacity = 1
+                state.bucket.tokens = min(state.bucket.tokens, 1)
+                self._stats['robots_crawl_delays'] += 1
+            else:
+                state.bucket.rate = rate
+                state.bucket.capacity = self.burst
+
+    def note_response(self, url: str, status_code: int, headers) -> Optional[float]:
+        """レスポンスを記録し、Retry-Afterに従って再試行する場合はその待ち時間を返す"""
+        if status_code not in RETRY_STATUSES:
+            return None
+        delay = parse_retry_after(headers.get('retry-after'))
+        if delay is None:
+            if status_code != 429:
+                return None
+            delay = self.default_backoff
+
+        self._stats['retry_after'] += 1
+        state = self._state(_host_key(url))
+        state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+        print(f"{_host_key(url)} から{status_code}応答: {delay:.1f}秒間送信を停止")
+        return delay if delay <= self.max_retry_after else None
+
+    def should_retry(self, method: str, url: str, status_code: int, headers, attempt: int) -> bool:
+        """Retry-Afterに従って再試行するか（GET/HEADのみ）"""
+        delay = self.note_response(url, status_code, headers)
+        if delay is None or method.upper() not in ('GET', 'HEAD') or attempt >= self.max_retries:
+            return False
+        self._stats['retries'] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ホスト別スケジューラの統計情報（待ち時間の長いホスト上位10件を含む）"""
+        slowest = sorted(self._hosts.items(), key=lambda item: -item[1].wait_seconds)[:10]
+        return {
+            **self._stats,
+            'enabled': self.enabled,
+            'wait_seconds': round(self._stats['wait_seconds'], 3),
+            'max_wait_seconds': round(self._stats['max_wait_seconds'], 3),
+            'avg_wait_seconds': round(self._stats['wait_seconds'] / self._stats['requests'], 3) if self._stats['requests'] else 0.0,
+            'hosts': len(self._hosts),
+            'slowest_hosts': {
+                host: {
+                    'requests': state.requests,
+                    'wait_seconds': round(state.wait_seconds, 3),
+                    'max_wait_seconds': round(state.max_wait, 3),
+                    'crawl_delay': state.crawl_delay,
+                    'requests_per_second': state.bucket.rate,
+                }
+                for host, state in slowest
+            },
+        }
+
+
+_shared_scheduler: Optional[HostScheduler] = None
+
+
+def get_host_scheduler() -> HostScheduler:
+    """プロセス内で共有するHostSchedulerを取得"""
+    global _shared_scheduler
+    if _shared_scheduler is None:
+        _shared_scheduler = HostScheduler()
+    return _shared_scheduler
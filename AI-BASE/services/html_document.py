@@ -0,0 +1,153 @@
+import os
+import re
+import codecs
+from bs4 import BeautifulSoup
+from typing import Optional, Union, Iterable, Callable, Any, Dict
+
+# 優先順（先頭ほど高速なCパーサー）
+SUPPORTED_PARSERS = ['lxml', 'html5lib', 'html.parser']
+
+_parser_cache: Dict[str, str] = {}
+
+# 文字コードを探す範囲（<meta charset>は先頭1024バイト以内に置く決まり）
+CHARSET_SNIFF_BYTES = 4096
+
+CONTENT_TYPE_CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+# ラベルとPythonのコーデックの対応（WHATWG Encoding Standardと同じく上位互換の文字コードで読む）
+# Shift_JIS・EUC-JPと表示されたページの多くは機種依存文字（①・㈱等）を含む
+CHARSET_ALIASES = {
+    'x-sjis': 'cp932',
+    'windows-31j': 'cp932',
+    'shift_jis': 'cp932',
+    'euc_jp': 'euc_jis_2004',
+    'iso8859_1': 'cp1252',
+    'ascii': 'cp1252',
+}
+
+BOM_CHARSETS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def _parser_available(parser: str) -> bool:
+    """パーサーのバックエンドがインストールされているか"""
+    if parser == 'html.parser':
+        return True
+    try:
+        __import__(parser)
+        return True
+    except ImportError:
+        return False
+
+
+def _valid_charset(name: Optional[str]) -> Optional[str]:
+    """Pythonで扱える文字コード名（上位互換の文字コードがあればそちら）を返す"""
+    if not name:
+        return None
+    name = name.lower()
+    if name in CHARSET_ALIASES:
+        return CHARSET_ALIASES[name]
+    try:
+        codec_name = codecs.lookup(name).name
+    except LookupError:
+        return None
+    return CHARSET_ALIASES.get(codec_name.replace('-', '_'), name)
+
+
+def sniff_charset(head: bytes, content_type: str = '') -> Optional[str]:
+    """BOM・Content-Type・<meta charset>の順に文字コードを判定（分からなければNone）"""
+    for bom, charset in BOM_CHARSETS:
+        if head.startswith(bom):
+            return charset
+
+    match = CONTENT_TYPE_CHARSET_PATTERN.search(content_type or '')
+    charset = _valid_charset(match.group(1)) if match else None
+    if charset:
+        return charset
+
+    match = META_CHARSET_PATTERN.search(head[:CHARSET_SNIFF_BYTES])
+    return _valid_charset(match.group(1).decode('ascii', 'ignore')) if match else None
+
+
+def decode_html(content: bytes, charset: Optional[str]) -> Union[str, bytes]:
+    """判定した文字コードでデコード（デコードできなければバイト列のまま返し、パーサーの推定に任せる）
+
+    末尾で途切れた文字（上限で読み込みを打ち切った場合）は捨てる。
+    """
+    if not charset:
+        return content
+    try:
+        return codecs.getincrementaldecoder(charset)().decode(content, final=False)
+    except UnicodeDecodeError:
+        return content
+
+
+def resolve_parser(name: Optional[str] = None) -> str:
+    """設定されたパーサー名を解決（未インストールならhtml.parserに切り替え）"""
+    requested = (name or os.getenv('SCRAPER_HTML_PARSER', 'lxml')).strip()
+    if requested in _parser_cache:
+        return _parser_cache[requested]
+
+    if requested not in SUPPORTED_PARSERS:
+        print(f"未対応のHTMLパーサー: {requested}（html.parserを使用します）")
+        resolved = 'html.parser'
+    elif not _parser_available(requested):
+        print(f"HTMLパーサー {requested} がインストールされていません（html.parserを使用します）")
+        resolved = 'html.parser'
+    else:
+        resolved = requested
+
+    _parser_cache[requested] = resolved
+    return resolved
+
+
+class ParsedDocument:
+    """1度だけパースしたHTML文書
+
+    各抽出処理はこの文書を共有して読み取るだけで、ツリーを変更しない
+    （不要な要素の除外はテキスト取得時に指定する）。
+    """
+
+    def __init__(self, content: Union[str, bytes], url: str = '', parser: Optional[str] = None):
+        self.url = url
+        self.parser = resolve_parser(parser)
+        self.soup = BeautifulSoup(content, self.parser)
+        self._memo: Dict[str, Any] = {}
+
+    def memo(self, key: str, factory: Callable[[], Any]) -> Any:
+        """文書単位で計算結果をキャッシュ（複数の抽出処理で共有する値用）"""
+        if key not in self._memo:
+            self._memo[key] = factory()
+        return self._memo[key]
+
+    def get_text(self, root=None, exclude: Iterable = ()) -> str:
+        """指定要素以下のテキストを取得（excludeに含まれる要素の配下は読み飛ばす）
+
+        除外がなければ root.get_text() と同じ結果になる。
+        """
+        root = root if root is not None else self.soup
+        excluded = {id(element) for element in exclude}
+        if not excluded:
+            return root.get_text()
+
+        # get_text()と同じ文字列型だけを対象にする
+        types = root.interesting_string_types
+        parts = []
+        stack = list(reversed(root.contents))
+        while stack:
+            node = stack.pop()
+            if node.name is None:
+                node_type = type(node)
+                if isinstance(types, type):
+                    if node_type is types:
+                        parts.append(node)
+                elif types is None or node_type in types:
+                    parts.append(node)
+            elif id(node) not in excluded:
+                stack.extend(reversed(node.contents))
+
+        return ''.join(parts)
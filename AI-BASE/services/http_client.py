@@ -0,0 +1,190 @@
+import os
+import httpx
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any
+from services.host_scheduler import HostScheduler, get_host_scheduler
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+def _h2_available() -> bool:
+    """HTTP/2用のh2パッケージが利用可能か"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class CappedResponse:
+    """上限バイト数までで読み込みを打ち切ったレスポンス"""
+
+    __slots__ = ('response', 'content', 'truncated')
+
+    def __init__(self, response: httpx.Response, content: bytes, truncated: bool):
+        self.response = response
+        self.content = content
+        self.truncated = truncated
+
+    @property
+    def status_code(self) -> int:
+        return self.response.status_code
+
+    @property
+    def headers(self) -> httpx.Headers:
+        return self.response.headers
+
+    def raise_for_status(self):
+        """4xx・5xxなら例外を送出"""
+        self.response.raise_for_status()
+
+
+class HttpClient:
+    """非同期HTTPクライアント（ホスト単位のkeep-alive接続プールを共有）"""
+
+    def __init__(
+        self,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        http2: Optional[bool] = None,
+        scheduler: Optional[HostScheduler] = None
+    ):
+        self.connect_timeout = connect_timeout or float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+        self.read_timeout = read_timeout or float(os.getenv('HTTP_READ_TIMEOUT', '15'))
+        self.max_connections = max_connections or int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+        self.max_keepalive_connections = max_keepalive_connections or int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', '20'))
+
+        if http2 is None:
+            http2 = os.getenv('HTTP_ENABLE_HTTP2', 'true').lower() == 'true'
+        # h2が入っていない環境ではHTTP/1.1で動作させる
+        self.http2 = http2 and _h2_available()
+
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # すべてのリクエストをホスト単位の送信制御に通す（無効時はNone）
+        scheduler = scheduler or get_host_scheduler()
+        self.scheduler = scheduler if scheduler.enabled else None
+        if self.scheduler is not None and self.scheduler.robots_fetcher is None:
+            self.scheduler.robots_fetcher = self._fetch_robots_txt
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """httpx.AsyncClientを作成"""
+        timeout = httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.read_timeout,
+            pool=self.connect_timeout
+        )
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections
+        )
+        return httpx.AsyncClient(
+            http2=self.http2,
+            timeout=timeout,
+            limits=limits,
+            follow_redirects=True,
+            headers={'User-Agent': DEFAULT_USER_AGENT}
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共有クライアント（初回アクセス時に作成）"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None, **kwargs: Any) -> httpx.Response:
+        """GETリクエスト"""
+        return await self.request('GET', url, headers=headers, timeout=timeout, **kwargs)
+
+    async def head(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None, **kwargs: Any) -> httpx.Response:
+        """HEADリクエスト"""
+        return await self.request('HEAD', url, headers=headers, timeout=timeout, **kwargs)
+
+    async def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None, **kwargs: Any) -> httpx.Response:
+        """リクエストを送信（timeoutを指定した場合は読み込みタイムアウトのみ上書き）"""
+        if timeout is not None:
+            kwargs['timeout'] = self._timeout(timeout)
+        if self.scheduler is None:
+            return await self.client.request(method, url, headers=headers, **kwargs)
+
+        attempt = 0
+        while True:
+            async with self.scheduler.slot(url):
+                response = await self.client.request(method, url, headers=headers, **kwargs)
+            # 429/503のRetry-Afterが短ければ待ってから再試行（待機はスケジューラが行う）
+            if not self.scheduler.should_retry(method, url, response.status_code, response.headers, attempt):
+                return response
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None, **kwargs: Any):
+        """本文を逐次読み込むリクエスト（async withで使用）"""
+        if timeout is not None:
+            kwargs['timeout'] = self._timeout(timeout)
+        if self.scheduler is None:
+            async with self.client.stream(method, url, headers=headers, **kwargs) as response:
+                yield response
+            return
+
+        attempt = 0
+        while True:
+            # 本文を読み終えるまでホストの送信枠を保持する
+            async with self.scheduler.slot(url):
+                async with self.client.stream(method, url, headers=headers, **kwargs) as response:
+                    if not self.scheduler.should_retry(method, url, response.status_code, response.headers, attempt):
+                        yield response
+                        return
+            attempt += 1
+
+    async def _fetch_robots_txt(self, url: str) -> Optional[str]:
+        """robots.txtを取得（スケジューラを通さない。存在しなければNone）"""
+        response = await self.client.get(url, timeout=self._timeout(5))
+        if response.status_code != 200:
+            return None
+        return response.text[:512 * 1024]
+
+    async def get_capped(self, url: str, max_bytes: int, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None, **kwargs: Any) -> CappedResponse:
+        """本文をmax_bytesまで逐次読み込み、超えた時点で接続を打ち切るGET"""
+        async with self.stream('GET', url, headers=headers, timeout=timeout, **kwargs) as response:
+            buffer = bytearray()
+            truncated = False
+            async for chunk in response.aiter_bytes():
+                remaining = max_bytes - len(buffer)
+                if len(chunk) >= remaining:
+                    buffer += chunk[:remaining]
+                    truncated = len(chunk) > remaining
+                    if truncated:
+                        break
+                    continue
+                buffer += chunk
+            return CappedResponse(response, bytes(buffer), truncated)
+
+    def _timeout(self, read_timeout: float) -> httpx.Timeout:
+        """読み込みタイムアウトのみ上書きしたTimeout"""
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=read_timeout,
+            write=read_timeout,
+            pool=self.connect_timeout
+        )
+
+    async def close(self):
+        """接続プールを閉じる"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+_shared_client: Optional[HttpClient] = None
+
+
+def get_http_client() -> HttpClient:
+    """プロセス内で共有するHttpClientを取得"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = HttpClient()
+    return _shared_client
@@ -0,0 +1,239 @@
+import io
+import os
+import re
+import asyncio
+from collections import OrderedDict
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+from typing import Optional, Dict, Any, List, Tuple
+from services.http_client import HttpClient, get_http_client
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# CDN・画像変換サービスのリサイズ用パラメータ（同じ画像の別サイズとして扱う）
+RESIZE_PARAMS = {
+    'w', 'h', 'width', 'height', 'size', 'resize', 'fit', 'crop', 'quality', 'q',
+    'format', 'fm', 'auto', 'dpr', 'name', 'imwidth', 'imheight'
+}
+
+# パスが画像ファイルを指すURL（img.php?name=... のようにパラメータで画像を選ぶURLと区別する）
+IMAGE_PATH_PATTERN = re.compile(r'\.(?:jpe?g|png|gif|webp|avif|bmp|svg)$', re.IGNORECASE)
+
+# パラメータでサイズ・形式だけを変えるCDNの画像URL（ホスト＋パスに対して照合）
+CDN_RESIZE_PATH_PATTERN = re.compile(
+    r'^(?:pbs\.twimg\.com/media/|[^/]+/_next/image$|[^/]+/cdn-cgi/image/|[^/]+/(?:[^/]+/)?image/upload/)',
+    re.IGNORECASE
+)
+
+# ファイル名に付くサイズ表記（例: photo-300x200.jpg, photo@2x.png, photo_thumb.jpg）
+FILENAME_SIZE_SUFFIX_PATTERN = re.compile(r'(?:-\d+x\d+|@\dx|_(?:thumb|small|medium|large))(?=\.[a-z0-9]+$)', re.IGNORECASE)
+
+# 知覚ハッシュが一致とみなすハミング距離
+DEFAULT_HASH_DISTANCE = 6
+
+
+def canonicalize_image_url(url: str) -> str:
+    """サイズ違い・CDNパラメータ違いの画像URLを同じ文字列にそろえる
+
+    リサイズ用パラメータを除くのは、パスが画像ファイルのURLと既知のCDNのURLだけ。
+    それ以外（img.php?name=goods_a.jpg 等）ではパラメータが画像そのものを決めるため残す。
+    """
+    parsed = urlparse(url.strip())
+    netloc = parsed.netloc.lower()
+    path = FILENAME_SIZE_SUFFIX_PATTERN.sub('', parsed.path)
+    strip_resize = bool(IMAGE_PATH_PATTERN.search(parsed.path) or CDN_RESIZE_PATH_PATTERN.match(netloc + parsed.path))
+    query = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not (strip_resize and key.lower() in RESIZE_PARAMS)
+    ]
+    query.sort()
+    return urlunparse(('', netloc, path, '', urlencode(query), ''))
+
+
+def difference_hash(data: bytes) -> Optional[Tuple[int, int, int]]:
+    """画像のdHash（64bit）と幅・高さ（Pillowがない・デコードできない場合はNone）"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            small = image.convert('L').resize((9, 8), Image.BILINEAR)
+            pixels = list(small.getdata())
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value, width, height
+
+
+class ImageDeduplicator:
+    """正規化URLと知覚ハッシュで同じ画像をまとめ、各グループで最も解像度の高い画像を残す"""
+
+    def __init__(
+        self,
+        http_client: Optional[HttpClient] = None,
+        max_concurrency: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        hash_distance: Optional[int] = None,
+        cache_size: Optional[int] = None,
+        use_perceptual_hash: Optional[bool] = None,
+        max_hashed: Optional[int] = None
+    ):
+        self.http_client = http_client or get_http_client()
+        self.max_concurrency = max_concurrency or int(os.getenv('IMAGE_DEDUP_CONCURRENCY', '4'))
+        self.max_bytes = max_bytes or int(os.getenv('IMAGE_DEDUP_MAX_BYTES', str(5 * 1024 * 1024)))
+        self.hash_distance = hash_distance if hash_distance is not None else int(os.getenv('IMAGE_DEDUP_HASH_DISTANCE', str(DEFAULT_HASH_DISTANCE)))
+        self.cache_size = cache_size or int(os.getenv('IMAGE_DEDUP_CACHE_SIZE', '2048'))
+        # 知覚ハッシュを計算する上位のグループ数（それ以降はURLの正規化のみで判定）
+        self.max_hashed = max_hashed or int(os.getenv('IMAGE_DEDUP_MAX_HASHED', '12'))
+
+        # 画像本体をダウンロードするため、既定では無効（有効時も各グループ1枚・上位max_hashed件のみ）
+        if use_perceptual_hash is None:
+            use_perceptual_hash = os.getenv('IMAGE_DEDUP_PHASH', 'false').lower() == 'true'
+        # Pillowが入っていない環境ではURLの正規化のみで判定する
+        self.use_perceptual_hash = use_perceptual_hash and Image is not None
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._cache: 'OrderedDict[str, Optional[Tuple[int, int, int]]]' = OrderedDict()
+        self._stats = {
+            'runs': 0,
+            'removed_by_url': 0,
+            'removed_by_hash': 0,
+            'hashed': 0,
+            'hash_skipped': 0,
+            'cache_hits': 0,
+            'failures': 0,
+        }
+
+    async def deduplicate(self, urls: List[str], dimensions: Optional[Dict[str, Dict[str, Any]]] = None) -> List[str]:
+        """重複を除いた画像URL一覧（各グループは最上位の位置に、最も解像度の高いURLで残す）"""
+        self._stats['runs'] += 1
+        dimensions = dict(dimensions or {})
+        urls = list(dict.fromkeys(urls))
+
+        # 1段目: 正規化URLでまとめる
+        groups: List[List[str]] = []
+        group_by_key: Dict[str, List[str]] = {}
+        for url in urls:
+            key = canonicalize_image_url(url)
+            if key in group_by_key:
+                group_by_key[key].append(url)
+                self._stats['removed_by_url'] += 1
+            else:
+                group = [url]
+                group_by_key[key] = group
+                groups.append(group)
+
+        # 2段目: 知覚ハッシュが近いグループをまとめる（各グループの代表1枚のみダウンロード）
+        if self.use_perceptual_hash and len(groups) > 1:
+            representatives = [self._representative(group, dimensions) for group in groups[:self.max_hashed]]
+            self._stats['hash_skipped'] += len(groups) - len(representatives)
+            hashes = await self._hash_many(representatives)
+            for url, result in hashes.items():
+                if result is not None and url not in dimensions:
+                    dimensions[url] = {'width': result[1], 'height': result[2]}
+            groups = self._merge_by_hash(groups, hashes)
+
+        return [max(group, key=lambda url: self._resolution(url, dimensions)) for group in groups]
+
+    def _merge_by_hash(self, groups: List[List[str]], hashes: Dict[str, Optional[Tuple[int, int, int]]]) -> List[List[str]]:
+        """ハミング距離がしきい値以内のハッシュを持つグループを、上位のグループに統合"""
+        merged: List[Tuple[List[str], List[int]]] = []
+        for group in groups:
+            group_hashes = [hashes[url][0] for url in group if hashes.get(url) is not None]
+            target = None
+            if group_hashes:
+                for existing, existing_hashes in merged:
+                    if any(
+                        bin(a ^ b).count('1') <= self.hash_distance
+                        for a in group_hashes for b in existing_hashes
+                    ):
+                        target = (existing, existing_hashes)
+                        break
+            if target is None:
+                merged.append((list(group), group_hashes))
+            else:
+                target[0].extend(group)
+                target[1].extend(group_hashes)
+                self._stats['removed_by_hash'] += len(group)
+        return [group for group, _ in merged]
+
+    def _representative(self, group: List[str], dimensions: Dict[str, Dict[str, Any]]) -> str:
+        """ハッシュを計算する1枚（実寸が分かっていれば最も小さいもの。ダウンロード量を抑える）"""
+        known = [url for url in group if self._resolution(url, dimensions) > 0]
+        if known:
+            return min(known, key=lambda url: self._resolution(url, dimensions))
+        return group[0]
+
+    def _resolution(self, url: str, dimensions: Dict[str, Dict[str, Any]]) -> int:
+        """画素数（不明な場合は0。同点なら上位のURLが残る）"""
+        info = dimensions.get(url) or {}
+        return (info.get('width') or 0) * (info.get('height') or 0)
+
+    async def _hash_many(self, urls: List[str]) -> Dict[str, Optional[Tuple[int, int, int]]]:
+        """複数画像のハッシュを並行して取得"""
+        results = await asyncio.gather(*[self._hash(url) for url in urls])
+        return dict(zip(urls, results))
+
+    async def _hash(self, url: str) -> Optional[Tuple[int, int, int]]:
+        """画像をダウンロードしてハッシュを計算（URL単位でキャッシュ）"""
+        if url in self._cache:
+            self._cache.move_to_end(url)
+            self._stats['cache_hits'] += 1
+            return self._cache[url]
+
+        async with self._semaphore:
+            data = await self._download(url)
+        result = await asyncio.to_thread(difference_hash, data) if data else None
+        if result is None:
+            self._stats['failures'] += 1
+        else:
+            self._stats['hashed'] += 1
+
+        self._cache[url] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    async def _download(self, url: str) -> Optional[bytes]:
+        """画像本体を取得（max_bytesを超える画像はハッシュ対象外）"""
+        try:
+            async with self.http_client.stream('GET', url, timeout=10) as response:
+                if response.status_code != 200:
+                    return None
+                data = b''
+                async for chunk in response.aiter_bytes():
+                    data += chunk
+                    if len(data) > self.max_bytes:
+                        return None
+                return data
+        except Exception as e:
+            print(f"画像ハッシュ用ダウンロードエラー: {url} ({e})")
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """重複除去の統計情報"""
+        return {
+            **self._stats,
+            'perceptual_hash': self.use_perceptual_hash,
+            'max_hashed': self.max_hashed,
+            'cached_urls': len(self._cache),
+        }
+
+
+_shared_deduplicator: Optional[ImageDeduplicator] = None
+
+
+def get_image_deduplicator() -> ImageDeduplicator:
+    """プロセス内で共有するImageDeduplicatorを取得"""
+    global _shared_deduplicator
+    if _shared_deduplicator is None:
+        _shared_deduplicator = ImageDeduplicator()
+    return _shared_deduplicator
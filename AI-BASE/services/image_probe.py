@@ -0,0 +1,176 @@
+import os
+import struct
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+from services.http_client import HttpClient, get_http_client
+
+
+def parse_image_header(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """画像ファイル先頭のヘッダーから(形式, 幅, 高さ)を取得（JPEG/PNG/GIF/WebP/BMP）"""
+    if len(data) >= 24 and data[:8] == b'\x89PNG\r\n\x1a\n' and data[12:16] == b'IHDR':
+        width, height = struct.unpack('>II', data[16:24])
+        return 'png', width, height
+
+    if len(data) >= 10 and data[:6] in (b'GIF87a', b'GIF89a'):
+        width, height = struct.unpack('<HH', data[6:10])
+        return 'gif', width, height
+
+    if len(data) >= 30 and data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        chunk = data[12:16]
+        if chunk == b'VP8 ' and data[23:26] == b'\x9d\x01\x2a':
+            width, height = struct.unpack('<HH', data[26:30])
+            return 'webp', width & 0x3fff, height & 0x3fff
+        if chunk == b'VP8L' and data[20] == 0x2f:
+            bits = int.from_bytes(data[21:25], 'little')
+            return 'webp', (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+        if chunk == b'VP8X':
+            width = int.from_bytes(data[24:27], 'little') + 1
+            height = int.from_bytes(data[27:30], 'little') + 1
+            return 'webp', width, height
+        return None
+
+    if len(data) >= 26 and data[:2] == b'BM':
+        width, height = struct.unpack('<ii', data[18:26])
+        return 'bmp', width, abs(height)
+
+    if len(data) >= 4 and data[:2] == b'\xff\xd8':
+        return _parse_jpeg(data)
+
+    return None
+
+
+def _parse_jpeg(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """JPEGのSOFマーカーから幅・高さを取得"""
+    offset = 2
+    length = len(data)
+    while offset + 9 <= length:
+        if data[offset] != 0xff:
+            return None
+        marker = data[offset + 1]
+        # 詰め物のFF
+        if marker == 0xff:
+            offset += 1
+            continue
+        # 長さを持たないマーカー
+        if marker in (0xd8, 0x01) or 0xd0 <= marker <= 0xd7:
+            offset += 2
+            continue
+        # SOF0〜SOF15（DHT・JPG・DACを除く）
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return 'jpeg', width, height
+        segment_length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        offset += 2 + segment_length
+    return None
+
+
+class ImageProber:
+    """画像の先頭数KBだけをRangeリクエストで取得し、実際の幅・高さ・容量を調べる"""
+
+    def __init__(
+        self,
+        http_client: Optional[HttpClient] = None,
+        max_concurrency: Optional[int] = None,
+        probe_bytes: Optional[int] = None,
+        cache_size: Optional[int] = None
+    ):
+        self.http_client = http_client or get_http_client()
+        self.max_concurrency = max_concurrency or int(os.getenv('IMAGE_PROBE_CONCURRENCY', '8'))
+        self.probe_bytes = probe_bytes or int(os.getenv('IMAGE_PROBE_BYTES', '32768'))
+        self.cache_size = cache_size or int(os.getenv('IMAGE_PROBE_CACHE_SIZE', '2048'))
+        self.timeout = float(os.getenv('IMAGE_PROBE_TIMEOUT', '5'))
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._cache: 'OrderedDict[str, Optional[Dict[str, Any]]]' = OrderedDict()
+        self._stats = {
+            'probes': 0,
+            'cache_hits': 0,
+            'failures': 0,
+            'bytes_downloaded': 0,
+        }
+
+    async def probe_many(self, urls: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """複数の画像を並行して調べる（同時実行数は上限まで）"""
+        unique_urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*[self.probe(url) for url in unique_urls])
+        return dict(zip(unique_urls, results))
+
+    async def probe(self, url: str) -> Optional[Dict[str, Any]]:
+        """画像の形式・幅・高さ・容量を取得（取得できなければNone）"""
+        if url in self._cache:
+            self._cache.move_to_end(url)
+            self._stats['cache_hits'] += 1
+            return self._cache[url]
+
+        async with self._semaphore:
+            result = await self._fetch_header(url)
+
+        self._cache[url] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    async def _fetch_header(self, url: str) -> Optional[Dict[str, Any]]:
+        """先頭probe_bytesバイトを取得してヘッダーを解析"""
+        self._stats['probes'] += 1
+        headers = {'Range': f'bytes=0-{self.probe_bytes - 1}'}
+        try:
+            async with self.http_client.stream('GET', url, headers=headers, timeout=self.timeout) as response:
+                if response.status_code not in (200, 206):
+                    self._stats['failures'] += 1
+                    return None
+
+                # Rangeを無視して全体を返すサーバーでも先頭だけ読んで打ち切る
+                data = b''
+                async for chunk in response.aiter_bytes():
+                    data += chunk
+                    if len(data) >= self.probe_bytes:
+                        break
+
+                total_bytes = self._total_bytes(response)
+        except Exception as e:
+            print(f"画像プローブエラー: {url} ({e})")
+            self._stats['failures'] += 1
+            return None
+
+        self._stats['bytes_downloaded'] += len(data)
+        parsed = parse_image_header(data)
+        if parsed is None:
+            self._stats['failures'] += 1
+            return {'format': None, 'width': None, 'height': None, 'bytes': total_bytes}
+
+        image_format, width, height = parsed
+        return {'format': image_format, 'width': width, 'height': height, 'bytes': total_bytes}
+
+    def _total_bytes(self, response) -> Optional[int]:
+        """画像全体の容量（Content-RangeまたはContent-Lengthから）"""
+        content_range = response.headers.get('content-range', '')
+        if '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+            if total.isdigit():
+                return int(total)
+        if response.status_code == 200:
+            content_length = response.headers.get('content-length', '')
+            if content_length.isdigit():
+                return int(content_length)
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """プローブの統計情報"""
+        return {
+            **self._stats,
+            'cached_urls': len(self._cache),
+            'max_concurrency': self.max_concurrency,
+        }
+
+
+_shared_prober: Optional[ImageProber] = None
+
+
+def get_image_prober() -> ImageProber:
+    """プロセス内で共有するImageProberを取得"""
+    global _shared_prober
+    if _shared_prober is None:
+        _shared_prober = ImageProber()
+    return _shared_prober
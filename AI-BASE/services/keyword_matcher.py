@@ -0,0 +1,60 @@
+from typing import Iterable, Dict, FrozenSet
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+EMPTY: FrozenSet[str] = frozenset()
+
+# これより長い文字列（URL等）は結果を保持しない
+MEMO_MAX_TEXT_LENGTH = 64
+
+
+class KeywordMatcher:
+    """複数キーワードの部分一致を1回の走査でまとめて判定する
+
+    pyahocorasickがあればAho-Corasickオートマトンで走査し、なければ
+    キーワード表に対する部分文字列検索で同じ結果を返す。
+    判定は `keyword in text` と同じ（重なり合う一致もすべて数える）。
+    """
+
+    def __init__(self, keywords: Iterable[str], memo_size: int = 4096):
+        self.keywords = tuple(sorted(set(keywords)))
+        self.memo_size = memo_size
+        self._memo: Dict[str, FrozenSet[str]] = {}
+        self._automaton = None
+
+        if ahocorasick is not None and self.keywords:
+            automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                automaton.add_word(keyword, keyword)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    @property
+    def backend(self) -> str:
+        """使用中の照合方式"""
+        return 'aho-corasick' if self._automaton is not None else 'substring'
+
+    def find(self, text: str) -> FrozenSet[str]:
+        """textに含まれるキーワードの集合"""
+        if not text:
+            return EMPTY
+        # クラス名やalt等の短い文字列は繰り返し現れるため結果を使い回す
+        memoize = len(text) <= MEMO_MAX_TEXT_LENGTH
+        if memoize:
+            hits = self._memo.get(text)
+            if hits is not None:
+                return hits
+
+        if self._automaton is not None:
+            hits = frozenset([keyword for _, keyword in self._automaton.iter(text)])
+        else:
+            hits = frozenset([keyword for keyword in self.keywords if keyword in text])
+
+        if memoize:
+            if len(self._memo) >= self.memo_size:
+                self._memo.clear()
+            self._memo[text] = hits
+        return hits
@@ -0,0 +1,154 @@
+import os
+import importlib
+from abc import ABC, abstractmethod
+import httpx
+import openai
+from typing import Optional, Dict, Any, Callable, Tuple
+
+# 設定がない場合のモデル（記事全体の生成 / 項目抽出）
+DEFAULT_MODEL = "gpt-4"
+DEFAULT_SLOT_MODEL = "gpt-4o-mini"
+
+
+def usage_dict(usage) -> Dict[str, int]:
+    """APIレスポンスのトークン数"""
+    if usage is None:
+        return {}
+    # プロンプトキャッシュに当たった入力トークン数（対応していないAPIでは0）
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'cached_prompt_tokens': getattr(details, 'cached_tokens', 0) or 0,
+    }
+
+
+class LLMBackend(ABC):
+    """記事生成に使うLLMの呼び出し口
+
+    requestはChat Completions形式（model・messages・max_tokens・temperature・
+    response_format）。本文とトークン数（usage_dictの形式）を返す。
+    """
+
+    name = 'base'
+
+    def __init__(self, model: Optional[str] = None, slot_model: Optional[str] = None):
+        self.model = model or os.getenv('LLM_MODEL', DEFAULT_MODEL)
+        self.slot_model = slot_model or os.getenv('AI_SLOT_MODEL', DEFAULT_SLOT_MODEL)
+
+    @property
+    def available(self) -> bool:
+        """呼び出せる設定になっているか（APIキー等）"""
+        return True
+
+    @abstractmethod
+    async def complete(self, request: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        """一括で生成し、本文とトークン数を返す"""
+
+    async def stream(self, request: Dict[str, Any], on_delta: Callable[[str], None]) -> Tuple[str, Dict[str, int]]:
+        """ストリーミングで生成し、断片をon_deltaに渡す（既定では一括で生成して1回だけ渡す）"""
+        content, usage = await self.complete(request)
+        if content:
+            on_delta(content)
+        return content, usage
+
+    def describe(self) -> Dict[str, Any]:
+        return {'backend': self.name, 'model': self.model, 'slot_model': self.slot_model}
+
+    async def close(self):
+        pass
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI API、またはOpenAI互換のエンドポイント（LLM_BASE_URL）"""
+
+    name = 'openai'
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        slot_model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None
+    ):
+        super().__init__(model, slot_model)
+        self.base_url = base_url or os.getenv('LLM_BASE_URL') or None
+        self.api_key = api_key or os.getenv('LLM_API_KEY') or os.getenv('OPENAI_API_KEY')
+        self.timeout = timeout or float(os.getenv('OPENAI_TIMEOUT', '120'))
+        self.connect_timeout = connect_timeout or float(os.getenv('OPENAI_CONNECT_TIMEOUT', '10'))
+
+        # 専用の接続プール（生成は数十秒かかるため、スレッドではなく非同期で待つ）
+        self._http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv('OPENAI_MAX_CONNECTIONS', '100')),
+                max_keepalive_connections=int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '20'))
+            )
+        )
+        # 再試行はLLMRateLimiterで行う（SDKの自動再試行は使わない）
+        # 自前のエンドポイントはAPIキーが不要な場合があるため、空のときは仮の値を渡す
+        self.client = openai.AsyncOpenAI(
+            api_key=self.api_key or 'not-required',
+            base_url=self.base_url,
+            http_client=self._http_client,
+            max_retries=0
+        )
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key or self.base_url)
+
+    async def complete(self, request: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        response = await self.client.chat.completions.create(**request)
+        return response.choices[0].message.content or '', usage_dict(response.usage)
+
+    async def stream(self, request: Dict[str, Any], on_delta: Callable[[str], None]) -> Tuple[str, Dict[str, int]]:
+        stream = await self.client.chat.completions.create(
+            **request,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        parts = []
+        usage = {}
+        async for chunk in stream:
+            # トークン数は最後のチャンクで届く
+            if getattr(chunk, 'usage', None):
+                usage = usage_dict(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            on_delta(delta)
+        return ''.join(parts), usage
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), 'base_url': self.base_url or 'https://api.openai.com/v1', 'timeout': self.timeout}
+
+    async def close(self):
+        await self.client.close()
+
+
+BACKENDS = {
+    'openai': OpenAIBackend,
+}
+
+
+def create_llm_backend(name: Optional[str] = None) -> LLMBackend:
+    """設定（LLM_BACKEND）のバックエンドを生成
+
+    登録名（openai）のほか「パッケージ.モジュール:クラス名」で独自のLLMBackendも指定できる。
+    """
+    name = name or os.getenv('LLM_BACKEND', 'openai')
+    if ':' in name:
+        module_name, class_name = name.split(':', 1)
+        backend_class = getattr(importlib.import_module(module_name), class_name)
+    else:
+        try:
+            backend_class = BACKENDS[name.lower()]
+        except KeyError:
+            raise ValueError(f"不明なLLMバックエンド: {name}（{', '.join(BACKENDS)}）")
+    return backend_class()
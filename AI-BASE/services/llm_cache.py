@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+
+def llm_cache_key(model: str, system_prompt: str, prompt: str, temperature: float, max_tokens: int) -> str:
+    """生成条件とプロンプトから作るキャッシュキー（内容のハッシュ）"""
+    payload = json.dumps(
+        [model, system_prompt, prompt, temperature, max_tokens],
+        ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """LLMの生成結果キャッシュ（メモリのLRUとディスクの2段、TTL・容量上限付き）
+
+    同じページから同じプロンプトで再生成する場合にAPI呼び出しを省く。
+    キーはモデル・システムプロンプト・プロンプト・temperature・max_tokensのハッシュ。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl: Optional[float] = None,
+        memory_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        if enabled is None:
+            enabled = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.cache_dir = cache_dir or os.getenv('LLM_CACHE_DIR', '.cache/llm')
+        self.ttl = ttl if ttl is not None else float(os.getenv('LLM_CACHE_TTL', str(7 * 86400)))
+        self.memory_entries = memory_entries or int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', '256'))
+        self.max_bytes = max_bytes or int(os.getenv('LLM_CACHE_MAX_BYTES', str(100 * 1024 * 1024)))
+
+        self._memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._total_bytes: Optional[int] = None
+        self._stats = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'bypassed': 0,
+            'stores': 0,
+            'evictions': 0,
+            'saved_prompt_tokens': 0,
+            'saved_completion_tokens': 0,
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry['stored_at'] <= self.ttl
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """キャッシュ済みの生成結果（{'content', 'usage', 'stored_at'}。なければNone）"""
+        if not self.enabled:
+            return None
+
+        entry = self._memory.get(key)
+        tier = 'memory_hits'
+        if entry is not None:
+            self._memory.move_to_end(key)
+        else:
+            entry = await asyncio.to_thread(self._read, key)
+            tier = 'disk_hits'
+            if entry is not None:
+                self._remember(key, entry)
+
+        if entry is None or not self._fresh(entry):
+            if entry is not None:
+                self._memory.pop(key, None)
+            self._stats['misses'] += 1
+            return None
+
+        self._stats['hits'] += 1
+        self._stats[tier] += 1
+        usage = entry.get('usage') or {}
+        self._stats['saved_prompt_tokens'] += usage.get('prompt_tokens', 0)
+        self._stats['saved_completion_tokens'] += usage.get('completion_tokens', 0)
+        return entry
+
+    def record_bypass(self):
+        """再生成の指定でキャッシュを使わなかったことを記録"""
+        self._stats['bypassed'] += 1
+
+    async def put(self, key: str, content: str, usage: Optional[Dict[str, int]] = None):
+        """生成結果を保存"""
+        if not self.enabled or not content:
+            return
+        entry = {'content': content, 'usage': usage or {}, 'stored_at': time.time()}
+        self._remember(key, entry)
+        self._stats['stores'] += 1
+        await asyncio.to_thread(self._write, key, entry)
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # アクセス時刻をmtimeに記録してLRU削除に使う
+            os.utime(path, None)
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"生成結果キャッシュ読み込みエラー: {e}")
+            self._remove(path)
+            return None
+
+    def _write(self, key: str, entry: Dict[str, Any]):
+        path = self._path(key)
+        payload = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        total_before = self._current_total_bytes()
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"生成結果キャッシュ書き込みエラー: {e}")
+            self._remove(tmp_path)
+            return
+
+        self._total_bytes = total_before - previous_size + len(payload)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _current_total_bytes(self) -> int:
+        """ディスク上の合計サイズ（初回のみディレクトリを走査）"""
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, _, size in self._list_entries())
+        return self._total_bytes
+
+    def _list_entries(self):
+        """(パス, 最終アクセス時刻, サイズ)の一覧"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """最終アクセスの古い順に、上限の9割まで削除"""
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._list_entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                self._stats['evictions'] += 1
+                self._memory.pop(os.path.basename(path)[:-len('.json')], None)
+        self._total_bytes = total
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュの統計情報（ヒット率・節約したトークン数）"""
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            **self._stats,
+            'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+            'saved_tokens': self._stats['saved_prompt_tokens'] + self._stats['saved_completion_tokens'],
+            'enabled': self.enabled,
+            'memory_entries': len(self._memory),
+            'total_bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+
+_shared_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """プロセス内で共有するLLMResponseCacheを取得"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = LLMResponseCache()
+    return _shared_cache
@@ -0,0 +1,226 @@
+import os
+import time
+import random
+import asyncio
+import httpx
+import openai
+from typing import Optional, Dict, Any, Callable, Awaitable, TypeVar
+from services.host_scheduler import TokenBucket, parse_retry_after
+
+T = TypeVar('T')
+
+# バケットに貯められる量（何秒分の枠を一度に使えるか）
+BURST_SECONDS = 10
+
+# 429を受けた後に下げる送信レートの下限（設定値に対する割合）
+MIN_RATE_SCALE = 0.1
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """再試行で回復する見込みのあるエラー（レート制限・タイムアウト・接続エラー・5xx）"""
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """エラーレスポンスのretry-after-ms・Retry-After（秒）"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    milliseconds = headers.get('retry-after-ms')
+    if milliseconds:
+        try:
+            return float(milliseconds) / 1000
+        except ValueError:
+            pass
+    return parse_retry_after(headers.get('retry-after'))
+
+
+class LLMRateLimiter:
+    """LLM API呼び出しの共有レート制限
+
+    毎分リクエスト数・毎分トークン数の枠をトークンバケットで管理し、呼び出し元を
+    到着順に待たせる。429・タイムアウト等はジッター付き指数バックオフで期限内に
+    再試行し、429を受けると送信レートを下げて成功が続けば戻す。
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        base_backoff: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        deadline: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        if enabled is None:
+            enabled = os.getenv('LLM_LIMITER_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.requests_per_minute = requests_per_minute or float(os.getenv('LLM_REQUESTS_PER_MINUTE', '500'))
+        self.tokens_per_minute = tokens_per_minute or float(os.getenv('LLM_TOKENS_PER_MINUTE', '40000'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('LLM_MAX_RETRIES', '4'))
+        self.base_backoff = base_backoff or float(os.getenv('LLM_BACKOFF_BASE', '1'))
+        self.max_backoff = max_backoff or float(os.getenv('LLM_BACKOFF_MAX', '30'))
+        # 待ち・再試行を含めて1回の生成にかけてよい時間（秒）
+        self.deadline = deadline or float(os.getenv('LLM_DEADLINE', '180'))
+
+        self._requests = TokenBucket(self.requests_per_minute / 60, max(1.0, self.requests_per_minute / 60 * BURST_SECONDS))
+        self._tokens = TokenBucket(self.tokens_per_minute / 60, max(1.0, self.tokens_per_minute / 60 * BURST_SECONDS))
+        # asyncio.Lockは待っている順に渡されるため、先に来た呼び出しから送信される
+        self._queue = asyncio.Lock()
+        self._waiting = 0
+        self._blocked_until = 0.0
+        self._rate_scale = 1.0
+        self._stats = {
+            'requests': 0,
+            'queued': 0,
+            'queue_wait_seconds': 0.0,
+            'max_queue_wait_seconds': 0.0,
+            'retries': 0,
+            'retry_errors': {},
+            'throttled': 0,
+            'deadline_exceeded': 0,
+            'failures': 0,
+            'tokens_reserved': 0,
+            'tokens_refunded': 0,
+            'tokens_used': 0,
+        }
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        estimated_tokens: int,
+        can_retry: Optional[Callable[[], bool]] = None
+    ) -> T:
+        """枠を確保してcallを実行し、再試行できるエラーは期限内でやり直す
+
+        estimated_tokens: 入力と最大出力を合わせたトークン数の見積もり
+        can_retry: 再試行してよいか（ストリーミングで出力済みの場合等にFalse）
+        """
+        if not self.enabled:
+            return await call()
+
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            await self._acquire(estimated_tokens, deadline_at)
+            try:
+                result = await call()
+            except Exception as e:
+                # 失敗した呼び出しの見積もり分は使っていないものとして枠に戻す
+                # （戻さないと再試行のたびに毎分トークン数の枠を見積もり分ずつ消費する）
+                self._refund_tokens(estimated_tokens)
+                delay = retry_after_seconds(e)
+                if isinstance(e, openai.RateLimitError) or getattr(e, 'status_code', None) == 429:
+                    self._throttle(delay)
+                if not is_retryable_error(e) or attempt >= self.max_retries or (can_retry is not None and not can_retry()):
+                    self._stats['failures'] += 1
+                    raise
+                if delay is None:
+                    # フルジッター（複数の呼び出しが同時に再試行しないよう待ち時間をばらつかせる）
+                    delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                if time.monotonic() + delay >= deadline_at:
+                    self._stats['deadline_exceeded'] += 1
+                    self._stats['failures'] += 1
+                    raise
+                attempt += 1
+                self._stats['retries'] += 1
+                name = type(e).__name__
+                self._stats['retry_errors'][name] = self._stats['retry_errors'].get(name, 0) + 1
+                await asyncio.sleep(delay)
+                continue
+            self._recover()
+            return result
+
+    def settle(self, estimated_tokens: int, used_tokens: int):
+        """実際に使ったトークン数を記録し、見積もりとの差を毎分トークン数の枠に戻す"""
+        if not self.enabled:
+            return
+        self._stats['tokens_used'] += used_tokens
+        if used_tokens and estimated_tokens > used_tokens:
+            self._tokens.refund(estimated_tokens - used_tokens)
+
+    def _refund_tokens(self, estimated_tokens: int):
+        """確保した毎分トークン数の枠を戻す（reserveと同じく上限は容量まで）"""
+        refund = min(estimated_tokens, self._tokens.capacity)
+        self._tokens.refund(refund)
+        self._stats['tokens_refunded'] += refund
+
+    async def _acquire(self, estimated_tokens: int, deadline_at: float):
+        """到着順に毎分リクエスト数・トークン数の枠を確保（期限までに確保できなければTimeoutError）"""
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            async with self._queue:
+                now = time.monotonic()
+                wait = max(
+                    self._requests.reserve(),
+                    self._tokens.reserve(estimated_tokens),
+                    self._blocked_until - now
+                )
+                if now + wait >= deadline_at:
+                    self._requests.refund(1)
+                    self._tokens.refund(estimated_tokens)
+                    self._stats['deadline_exceeded'] += 1
+                    raise asyncio.TimeoutError(f"LLM APIの送信枠を期限内に確保できません（待ち{wait:.1f}秒）")
+                if wait > 0:
+                    await asyncio.sleep(wait)
+        finally:
+            self._waiting -= 1
+
+        waited = time.monotonic() - started
+        self._stats['requests'] += 1
+        self._stats['tokens_reserved'] += estimated_tokens
+        self._stats['queue_wait_seconds'] += waited
+        self._stats['max_queue_wait_seconds'] = max(self._stats['max_queue_wait_seconds'], waited)
+        if waited >= 0.001:
+            self._stats['queued'] += 1
+
+    def _throttle(self, delay: Optional[float]):
+        """429を受けたら送信レートを半分にし、指定の間（なければ基準の待ち時間）送信を止める"""
+        self._stats['throttled'] += 1
+        self._rate_scale = max(MIN_RATE_SCALE, self._rate_scale * 0.5)
+        self._apply_rate_scale()
+        pause = delay if delay is not None else self.base_backoff
+        self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+
+    def _recover(self):
+        """成功するたびに送信レートを設定値まで少しずつ戻す"""
+        if self._rate_scale < 1.0:
+            self._rate_scale = min(1.0, self._rate_scale + 0.1)
+            self._apply_rate_scale()
+
+    def _apply_rate_scale(self):
+        self._requests.rate = self.requests_per_minute / 60 * self._rate_scale
+        self._tokens.rate = self.tokens_per_minute / 60 * self._rate_scale
+
+    def get_stats(self) -> Dict[str, Any]:
+        """レート制限の統計情報（待ち時間・再試行回数・現在の送信レート）"""
+        requests = self._stats['requests']
+        return {
+            **self._stats,
+            'retry_errors': dict(self._stats['retry_errors']),
+            'queue_wait_seconds': round(self._stats['queue_wait_seconds'], 3),
+            'max_queue_wait_seconds': round(self._stats['max_queue_wait_seconds'], 3),
+            'avg_queue_wait_seconds': round(self._stats['queue_wait_seconds'] / requests, 3) if requests else 0.0,
+            'waiting': self._waiting,
+            'enabled': self.enabled,
+            'requests_per_minute': self.requests_per_minute,
+            'tokens_per_minute': self.tokens_per_minute,
+            'rate_scale': round(self._rate_scale, 2),
+        }
+
+
+_shared_limiter: Optional[LLMRateLimiter] = None
+
+
+def get_llm_limiter() -> LLMRateLimiter:
+    """プロセス内で共有するLLMRateLimiterを取得"""
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = LLMRateLimiter()
+    return _shared_limiter
@@ -0,0 +1,190 @@
+import os
+import time
+from urllib.parse import urlparse
+from typing import Optional, Dict, Any, Set
+from playwright.async_api import Page, Route
+
+# 画像URLの取得に不要なリソース（画像本体もsrcが分かれば読み込む必要はない）
+DEFAULT_BLOCKED_RESOURCE_TYPES = 'image,media,font,texttrack,eventsource,manifest'
+
+# 解析・広告・計測用のホスト（サブドメインも含めて遮断）
+TRACKER_HOSTS = {
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googlesyndication.com',
+    'googleadservices.com',
+    'doubleclick.net',
+    'adservice.google.com',
+    'facebook.net',
+    'connect.facebook.net',
+    'analytics.twitter.com',
+    'static.ads-twitter.com',
+    'platform.twitter.com',
+    'hotjar.com',
+    'clarity.ms',
+    'criteo.com',
+    'criteo.net',
+    'amazon-adsystem.com',
+    'taboola.com',
+    'outbrain.com',
+    'yjtag.yahoo.co.jp',
+    'b92.yahoo.co.jp',
+    'ads.yahoo.co.jp',
+    'ladsp.com',
+    'microad.jp',
+    'i-mobile.co.jp',
+    'adingo.jp',
+    'tiktok.com',
+    'newrelic.com',
+    'nr-data.net',
+}
+
+# 遅延読み込みの画像も数える（data-src等はスクロールで実URLに置き換わる前でも候補になる）
+COUNT_IMAGES_SCRIPT = """
+() => document.querySelectorAll('img[src], img[data-src], img[data-lazy-src], img[data-original], source[srcset]').length
+"""
+
+SCROLL_SCRIPT = """
+() => {
+    window.scrollBy(0, window.innerHeight);
+    return window.scrollY + window.innerHeight >= document.documentElement.scrollHeight - 2;
+}
+"""
+
+
+def _is_tracker_host(host: str) -> bool:
+    """トラッカーのホスト（またはそのサブドメイン）か"""
+    while host:
+        if host in TRACKER_HOSTS:
+            return True
+        if '.' not in host:
+            return False
+        host = host.split('.', 1)[1]
+    return False
+
+
+class PageLoader:
+    """動的スクレイピング用のページ読み込み（不要なリソースを遮断し、画像が揃った時点で打ち切る）
+
+    mode='fast' はDOM構築完了後にスクロールしながら画像数が閾値に達するか
+    増えなくなるまで待つ。mode='networkidle' は従来どおり通信が止むまで待つ。
+    """
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        image_threshold: Optional[int] = None,
+        settle_ms: Optional[int] = None,
+        max_wait_ms: Optional[int] = None,
+        navigation_timeout_ms: Optional[int] = None,
+        blocked_resource_types: Optional[Set[str]] = None
+    ):
+        self.mode = (mode or os.getenv('SCRAPER_DYNAMIC_MODE', 'fast')).lower()
+        self.image_threshold = image_threshold or int(os.getenv('SCRAPER_DYNAMIC_IMAGE_THRESHOLD', '10'))
+        self.settle_ms = settle_ms or int(os.getenv('SCRAPER_DYNAMIC_SETTLE_MS', '300'))
+        self.max_wait_ms = max_wait_ms or int(os.getenv('SCRAPER_DYNAMIC_MAX_WAIT_MS', '5000'))
+        self.navigation_timeout_ms = navigation_timeout_ms or int(os.getenv('SCRAPER_DYNAMIC_NAVIGATION_TIMEOUT_MS', '20000'))
+        if blocked_resource_types is None:
+            blocked_resource_types = {
+                name.strip() for name in os.getenv('SCRAPER_DYNAMIC_BLOCK_TYPES', DEFAULT_BLOCKED_RESOURCE_TYPES).split(',')
+                if name.strip()
+            }
+        self.blocked_resource_types = blocked_resource_types
+
+        self._domain_stats: Dict[str, Dict[str, Any]] = {}
+
+    async def load(self, page: Page, url: str) -> str:
+        """ページを読み込んでHTMLを返す"""
+        domain = urlparse(url).netloc.lower()
+        counters = {'blocked': 0, 'allowed': 0}
+        started = time.monotonic()
+        timed_out = False
+
+        try:
+            if self.mode == 'networkidle':
+                await page.goto(url, wait_until='networkidle', timeout=self.navigation_timeout_ms)
+            else:
+                await page.route('**/*', lambda route: self._handle_route(route, counters))
+                await page.goto(url, wait_until='domcontentloaded', timeout=self.navigation_timeout_ms)
+                timed_out = not await self._wait_for_images(page)
+
+            return await page.content()
+        except Exception:
+            timed_out = True
+            raise
+        finally:
+            self._record(domain, time.monotonic() - started, counters, timed_out)
+
+    async def _handle_route(self, route: Route, counters: Dict[str, int]):
+        """不要なリソース種別・トラッカーへのリクエストを遮断"""
+        request = route.request
+        host = (urlparse(request.url).hostname or '').lower()
+        if request.resource_type in self.blocked_resource_types or _is_tracker_host(host):
+            counters['blocked'] += 1
+            await route.abort()
+        else:
+            counters['allowed'] += 1
+            await route.continue_()
+
+    async def _wait_for_images(self, page: Page) -> bool:
+        """スクロールしながら画像数が閾値に達するか増えなくなるまで待つ（上限時間を超えたらFalse）"""
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        previous_count = -1
+        while time.monotonic() < deadline:
+            at_bottom = await page.evaluate(SCROLL_SCRIPT)
+            await page.wait_for_timeout(self.settle_ms)
+
+            count = await page.evaluate(COUNT_IMAGES_SCRIPT)
+            if count >= self.image_threshold:
+                return True
+            # 最下部まで読んでも増えなければ、これ以上は出てこない
+            if at_bottom and count == previous_count:
+                return True
+            previous_count = count
+        return False
+
+    def _record(self, domain: str, elapsed: float, counters: Dict[str, int], timed_out: bool):
+        """ドメイン別の所要時間・遮断数を記録"""
+        stats = self._domain_stats.setdefault(domain, {
+            'loads': 0,
+            'total_seconds': 0.0,
+            'max_seconds': 0.0,
+            'blocked_requests': 0,
+            'allowed_requests': 0,
+            'timeouts': 0,
+        })
+        stats['loads'] += 1
+        stats['total_seconds'] += elapsed
+        stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+        stats['blocked_requests'] += counters['blocked']
+        stats['allowed_requests'] += counters['allowed']
+        if timed_out:
+            stats['timeouts'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ページ読み込みの統計情報（ドメイン別）"""
+        domains = {
+            domain: {
+                **stats,
+                'avg_seconds': round(stats['total_seconds'] / stats['loads'], 3),
+                'total_seconds': round(stats['total_seconds'], 3),
+                'max_seconds': round(stats['max_seconds'], 3),
+            }
+            for domain, stats in self._domain_stats.items()
+        }
+        return {
+            'mode': self.mode,
+            'image_threshold': self.image_threshold,
+            'domains': domains,
+        }
+
+
+_shared_loader: Optional[PageLoader] = None
+
+
+def get_page_loader() -> PageLoader:
+    """プロセス内で共有するPageLoaderを取得"""
+    global _shared_loader
+    if _shared_loader is None:
+        _shared_loader = PageLoader()
+    return _shared_loader
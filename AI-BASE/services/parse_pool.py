@@ -0,0 +1,126 @@
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Union, Dict, Any
+from models.scraped_data import ScrapedData
+
+# ワーカープロセス内で使い回すスクレイパー
+_worker_scraper = None
+
+
+def _init_worker():
+    """ワーカー起動時にスクレイパーを用意（モジュールのインポートもここで済ませる）"""
+    global _worker_scraper
+    from services.scraper import WebScraper
+    _worker_scraper = WebScraper()
+
+
+def _warmup_worker() -> int:
+    """ワーカーの起動確認用"""
+    return os.getpid()
+
+
+def _parse_in_worker(content: Union[str, bytes], url: str, images_only: bool, main_selector: Optional[str] = None) -> ScrapedData:
+    """ワーカー内でパースと抽出を実行"""
+    if _worker_scraper is None:
+        _init_worker()
+    return _worker_scraper._parse_page(content, url, images_only=images_only, main_selector=main_selector)
+
+
+class ParsePool:
+    """HTMLのパース・抽出を行うワーカープロセスプール（イベントループをCPU処理で塞がない）"""
+
+    def __init__(self, max_workers: Optional[int] = None, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.getenv('SCRAPER_PARSE_POOL', 'false').lower() == 'true'
+        self.enabled = enabled
+        self.max_workers = max_workers or int(os.getenv('SCRAPER_PARSE_WORKERS', '0')) or os.cpu_count() or 1
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._start_lock = asyncio.Lock()
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'fallbacks': 0,
+            'restarts': 0,
+        }
+
+    async def start(self):
+        """プロセスを起動し、全ワーカーを温めておく"""
+        async with self._start_lock:
+            if not self.enabled or self._executor is not None:
+                return
+
+            # spawnだとapp.pyが再インポートされGoogle認証まで走るため、既定の起動方式を使う
+            # （アプリ起動時はブラウザ等より先に起動し、子プロセスに余計な状態を持ち込まない）
+            executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker
+            )
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[
+                loop.run_in_executor(executor, _warmup_worker)
+                for _ in range(self.max_workers)
+            ])
+            self._executor = executor
+            print(f"パースワーカー起動: {self.max_workers}プロセス")
+
+    async def submit(self, content: Union[str, bytes], url: str, images_only: bool = False, main_selector: Optional[str] = None) -> Optional[ScrapedData]:
+        """ワーカーでパースを実行（プールが使えない場合はNoneを返し、呼び出し側で処理する）"""
+        if not self.enabled:
+            return None
+
+        try:
+            if self._executor is None:
+                await self.start()
+
+            self._stats['submitted'] += 1
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, _parse_in_worker, content, url, images_only, main_selector)
+            self._stats['completed'] += 1
+            return result
+
+        except BrokenProcessPool as e:
+            # 次回の呼び出しで作り直す
+            print(f"パースワーカー異常終了: {e}")
+            self._discard_executor()
+            self._stats['restarts'] += 1
+        except Exception as e:
+            print(f"パースワーカーエラー: {e}")
+
+        self._stats['fallbacks'] += 1
+        return None
+
+    def _discard_executor(self):
+        """壊れたプールを破棄"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def close(self):
+        """ワーカープロセスを終了"""
+        if self._executor is not None:
+            executor = self._executor
+            self._executor = None
+            await asyncio.to_thread(executor.shutdown, True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """プールの統計情報"""
+        return {
+            **self._stats,
+            'enabled': self.enabled,
+            'running': self._executor is not None,
+            'max_workers': self.max_workers,
+        }
+
+
+_shared_pool: Optional[ParsePool] = None
+
+
+def get_parse_pool() -> ParsePool:
+    """プロセス内で共有するParsePoolを取得"""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = ParsePool()
+    return _shared_pool
@@ -0,0 +1,200 @@
+import os
+import re
+import math
+from typing import Optional, Dict, Any, List, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 記事テンプレートの項目ごとに、本文で手がかりになる表現と重み
+FIELD_PATTERNS = {
+    'dates': (re.compile(r'\d{1,2}月\d{1,2}日|\d{4}[年/.]\d{1,2}|\d{1,2}/\d{1,2}|[〜～]|会期|期間|開催日|日程'), 3.0),
+    'venue': (re.compile(r'会場|店舗|場所|住所|アクセス|[0-9０-９]+F|[0-9０-９]+階|駅|マルイ|パルコ|PARCO|ストア'), 2.5),
+    'price': (re.compile(r'[\d,０-９]+円|税込|お買い上げ|お買上げ|ごとに|毎に'), 2.5),
+    'novelty': (re.compile(r'特典|ノベルティ|プレゼント|全\s*[\d０-９]+\s*種|ランダム|配布|先着'), 3.0),
+    'illustration': (re.compile(r'描き下ろし|描きおろし|イラスト|ビジュアル|キャラ'), 2.0),
+    'title': (re.compile(r'「[^」]{1,40}」|『[^』]{1,40}』|×|POP\s*UP|ポップアップ|コラボ', re.IGNORECASE), 1.5),
+    'goods': (re.compile(r'グッズ|販売|ラインナップ|商品|アクリル|缶バッジ|ぬいぐるみ'), 1.0),
+}
+
+# 記事に使わない定型文（注意事項・Cookie等）
+BOILERPLATE_PATTERN = re.compile(r'ご了承|予めご|あらかじめご|cookie|クッキー|プライバシー|利用規約|Copyright|©|転売|無断転載', re.IGNORECASE)
+
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[。！？!?])')
+CJK_PATTERN = re.compile(r'[぀-ヿ㐀-鿿＀-￯]')
+
+
+class TokenCounter:
+    """トークン数の計算（tiktokenがなければ文字種から概算）"""
+
+    def __init__(self, model: str = 'gpt-4'):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding('cl100k_base')
+
+    @property
+    def backend(self) -> str:
+        """使用中の計算方式"""
+        return 'tiktoken' if self._encoding is not None else 'estimate'
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        # 日本語は概ね1文字1トークン、英数字・記号は4文字で1トークン程度
+        cjk = len(CJK_PATTERN.findall(text))
+        return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class ContextChunk:
+    """本文の断片（元の位置・トークン数・関連度）"""
+
+    __slots__ = ('order', 'text', 'tokens', 'score', 'fields')
+
+    def __init__(self, order: int, text: str, tokens: int):
+        self.order = order
+        self.text = text
+        self.tokens = tokens
+        self.score = 0.0
+        self.fields: List[str] = []
+
+
+class PromptContextBuilder:
+    """ページ本文をトークン予算内に収める
+
+    本文を断片に分け、記事テンプレートが必要とする項目（開催日・会場・特典の
+    購入金額・ノベルティ・描き下ろし・作品名等）との関連度で順位付けし、
+    予算に入る断片を元の順序で連結する。
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        chunk_tokens: Optional[int] = None,
+        enabled: Optional[bool] = None,
+        model: str = 'gpt-4'
+    ):
+        if enabled is None:
+            enabled = os.getenv('AI_CONTEXT_BUDGET_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.token_budget = token_budget or int(os.getenv('AI_CONTEXT_TOKEN_BUDGET', '3000'))
+        self.chunk_tokens = chunk_tokens or int(os.getenv('AI_CONTEXT_CHUNK_TOKENS', '120'))
+        self.counter = TokenCounter(model)
+
+    def build(self, text: str) -> Tuple[str, Dict[str, Any]]:
+        """予算内に収めた本文と、使用したトークン数等の記録"""
+        tokens_before = self.counter.count(text)
+        report = {
+            'context_tokens_before': tokens_before,
+            'context_tokens_after': tokens_before,
+            'context_token_budget': self.token_budget,
+            'context_chunks': None,
+            'context_chunks_used': None,
+            'tokenizer': self.counter.backend,
+        }
+        if not self.enabled or tokens_before <= self.token_budget:
+            return text, report
+
+        chunks = self._split(text)
+        for chunk in chunks:
+            self._score(chunk)
+
+        # 関連度の高い順（同点なら前にあるもの）に予算まで詰める
+        selected = []
+        remaining = self.token_budget
+        for chunk in sorted(chunks, key=lambda c: (-c.score, c.order)):
+            # 注意事項等の定型文は予算が余っても含めない
+            if chunk.score < 0:
+                break
+            if chunk.tokens <= remaining:
+                selected.append(chunk)
+                remaining -= chunk.tokens
+            if remaining <= 0:
+                break
+        selected.sort(key=lambda c: c.order)
+
+        context = '\n'.join(chunk.text for chunk in selected)
+        report.update({
+            'context_tokens_after': self.token_budget - remaining,
+            'context_chunks': len(chunks),
+            'context_chunks_used': len(selected),
+        })
+        return context, report
+
+    def _split(self, text: str) -> List[ContextChunk]:
+        """行（本文抽出後のブロック）単位で、長すぎる行は文単位で断片に分ける"""
+        pieces: List[str] = []
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            if self.counter.count(line) <= self.chunk_tokens:
+                pieces.append(line)
+                continue
+            pieces.extend(self._split_long(line))
+
+        # 項目名だけの行と値の行が離れないよう、続けて並ぶ短い行同士をまとめる
+        short = self.chunk_tokens // 4
+        chunks: List[ContextChunk] = []
+        buffer, buffer_tokens = [], 0
+        for piece in pieces:
+            tokens = self.counter.count(piece)
+            merge = tokens <= short and buffer_tokens + tokens <= self.chunk_tokens and all(
+                self.counter.count(line) <= short for line in buffer
+            )
+            if buffer and not merge:
+                chunks.append(ContextChunk(len(chunks), '\n'.join(buffer), buffer_tokens))
+                buffer, buffer_tokens = [], 0
+            buffer.append(piece)
+            buffer_tokens += tokens
+        if buffer:
+            chunks.append(ContextChunk(len(chunks), '\n'.join(buffer), buffer_tokens))
+        return chunks
+
+    def _split_long(self, line: str) -> List[str]:
+        """長い行を文の区切り（なければ空白・文字数）で分割"""
+        sentences = [s for s in SENTENCE_SPLIT_PATTERN.split(line) if s.strip()]
+        if len(sentences) <= 1:
+            sentences = line.split(' ')
+
+        pieces, current = [], ''
+        for sentence in sentences:
+            candidate = f"{current} {sentence}".strip() if current and not current.endswith(('。', '！', '？')) else current + sentence
+            if current and self.counter.count(candidate) > self.chunk_tokens:
+                pieces.append(current)
+                current = sentence
+            else:
+                current = candidate
+        if current:
+            pieces.append(current)
+
+        # 区切りのない長い文字列は文字数で分ける
+        result = []
+        for piece in pieces:
+            while self.counter.count(piece) > self.chunk_tokens * 2:
+                result.append(piece[:self.chunk_tokens])
+                piece = piece[self.chunk_tokens:]
+            result.append(piece)
+        return result
+
+    def _score(self, chunk: ContextChunk):
+        """テンプレートの項目との関連度（含まれる項目の種類が多いほど高い）"""
+        score = 0.0
+        for field, (pattern, weight) in FIELD_PATTERNS.items():
+            hits = len(pattern.findall(chunk.text))
+            if hits:
+                chunk.fields.append(field)
+                score += weight * min(hits, 3) ** 0.5
+        if BOILERPLATE_PATTERN.search(chunk.text):
+            score -= 3.0
+        # 冒頭は概要（作品名・会期・会場）が多い
+        if chunk.order < 2:
+            score += 2.0
+        # 長さで割り、情報の密度を見る（短すぎる断片を優遇しすぎない）
+        chunk.score = score / max(chunk.tokens, 20) ** 0.5
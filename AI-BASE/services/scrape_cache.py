@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+from typing import Optional, Dict, Any
+from models.scraped_data import ScrapedData
+
+# キャッシュキーから除外するトラッキング用パラメータ
+TRACKING_PARAMS = {'fbclid', 'gclid', 'yclid', 'mc_cid', 'mc_eid', '_ga'}
+
+
+def normalize_url(url: str) -> str:
+    """キャッシュキー用にURLを正規化"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower() or 'https'
+    netloc = parsed.netloc.lower()
+
+    # 既定ポートは省略
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+
+    query = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.startswith('utm_') and key not in TRACKING_PARAMS
+    ]
+    query.sort()
+
+    return urlunparse((scheme, netloc, parsed.path or '/', parsed.params, urlencode(query), ''))
+
+
+def _dump_model(data: ScrapedData) -> Dict[str, Any]:
+    """pydantic v1/v2どちらでも辞書に変換"""
+    if hasattr(data, 'model_dump'):
+        return data.model_dump()
+    return data.dict()
+
+
+class ScrapeCache:
+    """スクレイピング結果のディスクキャッシュ（TTL・stale-while-revalidate・容量上限付き）"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl: Optional[float] = None,
+        stale_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        if enabled is None:
+            enabled = os.getenv('SCRAPE_CACHE_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.cache_dir = cache_dir or os.getenv('SCRAPE_CACHE_DIR', '.cache/scrape')
+        # ttl以内は新鮮、stale_ttl以内は古い結果を返しつつ裏で再検証する
+        self.ttl = ttl if ttl is not None else float(os.getenv('SCRAPE_CACHE_TTL', '3600'))
+        self.stale_ttl = stale_ttl if stale_ttl is not None else float(os.getenv('SCRAPE_CACHE_STALE_TTL', '86400'))
+        self.max_bytes = max_bytes or int(os.getenv('SCRAPE_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+        self._total_bytes: Optional[int] = None
+        self._stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'not_modified': 0,
+            'bytes_read': 0,
+            'bytes_written': 0,
+            'evictions': 0,
+        }
+
+    def _path(self, url: str) -> str:
+        """URLに対応するキャッシュファイルのパス"""
+        key = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def freshness(self, entry: Dict[str, Any]) -> str:
+        """エントリの状態: fresh / stale / expired"""
+        age = time.time() - entry['stored_at']
+        if age <= self.ttl:
+            return 'fresh'
+        if age <= self.ttl + self.stale_ttl:
+            return 'stale'
+        return 'expired'
+
+    async def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """キャッシュを取得（なければNone）"""
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._read, url)
+
+    def record_hit(self, stale: bool = False):
+        """キャッシュ利用を記録"""
+        self._stats['stale_hits' if stale else 'hits'] += 1
+
+    def record_miss(self):
+        """キャッシュ不使用（未保存・期限切れ）を記録"""
+        self._stats['misses'] += 1
+
+    def record_not_modified(self):
+        """304応答による再利用を記録"""
+        self._stats['not_modified'] += 1
+
+    async def put(self, url: str, data: ScrapedData):
+        """スクレイピング結果を保存（検証用のETag・Last-Modifiedはmetadataから取得）"""
+        if not self.enabled or not data.url:
+            return
+        await asyncio.to_thread(self._write, url, data, time.time())
+
+    async def touch(self, url: str, entry: Dict[str, Any]):
+        """再検証で未更新と分かったエントリの保存時刻を更新"""
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self._write, url, entry['data'], time.time())
+
+    def _read(self, url: str) -> Optional[Dict[str, Any]]:
+        path = self._path(url)
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            # アクセス時刻をmtimeに記録してLRU削除に使う
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"キャッシュ読み込みエラー: {e}")
+            return None
+
+        try:
+            stored = json.loads(raw)
+            stored['data'] = ScrapedData(**stored['data'])
+        except Exception as e:
+            print(f"キャッシュ破損のため破棄: {path} ({e})")
+            self._remove(path)
+            return None
+
+        self._stats['bytes_read'] += len(raw)
+        return stored
+
+    def _write(self, url: str, data: ScrapedData, stored_at: float):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(url)
+        payload = json.dumps({
+            'url': normalize_url(url),
+            'stored_at': stored_at,
+            'data': _dump_model(data),
+        }, ensure_ascii=False).encode('utf-8')
+
+        total_before = self._current_total_bytes()
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"キャッシュ書き込みエラー: {e}")
+            self._remove(tmp_path)
+            return
+
+        self._stats['bytes_written'] += len(payload)
+        self._total_bytes = total_before - previous_size + len(payload)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _current_total_bytes(self) -> int:
+        """キャッシュ全体のサイズ（初回のみディレクトリを走査）"""
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, _, size in self._list_entries())
+        return self._total_bytes
+
+    def _list_entries(self):
+        """(パス, 最終アクセス時刻, サイズ)の一覧"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for item in it:
+                    if item.name.endswith('.json'):
+                        stat = item.stat()
+                        entries.append((item.path, stat.st_mtime, stat.st_size))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _evict(self):
+        """最終アクセスの古い順に、上限の9割まで削除"""
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._list_entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                self._stats['evictions'] += 1
+        self._total_bytes = total
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュの統計情報"""
+        return {
+            **self._stats,
+            'enabled': self.enabled,
+            'total_bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+
+_shared_cache: Optional[ScrapeCache] = None
+
+
+def get_scrape_cache() -> ScrapeCache:
+    """プロセス内で共有するScrapeCacheを取得"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ScrapeCache()
+    return _shared_cache
@@ -1,126 +1,594 @@
 import asyncio
-import requests
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
 from models.scraped_data import ScrapedData
+from models.structured_data import StructuredData
+from services.html_document import ParsedDocument, sniff_charset, decode_html
+from services.http_client import HttpClient, get_http_client
+from services.browser_pool import BrowserPool, get_browser_pool
+from services.page_loader import PageLoader, get_page_loader
+from services.parse_pool import ParsePool, get_parse_pool
+from services.scrape_cache import ScrapeCache, get_scrape_cache
+from services.keyword_matcher import KeywordMatcher
+from services.content_distiller import ContentDistiller
+from services.structured_data_extractor import extract_structured_data
+from services.site_profiles import SiteProfileStore, get_site_profiles, site_domain
+from services.image_probe import ImageProber, get_image_prober
+from services.image_dedup import ImageDeduplicator, get_image_deduplicator
+from services.subpage_crawler import SubpageCrawler, get_subpage_crawler
+import os
 import re
-from typing import List, Optional, Dict, Any
+import time
+from typing import List, Optional, Dict, Any, Tuple
 import json
 
+# メインコンテンツエリアのセレクタ（優先順）
+MAIN_CONTENT_SELECTOR_NAMES = [
+    'main',
+    'article', 
+    '.content',
+    '.main-content',
+    '.article-content',
+    '.post-content',
+    '.entry-content',
+    '#content',
+    '#main',
+    '#article',
+    '.container .content',
+    '.wrapper .content'
+]
+
+# 記事・商品関連エリアのセレクタ（優先順）
+ARTICLE_SELECTOR_NAMES = [
+    '.goods', '.product', '.item', '.merchandise',
+    '.gallery', '.photos', '.images',
+    '.character', '.anime', '.collaboration',
+    '.popup', '.store', '.campaign',
+    '.novelty', '.special', '.limited',
+    '.featured', '.highlight'
+]
+
+# メタ画像のセレクタ（属性名, 属性値）
+META_IMAGE_SELECTORS = [
+    ('property', 'og:image'),
+    ('name', 'twitter:image'),
+    ('name', 'twitter:image:src')
+]
+
+BACKGROUND_IMAGE_PATTERN = re.compile(r'background-image:\s*url\(["\']?([^"\']+)["\']?\)')
+
+# 画像の重要度判定に使うキーワード
+IMPORTANT_ALT_KEYWORDS = frozenset([
+    'goods', 'product', 'item', 'merchandise',
+    'character', 'anime', 'collaboration', 'collab',
+    'popup', 'store', 'campaign', 'event',
+    'novelty', 'special', 'limited', 'exclusive',
+    'new', 'latest', 'featured', 'main'
+])
+
+IMPORTANT_CLASS_KEYWORDS = frozenset([
+    'main', 'hero', 'featured', 'primary',
+    'goods', 'product', 'item', 'gallery',
+    'character', 'anime', 'artwork',
+    'campaign', 'special', 'highlight'
+])
+
+UNIMPORTANT_CLASS_KEYWORDS = frozenset([
+    'thumb', 'thumbnail', 'small', 'mini',
+    'icon', 'logo', 'brand', 'header', 'footer',
+    'nav', 'menu', 'ad', 'banner', 'sidebar'
+])
+
+IMPORTANT_PARENT_PATTERNS = frozenset([
+    'gallery', 'photos', 'images', 'slideshow',
+    'goods', 'products', 'items', 'merchandise',
+    'main', 'content', 'article', 'featured',
+    'hero', 'banner', 'highlight'
+])
+
+# 画像URLの有効性判定に使うキーワード（除外パターンは大幅に緩和済み）
+EXCLUDE_URL_PATTERNS = frozenset([
+    'data:image',  # base64画像
+    'placeholder',
+    'loading',
+    'spinner',
+    '.svg',  # SVGは除外
+    '1x1',   # トラッキングピクセル
+    'pixel',  # トラッキングピクセル
+    'spacer',  # スペーサー画像
+    'blank',  # 空白画像
+    'transparent',  # 透明画像
+    'favicon',  # ファビコン
+    'noimage',  # 画像なし
+    'analytics',  # アナリティクス
+    'tracking',  # トラッキング
+])
+
+FILENAME_EXCLUDE_PATTERNS = (
+    'btn_',  # ボタン画像
+    'spacer_',  # スペーサー
+    'blank_',  # 空白画像
+)
+
+VALID_IMAGE_EXTENSIONS = frozenset(['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'])
+
+IMAGE_PATH_KEYWORDS = frozenset(['image', 'img', 'photo', 'picture', 'gallery', 'media'])
+
+# 画像の品質スコア（正: 高品質を示すキーワード、負: 低品質を示すキーワード）
+QUALITY_KEYWORD_POINTS = {
+    'large': 4,
+    'big': 3,
+    'full': 4,
+    'original': 5,
+    'high': 3,
+    'main': 4,
+    'hero': 5,
+    'featured': 4,
+    'gallery': 3,
+    'photo': 3,
+    'image': 2,
+    'picture': 2,
+    'visual': 2,
+    'artwork': 4,
+    'character': 4,  # キャラクター画像
+    'anime': 4,  # アニメ関連
+    'goods': 4,  # グッズ画像
+    'product': 4,  # 商品画像
+    'item': 3,   # アイテム画像
+    'merchandise': 3,  # 商品
+    'collaboration': 3,  # コラボ関連
+    'event': 3,  # イベント関連
+    'popup': 4,  # ポップアップ関連
+    'store': 2,  # ストア関連
+    'campaign': 3,  # キャンペーン
+    'special': 3,  # 特別な
+    'limited': 3,  # 限定
+    'exclusive': 3,  # 限定
+    'new': 2,    # 新商品
+    'latest': 2,  # 最新
+    'banner': 2,  # バナー（緩和）
+    'logo': 1,   # ロゴ（完全除外から緩和）
+    'icon': 1,   # アイコン（完全除外から緩和）
+    'thumb': -2,  # -4から-2に緩和
+    'thumbnail': -2,  # -4から-2に緩和
+    'small': -1,  # -3から-1に緩和
+    'mini': -1,   # -3から-1に緩和
+    'tiny': -2,   # -4から-2に緩和
+    'pixel': -5,  # トラッキングピクセルは厳格に
+    'tracking': -5,  # トラッキングは厳格に
+    'spacer': -5,    # スペーサーは厳格に
+    'blank': -5,     # 空白画像は厳格に
+    'placeholder': -3,  # プレースホルダーは減点
+    'default': -1,      # デフォルト画像は軽減点
+}
+
+CDN_KEYWORDS = frozenset(['cdn', 'media', 'assets', 'static', 'images'])
+
+# URLに含まれるサイズ情報（640x480 / w640 / h480 のような形式）
+SIZE_DIMENSION_PATTERN = re.compile(r'(\d{3,4})x(\d{3,4})')
+SIZE_SINGLE_PATTERNS = [
+    re.compile(r'w(\d{3,4})'),
+    re.compile(r'h(\d{3,4})'),
+]
+
+# 画像判定で使う全キーワード（1回の走査でまとめて照合する）
+IMAGE_KEYWORDS = (
+    IMPORTANT_ALT_KEYWORDS | IMPORTANT_CLASS_KEYWORDS | UNIMPORTANT_CLASS_KEYWORDS |
+    IMPORTANT_PARENT_PATTERNS | EXCLUDE_URL_PATTERNS | VALID_IMAGE_EXTENSIONS |
+    IMAGE_PATH_KEYWORDS | frozenset(QUALITY_KEYWORD_POINTS) | CDN_KEYWORDS
+)
+
+
+def _parse_simple_selector(selector: str):
+    """単純なセレクタを(種類, 値, 祖先クラス)に変換"""
+    ancestor_class = None
+    if ' ' in selector:
+        ancestor, selector = selector.split()
+        ancestor_class = ancestor.lstrip('.')
+    if selector.startswith('.'):
+        return ('class', selector[1:], ancestor_class)
+    if selector.startswith('#'):
+        return ('id', selector[1:], ancestor_class)
+    return ('tag', selector, ancestor_class)
+
+
+MAIN_CONTENT_SELECTORS = [_parse_simple_selector(selector) for selector in MAIN_CONTENT_SELECTOR_NAMES]
+ARTICLE_SELECTOR_RANKS = {}
+for _rank, _selector in enumerate(ARTICLE_SELECTOR_NAMES):
+    ARTICLE_SELECTOR_RANKS.setdefault(_selector[1:], _rank)
+
+
+# 実寸による区分の優先度（実寸が取れない画像は従来の順位のまま中位に置く）
+LARGE_IMAGE_WIDTH = 800
+LARGE_IMAGE_HEIGHT = 600
+IMAGE_SIZE_CLASS_RANKS = {'large': 2, 'medium': 1, 'unknown': 1}
+
+# 関連ページ（グッズ一覧・ノベルティ・会場案内等）へのリンクの採点に使う語と点数
+SUBPAGE_LINK_KEYWORDS = {name.lstrip('.'): 1 for name in ARTICLE_SELECTOR_NAMES}
+SUBPAGE_LINK_KEYWORDS.update({
+    'goods': 3, 'グッズ': 3, 'novelty': 3, 'ノベルティ': 3, '特典': 3,
+    'product': 2, 'item': 2, 'merchandise': 2, 'lineup': 2, '商品': 2, 'ラインナップ': 2,
+    'access': 2, 'アクセス': 2, 'venue': 2, '会場': 2, '店舗': 1, 'shop': 1, 'map': 1,
+})
+SUBPAGE_LINK_LIMIT = 20
+# ページ以外（画像・PDF等）へのリンク
+NON_PAGE_EXTENSIONS = VALID_IMAGE_EXTENSIONS | frozenset(['.pdf', '.zip', '.svg', '.mp4', '.mp3'])
+
+
+class ImageCandidate:
+    """画像候補（出現領域・重要度・品質スコアを保持）"""
+    __slots__ = ('element', 'order', 'main_ancestors', 'article_rank', 'url', 'region', 'importance', 'quality')
+    
+    def __init__(self, element, order: int, main_ancestors: tuple, article_rank: Optional[int], url: Optional[str] = None, region: str = 'general'):
+        self.element = element
+        self.order = order
+        self.main_ancestors = main_ancestors
+        self.article_rank = article_rank
+        self.url = url
+        self.region = region
+        self.importance = 0
+        self.quality = 0
+
+
 class WebScraper:
     """Webスクレイピングサービス（Google検索機能付き）"""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+    def __init__(
+        self,
+        http_client: Optional[HttpClient] = None,
+        browser_pool: Optional[BrowserPool] = None,
+        page_loader: Optional[PageLoader] = None,
+        parse_pool: Optional[ParsePool] = None,
+        scrape_cache: Optional[ScrapeCache] = None,
+        site_profiles: Optional[SiteProfileStore] = None,
+        image_prober: Optional[ImageProber] = None,
+        image_deduplicator: Optional[ImageDeduplicator] = None,
+        subpage_crawler: Optional[SubpageCrawler] = None
+    ):
+        # GoogleDocsServiceと接続プールを共有する
+        self.http_client = http_client or get_http_client()
+        # 動的スクレイピングは常駐ブラウザを使い回す
+        self.browser_pool = browser_pool or get_browser_pool()
+        # 不要なリソースを遮断し、画像が揃った時点で読み込みを打ち切る
+        self.page_loader = page_loader or get_page_loader()
+        # パース・抽出はワーカープロセスで実行する（無効時はこのプロセスで実行）
+        self.parse_pool = parse_pool or get_parse_pool()
+        # 同じページの再取得・再パースを避ける
+        self.scrape_cache = scrape_cache or get_scrape_cache()
+        self._revalidating: Dict[str, asyncio.Task] = {}
+        # ドメインごとの実績から静的/動的の使い分けとメインコンテンツセレクタを決める
+        self.site_profiles = site_profiles or get_site_profiles()
+        # 巨大なページ（インラインJSON・base64画像等）は上限で読み込みを打ち切る
+        self.max_page_bytes = int(os.getenv('SCRAPER_MAX_PAGE_BYTES', str(3 * 1024 * 1024)))
+        # 画像スコアリング用のキーワード照合器（全キーワードを1回の走査で判定）
+        self.keyword_matcher = KeywordMatcher(IMAGE_KEYWORDS)
+        self._importance_memo: Dict[Tuple[str, str], int] = {}
+        # プロンプトに渡す全文からサイト共通部分を除く
+        self.content_distiller = ContentDistiller()
+        # 画像の実寸をヘッダーだけ取得して調べる
+        self.image_prober = image_prober or get_image_prober()
+        self.image_probe_enabled = os.getenv('IMAGE_PROBE_ENABLED', 'true').lower() == 'true'
+        self.image_min_side = int(os.getenv('IMAGE_MIN_SIDE', '100'))
+        self.image_min_pixels = int(os.getenv('IMAGE_MIN_PIXELS', '40000'))
+        # srcset・CDNのサイズ違いや静的/動的で重複した画像をまとめる
+        self.image_deduplicator = image_deduplicator or get_image_deduplicator()
+        # グッズ一覧・ノベルティ・会場案内等の関連ページをまとめて取得する
+        self.subpage_crawler = subpage_crawler or get_subpage_crawler()
     
-    async def scrape_url(self, url: str) -> ScrapedData:
-        """URLからコンテンツをスクレイピング（情報補完機能付き）"""
+    async def scrape_url(self, url: str, crawl_subpages: Optional[bool] = None) -> ScrapedData:
+        """URLからコンテンツをスクレイピング（情報補完機能付き）
+
+        crawl_subpages: 同一サイト内の関連ページも取得して統合する（Noneなら設定に従う）
+        """
         try:
             print(f"スクレイピング開始: {url}")
+            scraped_data = await self._scrape_single(url)
             
-            # まず静的スクレイピングを試行
-            scraped_data = await self._static_scrape(url)
-            print(f"静的スクレイピング完了: {len(scraped_data.images)}枚の画像を取得")
-            
-            # 画像が少ない場合は動的スクレイピングを試行
-            if len(scraped_data.images) < 3:
-                print("画像が少ないため動的スクレイピングを実行...")
-                dynamic_data = await self._dynamic_scrape(url)
-                if dynamic_data.images:
-                    scraped_data.images.extend(dynamic_data.images)
-                    scraped_data.images = list(set(scraped_data.images))  # 重複除去
-                    print(f"動的スクレイピング完了: 合計{len(scraped_data.images)}枚の画像")
-            
-            # 作品タイプを判別
-            content_type = self._determine_content_type(scraped_data)
-            scraped_data.metadata['content_type'] = content_type
-            print(f"作品タイプ判別: {content_type}")
+            if crawl_subpages is None:
+                crawl_subpages = self.subpage_crawler.enabled
+            if crawl_subpages and scraped_data.url:
+                scraped_data = await self.subpage_crawler.crawl(self, scraped_data)
             
-            # 不足情報をGoogle検索で補完
-            enhanced_data = await self._enhance_with_google_search(scraped_data)
-            
-            # 画像URLをログ出力
-            print(f"最終的に取得した画像: {len(enhanced_data.images)}枚")
-            for i, img_url in enumerate(enhanced_data.images[:5]):  # 最初の5枚をログ出力
-                print(f"  画像{i+1}: {img_url}")
-            
-            return enhanced_data
+            return scraped_data
             
         except Exception as e:
             print(f"スクレイピングエラー: {e}")
             return ScrapedData()
     
-    async def _static_scrape(self, url: str) -> ScrapedData:
-        """静的スクレイピング（BeautifulSoup使用）"""
+    async def _scrape_single(self, url: str) -> ScrapedData:
+        """1ページ分のスクレイピング（キャッシュ使用）"""
+        # キャッシュを確認
+        cached = await self.scrape_cache.get(url)
+        if cached:
+            state = self.scrape_cache.freshness(cached)
+            if state == 'fresh':
+                self.scrape_cache.record_hit()
+                print("キャッシュ済みのスクレイピング結果を使用")
+                return cached['data']
+            if state == 'stale':
+                # 古い結果をすぐ返し、裏で再検証する
+                self.scrape_cache.record_hit(stale=True)
+                print("期限切れのキャッシュを使用（バックグラウンドで再検証）")
+                self._schedule_revalidation(url, cached)
+                return cached['data']
+        
+        self.scrape_cache.record_miss()
+        return await self._scrape_and_cache(url, cached)
+    
+    def _schedule_revalidation(self, url: str, cached: Dict[str, Any]):
+        """キャッシュの再検証をバックグラウンドで実行（同じURLは多重に実行しない）"""
+        if url in self._revalidating:
+            return
+        
+        async def revalidate():
+            try:
+                await self._scrape_and_cache(url, cached)
+            except Exception as e:
+                print(f"キャッシュ再検証エラー: {e}")
+            finally:
+                self._revalidating.pop(url, None)
+        
+        self._revalidating[url] = asyncio.create_task(revalidate())
+    
+    async def _scrape_and_cache(self, url: str, cached: Optional[Dict[str, Any]] = None) -> ScrapedData:
+        """スクレイピングして結果をキャッシュ（キャッシュがあれば条件付きGETで再検証）"""
+        plan = self.site_profiles.plan(url)
+        
+        # 動的スクレイピングが必要と分かっているサイトは静的スクレイピングと同時に開始
+        dynamic_task = None
+        if plan['strategy'] == 'dynamic' and not cached:
+            print("サイトプロファイルにより動的スクレイピングを並行実行")
+            dynamic_task = asyncio.create_task(self._timed_dynamic_scrape(url))
+        
+        # 静的スクレイピングを試行
+        started = time.monotonic()
+        scraped_data = await self._static_scrape(url, cached, plan['main_selector'])
+        static_seconds = time.monotonic() - started
+        
+        # 304 Not Modified: 再パースせずキャッシュを使う
+        if scraped_data is None:
+            if dynamic_task is not None:
+                dynamic_task.cancel()
+            print("ページ未更新のためキャッシュを再利用")
+            self.scrape_cache.record_not_modified()
+            await self.scrape_cache.touch(url, cached)
+            return cached['data']
+        
+        scraped_data = await self._complete_scrape(url, scraped_data, plan['strategy'], dynamic_task, static_seconds)
+        await self.scrape_cache.put(url, scraped_data)
+        return scraped_data
+    
+    async def _complete_scrape(
+        self,
+        url: str,
+        scraped_data: ScrapedData,
+        strategy: str = 'auto',
+        dynamic_task: Optional[asyncio.Task] = None,
+        static_seconds: float = 0.0
+    ) -> ScrapedData:
+        """静的スクレイピング結果を動的スクレイピング等で補完"""
+        static_images = len(scraped_data.images)
+        print(f"静的スクレイピング完了: {static_images}枚の画像を取得")
+        
+        # 画像が少ない場合は動的スクレイピングを試行（効果のないサイトでは省略）
+        dynamic_data, dynamic_seconds = None, None
+        if dynamic_task is not None:
+            dynamic_data, dynamic_seconds = await dynamic_task
+        elif static_images < 3 and strategy != 'static':
+            print("画像が少ないため動的スクレイピングを実行...")
+            dynamic_data, dynamic_seconds = await self._timed_dynamic_scrape(url)
+        elif static_images < 3:
+            print("サイトプロファイルにより動的スクレイピングを省略")
+        
+        if dynamic_data is not None and dynamic_data.images:
+            # 順位を保ったまま連結（重複は後段でまとめる）
+            scraped_data.images = list(dict.fromkeys(scraped_data.images + dynamic_data.images))
+            print(f"動的スクレイピング完了: 合計{len(scraped_data.images)}枚の画像")
+        
+        # 静的スクレイピングが成功した場合のみ実績を記録
+        if scraped_data.url:
+            await self.site_profiles.record(
+                url,
+                static_images=static_images,
+                static_seconds=static_seconds,
+                dynamic_gain=len(scraped_data.images) - static_images if dynamic_data is not None else None,
+                dynamic_seconds=dynamic_seconds,
+                selector_images=scraped_data.metadata.get('main_selector_images')
+            )
+        
+        await self._finalize_images(scraped_data)
+        
+        # 作品タイプを判別
+        content_type = self._determine_content_type(scraped_data)
+        scraped_data.metadata['content_type'] = content_type
+        print(f"作品タイプ判別: {content_type}")
+        
+        # 不足情報をGoogle検索で補完
+        enhanced_data = await self._enhance_with_google_search(scraped_data)
+        
+        # 画像URLをログ出力
+        print(f"最終的に取得した画像: {len(enhanced_data.images)}枚")
+        for i, img_url in enumerate(enhanced_data.images[:5]):  # 最初の5枚をログ出力
+            print(f"  画像{i+1}: {img_url}")
+        
+        return enhanced_data
+    
+    async def _finalize_images(self, scraped_data: ScrapedData):
+        """画像の実寸による選別・並べ替えと重複除去"""
+        # 実寸を調べて小さい画像を除外し、大きい画像を優先
+        if self.image_probe_enabled and scraped_data.images:
+            await self._rank_images_by_dimensions(scraped_data)
+        
+        # 同じ画像のサイズ違い・別URLをまとめ、最も解像度の高いものを残す
+        if len(scraped_data.images) > 1:
+            before = len(scraped_data.images)
+            scraped_data.images = await self.image_deduplicator.deduplicate(
+                scraped_data.images,
+                scraped_data.metadata.get('image_probes')
+            )
+            if len(scraped_data.images) < before:
+                print(f"重複画像を除去: {before - len(scraped_data.images)}枚")
+    
+    async def _rank_images_by_dimensions(self, scraped_data: ScrapedData):
+        """画像ヘッダーから得た実寸で小さい画像を除外し、大きい順に並べ替える（同じ区分内は元の順位を維持）"""
+        probes = await self.image_prober.probe_many(scraped_data.images)
+        
+        ranked = []
+        for order, image_url in enumerate(scraped_data.images):
+            size_class = self._image_size_class(probes.get(image_url))
+            if size_class == 'small':
+                continue
+            ranked.append((IMAGE_SIZE_CLASS_RANKS[size_class], order, image_url))
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        
+        removed = len(scraped_data.images) - len(ranked)
+        if removed:
+            print(f"小さい画像を除外: {removed}枚")
+        scraped_data.images = [image_url for _, _, image_url in ranked]
+        scraped_data.metadata['image_probes'] = {
+            image_url: probes[image_url] for image_url in scraped_data.images if probes.get(image_url)
+        }
+    
+    def _image_size_class(self, probe: Optional[Dict[str, Any]]) -> str:
+        """実寸による区分: large / medium / small / unknown"""
+        if not probe or not probe.get('width') or not probe.get('height'):
+            return 'unknown'
+        width, height = probe['width'], probe['height']
+        if min(width, height) < self.image_min_side or width * height < self.image_min_pixels:
+            return 'small'
+        if width >= LARGE_IMAGE_WIDTH and height >= LARGE_IMAGE_HEIGHT:
+            return 'large'
+        return 'medium'
+    
+    async def _static_scrape(self, url: str, cached: Optional[Dict[str, Any]] = None, main_selector: Optional[str] = None) -> Optional[ScrapedData]:
+        """静的スクレイピング（BeautifulSoup使用）。キャッシュが未更新（304）ならNoneを返す"""
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            headers = {}
+            if cached:
+                cached_metadata = cached['data'].metadata
+                if cached_metadata.get('etag'):
+                    headers['If-None-Match'] = cached_metadata['etag']
+                if cached_metadata.get('last_modified'):
+                    headers['If-Modified-Since'] = cached_metadata['last_modified']
             
-            # タイトルの取得
-            title = self._extract_title(soup)
-            
-            # 説明の取得
-            description = self._extract_description(soup)
+            response = await self.http_client.get_capped(url, self.max_page_bytes, headers=headers or None, timeout=10)
+            if response.status_code == 304 and cached:
+                return None
+            response.raise_for_status()
             
-            # 画像の取得
-            images = self._extract_images(soup, url)
+            # 文字コードが分かればデコード済みの文字列を渡し、パーサー側の推定を省く
+            charset = sniff_charset(response.content, response.headers.get('content-type', ''))
+            content = decode_html(response.content, charset)
             
-            # テキストコンテンツの取得
-            text_content = self._extract_text_content(soup)
+            scraped_data = await self._parse(content, url, main_selector=main_selector)
             
-            # メタデータの取得
-            metadata = self._extract_metadata(soup, url)
+            if response.truncated:
+                print(f"ページが大きいため先頭{self.max_page_bytes}バイトのみ解析")
+                scraped_data.metadata['truncated'] = True
+            scraped_data.metadata['page_bytes'] = len(response.content)
             
-            # ベースURLをメタデータに追加
-            from urllib.parse import urlparse
-            parsed_url = urlparse(url)
-            metadata['base_url'] = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            metadata['source_url'] = url
+            # 次回の条件付きGET用に検証子を保存
+            if response.headers.get('etag'):
+                scraped_data.metadata['etag'] = response.headers['etag']
+            if response.headers.get('last-modified'):
+                scraped_data.metadata['last_modified'] = response.headers['last-modified']
             
-            return ScrapedData(
-                url=url,
-                title=title or metadata.get('page_title', ''),
-                description=description or metadata.get('meta_description', ''),
-                text_content=metadata.get('full_content', text_content or ''),
-                images=images,
-                metadata=metadata
-            )
+            return scraped_data
             
         except Exception as e:
             print(f"静的スクレイピングエラー: {e}")
             return ScrapedData()
     
+    async def _parse(self, content, url: str, images_only: bool = False, main_selector: Optional[str] = None) -> ScrapedData:
+        """パースと抽出（ワーカープロセスが使えなければこのプロセスで実行）"""
+        scraped_data = await self.parse_pool.submit(content, url, images_only=images_only, main_selector=main_selector)
+        if scraped_data is None:
+            scraped_data = self._parse_page(content, url, images_only=images_only, main_selector=main_selector)
+        return scraped_data
+    
+    def _parse_page(self, content, url: str, images_only: bool = False, main_selector: Optional[str] = None) -> ScrapedData:
+        """HTMLをパースしてScrapedDataを作成（CPU処理のみ。ワーカープロセスからも呼ばれる）"""
+        # 1度だけパースし、各抽出処理で共有する
+        doc = ParsedDocument(content, url)
+        
+        # 動的スクレイピングでは画像のみ使う
+        if images_only:
+            return ScrapedData(images=self._extract_images(doc, url, main_selector))
+        
+        # タイトルの取得
+        title = self._extract_title(doc)
+        
+        # 説明の取得
+        description = self._extract_description(doc)
+        
+        # 画像の取得
+        images = self._extract_images(doc, url, main_selector)
+        
+        # テキストコンテンツの取得
+        text_content = self._extract_text_content(doc)
+        
+        # メタデータの取得
+        metadata = self._extract_metadata(doc, url)
+        
+        # 構造化データ（JSON-LD・microdata・OpenGraph）の取得
+        structured_data = self._extract_structured_data(doc, url)
+        
+        # ベースURLをメタデータに追加
+        from urllib.parse import urlparse
+        parsed_url = urlparse(url)
+        metadata['base_url'] = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        metadata['source_url'] = url
+        
+        # サイトプロファイル用に、メインコンテンツセレクタごとの画像数を記録
+        collected = self._image_candidates(doc, main_selector)
+        if collected['main_selector']:
+            metadata['main_selector'] = collected['main_selector']
+            metadata['main_selector_images'] = collected.get('selector_images', {})
+
+        # 関連ページの候補リンク（関連ページ取得時に使う）
+        subpage_links = self._extract_subpage_links(doc, url)
+        if subpage_links:
+            metadata['subpage_links'] = subpage_links
+
+        return ScrapedData(
+            url=url,
+            title=title or metadata.get('page_title', ''),
+            description=description or metadata.get('meta_description', ''),
+            text_content=metadata.get('full_content', text_content or ''),
+            images=images,
+            metadata=metadata,
+            structured_data=structured_data
+        )
+    
+    async def _timed_dynamic_scrape(self, url: str):
+        """動的スクレイピングの結果と所要時間（秒）"""
+        started = time.monotonic()
+        dynamic_data = await self._dynamic_scrape(url)
+        return dynamic_data, time.monotonic() - started
+    
     async def _dynamic_scrape(self, url: str) -> ScrapedData:
         """動的スクレイピング（Playwright使用）"""
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
-                
-                await page.goto(url, wait_until='networkidle')
-                
-                # ページの内容を取得
-                content = await page.content()
-                soup = BeautifulSoup(content, 'html.parser')
-                
-                # 画像の取得
-                images = self._extract_images(soup, url)
-                
-                await browser.close()
-                
-                return ScrapedData(images=images)
-                
+            async with self.browser_pool.page() as page:
+                # ページの内容を取得（ページ本体の読み込みもホスト単位の送信制御に従う）
+                if self.http_client.scheduler is not None:
+                    async with self.http_client.scheduler.slot(url):
+                        content = await self.page_loader.load(page, url)
+                else:
+                    content = await self.page_loader.load(page, url)
+            
+            # 静的スクレイピングと同じ上限で切り詰める
+            if len(content) > self.max_page_bytes:
+                content = content[:self.max_page_bytes]
+            
+            # 画像の取得
+            return await self._parse(content, url, images_only=True)
+            
         except Exception as e:
             print(f"動的スクレイピングエラー: {e}")
             return ScrapedData()
     
-    def _extract_title(self, soup: BeautifulSoup) -> Optional[str]:
+    def _extract_title(self, doc: ParsedDocument) -> Optional[str]:
         """タイトルの抽出"""
+        soup = doc.soup
         # 優先順位: h1 > title > og:title
         h1 = soup.find('h1')
         if h1:
@@ -136,8 +604,9 @@ class WebScraper:
         
         return None
     
-    def _extract_description(self, soup: BeautifulSoup) -> Optional[str]:
+    def _extract_description(self, doc: ParsedDocument) -> Optional[str]:
         """説明の抽出"""
+        soup = doc.soup
         # 優先順位: og:description > meta description > 最初のpタグ
         og_desc = soup.find('meta', property='og:description')
         if og_desc:
@@ -153,119 +622,89 @@ class WebScraper:
         
         return None
     
-    def _extract_images(self, soup: BeautifulSoup, base_url: str) -> List[str]:
+    def _extract_images(self, doc: ParsedDocument, base_url: str, main_selector: Optional[str] = None) -> List[str]:
         """画像URLの抽出（強化版）- 元サイトでの位置と重要度を考慮"""
-        images = []
+        # DOMを1回だけ走査して候補を集め、最後にまとめて順位付けする
+        collected = self._image_candidates(doc, main_selector)
+        
         seen_urls = set()
+        valid_cache = {}
         
-        # 画像を重要度とソースごとに分類
-        main_content_images = []
-        article_images = []
-        general_images = []
-        meta_images = []
+        def accept(src: Optional[str]) -> bool:
+            if not src or src in seen_urls:
+                return False
+            if src not in valid_cache:
+                valid_cache[src] = self._is_valid_image_url(src)
+            return valid_cache[src]
         
-        # メインコンテンツエリアを特定
-        main_content_selectors = [
-            'main',
-            'article', 
-            '.content',
-            '.main-content',
-            '.article-content',
-            '.post-content',
-            '.entry-content',
-            '#content',
-            '#main',
-            '#article',
-            '.container .content',
-            '.wrapper .content'
-        ]
+        # imgタグのURLは1度だけ解決する
+        for candidate in collected['images']:
+            candidate.url = self._extract_image_src(candidate.element, base_url)
         
-        main_content = None
-        for selector in main_content_selectors:
-            try:
-                main_content = soup.select_one(selector)
-                if main_content:
-                    print(f"メインコンテンツエリアを発見: {selector}")
-                    break
-            except:
-                continue
+        main_content = collected['main_content']
+        if main_content is not None:
+            print(f"メインコンテンツエリアを発見: {collected['main_selector']}")
         
         # メインコンテンツエリア内の画像を優先的に取得
-        if main_content:
-            for img in main_content.find_all('img'):
-                src = self._extract_image_src(img, base_url)
-                if src and self._is_valid_image_url(src) and src not in seen_urls:
-                    seen_urls.add(src)
-                    main_content_images.append(src)
-                    print(f"メインコンテンツ画像: {src}")
-        
-        # 記事・商品関連の特定エリアの画像
-        article_selectors = [
-            '.goods', '.product', '.item', '.merchandise',
-            '.gallery', '.photos', '.images',
-            '.character', '.anime', '.collaboration',
-            '.popup', '.store', '.campaign',
-            '.novelty', '.special', '.limited',
-            '.featured', '.highlight'
-        ]
+        main_content_images = []
+        if main_content is not None:
+            main_key = id(main_content)
+            for candidate in collected['images']:
+                if main_key in candidate.main_ancestors and accept(candidate.url):
+                    seen_urls.add(candidate.url)
+                    candidate.region = 'main'
+                    main_content_images.append(candidate)
+                    print(f"メインコンテンツ画像: {candidate.url}")
         
-        for selector in article_selectors:
-            try:
-                areas = soup.select(selector)
-                for area in areas:
-                    for img in area.find_all('img'):
-                        src = self._extract_image_src(img, base_url)
-                        if src and self._is_valid_image_url(src) and src not in seen_urls:
-                            seen_urls.add(src)
-                            article_images.append(src)
-                            print(f"記事関連画像: {src}")
-            except:
-                continue
+        # サイトプロファイル用に、見つかった各メインコンテンツ候補内の有効な画像数を数える
+        selector_images = {}
+        for index, element in enumerate(collected['main_matches']):
+            if element is not None:
+                key = id(element)
+                selector_images[MAIN_CONTENT_SELECTOR_NAMES[index]] = sum(
+                    1 for candidate in collected['images']
+                    if key in candidate.main_ancestors and candidate.url and self._is_valid_image_url(candidate.url)
+                )
+        collected['selector_images'] = selector_images
+        
+        # 記事・商品関連の特定エリアの画像（セレクタの優先順 → 文書順）
+        article_images = []
+        article_candidates = [c for c in collected['images'] if c.article_rank is not None]
+        article_candidates.sort(key=lambda c: (c.article_rank, c.order))
+        for candidate in article_candidates:
+            if accept(candidate.url):
+                seen_urls.add(candidate.url)
+                candidate.region = 'article'
+                article_images.append(candidate)
+                print(f"記事関連画像: {candidate.url}")
         
         # 一般的なimgタグから画像を取得（メインコンテンツ以外）
-        for img in soup.find_all('img'):
-            # メインコンテンツ内の画像は既に処理済みなのでスキップ
-            if main_content and img in main_content.find_all('img'):
+        general_images = []
+        for candidate in collected['images']:
+            if main_content is not None and id(main_content) in candidate.main_ancestors:
                 continue
-            
-            src = self._extract_image_src(img, base_url)
-            if src and self._is_valid_image_url(src) and src not in seen_urls:
+            if accept(candidate.url):
                 # 画像の親要素から重要度を判定
-                importance = self._calculate_image_importance(img)
-                if importance > 0:  # 重要度が正の場合のみ追加
-                    seen_urls.add(src)
-                    general_images.append((src, importance))
+                candidate.importance = self._calculate_image_importance(candidate.element)
+                if candidate.importance > 0:  # 重要度が正の場合のみ追加
+                    seen_urls.add(candidate.url)
+                    candidate.region = 'general'
+                    general_images.append(candidate)
         
         # メタデータから画像を取得
-        meta_selectors = [
-            ('meta[property="og:image"]', 'content'),
-            ('meta[name="twitter:image"]', 'content'),
-            ('meta[name="twitter:image:src"]', 'content')
-        ]
-        
-        for selector, attr in meta_selectors:
-            try:
-                meta_tag = soup.select_one(selector)
-                if meta_tag:
-                    src = meta_tag.get(attr, '')
-                    if src and self._is_valid_image_url(src) and src not in seen_urls:
-                        seen_urls.add(src)
-                        meta_images.append(src)
-                        print(f"メタ画像: {src}")
-            except:
-                continue
+        meta_images = []
+        for candidate in collected['meta']:
+            if accept(candidate.url):
+                seen_urls.add(candidate.url)
+                meta_images.append(candidate)
+                print(f"メタ画像: {candidate.url}")
         
         # 背景画像も取得（CSS style属性から）
         bg_images = []
-        for element in soup.find_all(attrs={'style': True}):
-            style = element.get('style', '')
-            if 'background-image' in style:
-                import re
-                bg_matches = re.findall(r'background-image:\s*url\(["\']?([^"\']+)["\']?\)', style)
-                for bg_url in bg_matches:
-                    if self._is_valid_image_url(bg_url) and bg_url not in seen_urls:
-                        seen_urls.add(bg_url)
-                        bg_images.append(bg_url)
+        for candidate in collected['backgrounds']:
+            if accept(candidate.url):
+                seen_urls.add(candidate.url)
+                bg_images.append(candidate)
         
         # 画像を重要度順に統合
         final_images = []
@@ -277,8 +716,8 @@ class WebScraper:
         final_images.extend(article_images[:3])  # 最大3枚
         
         # 3. 一般画像（重要度でソート）
-        general_images.sort(key=lambda x: x[1], reverse=True)
-        final_images.extend([img[0] for img in general_images[:3]])  # 最大3枚
+        general_images.sort(key=lambda c: c.importance, reverse=True)
+        final_images.extend(general_images[:3])  # 最大3枚
         
         # 4. メタ画像（補完用）
         if len(final_images) < 3:
@@ -288,23 +727,117 @@ class WebScraper:
         if len(final_images) < 2:
             final_images.extend(bg_images[:1])
         
-        # 最終的な品質フィルタリング
+        # 最終的な品質フィルタリング（seen_urlsで重複は既に除去済み）
         quality_images = []
-        for img_url in final_images:
-            if img_url not in [qi[0] for qi in quality_images]:  # 重複除去
-                quality_score = self._calculate_image_quality_score(img_url)
-                if quality_score > 0:  # スコアが正の場合のみ
-                    quality_images.append((img_url, quality_score))
+        for candidate in final_images:
+            candidate.quality = self._calculate_image_quality_score(candidate.url)
+            if candidate.quality > 0:  # スコアが正の場合のみ
+                quality_images.append(candidate)
         
         # 品質スコアでソートして返す
-        quality_images.sort(key=lambda x: x[1], reverse=True)
-        result = [img[0] for img in quality_images[:10]]  # 最大10枚まで
+        quality_images.sort(key=lambda c: c.quality, reverse=True)
+        result = [c.url for c in quality_images[:10]]  # 最大10枚まで
         
         print(f"最終選択画像: {len(result)}枚")
         for i, img_url in enumerate(result):
             print(f"  選択画像{i+1}: {img_url}")
         
         return result
+    
+    def _image_candidates(self, doc: ParsedDocument, main_selector: Optional[str] = None) -> Dict[str, Any]:
+        """画像候補（文書単位でキャッシュ）"""
+        return doc.memo('image_candidates', lambda: self._collect_image_candidates(doc.soup, main_selector))
+    
+    def _collect_image_candidates(self, soup, main_selector: Optional[str] = None) -> Dict[str, Any]:
+        """DOMを1回走査して画像候補・メインコンテンツ候補を収集（main_selectorが見つかればそれを優先）"""
+        images = []
+        backgrounds = []
+        meta_matches = [None] * len(META_IMAGE_SELECTORS)
+        main_matches = [None] * len(MAIN_CONTENT_SELECTORS)
+        
+        # (要素, メインコンテンツ候補の祖先, 記事エリアの最優先順位, .containerの子孫か, .wrapperの子孫か)
+        stack = [(child, (), None, False, False) for child in reversed(soup.contents) if child.name is not None]
+        order = 0
+        
+        while stack:
+            element, main_ancestors, article_rank, in_container, in_wrapper = stack.pop()
+            name = element.name
+            attrs = element.attrs
+            
+            classes = attrs.get('class') or ()
+            if isinstance(classes, str):
+                classes = classes.split()
+            
+            if name == 'img':
+                images.append(ImageCandidate(element, order, main_ancestors, article_rank))
+                order += 1
+            elif name == 'meta':
+                for index, (attr_name, attr_value) in enumerate(META_IMAGE_SELECTORS):
+                    if meta_matches[index] is None and attrs.get(attr_name) == attr_value:
+                        meta_matches[index] = element
+            
+            style = attrs.get('style')
+            if style and 'background-image' in style:
+                for bg_url in BACKGROUND_IMAGE_PATTERN.findall(style):
+                    backgrounds.append(ImageCandidate(element, order, main_ancestors, article_rank, url=bg_url, region='bg'))
+            
+            # メインコンテンツ候補のセレクタ判定
+            matched_main = False
+            for index, (kind, value, ancestor_class) in enumerate(MAIN_CONTENT_SELECTORS):
+                if kind == 'tag':
+                    matched = name == value
+                elif kind == 'id':
+                    matched = attrs.get('id') == value
+                else:
+                    matched = value in classes
+                    if matched and ancestor_class == 'container':
+                        matched = in_container
+                    elif matched and ancestor_class == 'wrapper':
+                        matched = in_wrapper
+                if matched:
+                    matched_main = True
+                    if main_matches[index] is None:
+                        main_matches[index] = element
+            
+            # 子要素に引き継ぐ文脈
+            child_main_ancestors = main_ancestors + (id(element),) if matched_main else main_ancestors
+            child_article_rank = article_rank
+            for cls in classes:
+                rank = ARTICLE_SELECTOR_RANKS.get(cls)
+                if rank is not None and (child_article_rank is None or rank < child_article_rank):
+                    child_article_rank = rank
+            child_in_container = in_container or 'container' in classes
+            child_in_wrapper = in_wrapper or 'wrapper' in classes
+            
+            for child in reversed(element.contents):
+                if child.name is not None:
+                    stack.append((child, child_main_ancestors, child_article_rank, child_in_container, child_in_wrapper))
+        
+        # サイトプロファイルで指定されたセレクタ、なければ優先順で最初に見つかった要素をメインコンテンツとする
+        main_content = None
+        if main_selector in MAIN_CONTENT_SELECTOR_NAMES:
+            main_content = main_matches[MAIN_CONTENT_SELECTOR_NAMES.index(main_selector)]
+        if main_content is None:
+            main_selector = None
+            for index, element in enumerate(main_matches):
+                if element is not None:
+                    main_content = element
+                    main_selector = MAIN_CONTENT_SELECTOR_NAMES[index]
+                    break
+        
+        meta = []
+        for element in meta_matches:
+            if element is not None:
+                meta.append(ImageCandidate(element, -1, (), None, url=element.get('content', ''), region='meta'))
+        
+        return {
+            'images': images,
+            'meta': meta,
+            'backgrounds': backgrounds,
+            'main_content': main_content,
+            'main_selector': main_selector,
+            'main_matches': main_matches,
+        }
 
     def _extract_image_src(self, img_tag, base_url: str) -> Optional[str]:
         """imgタグから画像URLを抽出"""
@@ -359,68 +892,31 @@ class WebScraper:
     def _calculate_image_importance(self, img_tag) -> int:
         """画像の重要度を計算（DOM位置、クラス、親要素から判定）"""
         importance = 0
+        attrs = img_tag.attrs
         
         # alt属性の内容
-        alt_text = img_tag.get('alt', '').lower()
+        alt_text = attrs.get('alt')
         if alt_text:
-            important_alt_keywords = [
-                'goods', 'product', 'item', 'merchandise',
-                'character', 'anime', 'collaboration', 'collab',
-                'popup', 'store', 'campaign', 'event',
-                'novelty', 'special', 'limited', 'exclusive',
-                'new', 'latest', 'featured', 'main'
-            ]
-            
-            for keyword in important_alt_keywords:
-                if keyword in alt_text:
-                    importance += 3
-                    break
+            importance += self._keyword_importance(alt_text.lower(), 'alt')
         
         # クラス名から判定
-        class_names = ' '.join(img_tag.get('class', [])).lower()
+        class_names = attrs.get('class')
         if class_names:
-            important_class_keywords = [
-                'main', 'hero', 'featured', 'primary',
-                'goods', 'product', 'item', 'gallery',
-                'character', 'anime', 'artwork',
-                'campaign', 'special', 'highlight'
-            ]
-            
-            unimportant_class_keywords = [
-                'thumb', 'thumbnail', 'small', 'mini',
-                'icon', 'logo', 'brand', 'header', 'footer',
-                'nav', 'menu', 'ad', 'banner', 'sidebar'
-            ]
-            
-            for keyword in important_class_keywords:
-                if keyword in class_names:
-                    importance += 2
-            
-            for keyword in unimportant_class_keywords:
-                if keyword in class_names:
-                    importance -= 3
+            importance += self._keyword_importance(' '.join(class_names).lower(), 'class')
         
         # 親要素から判定
         parent = img_tag.parent
-        if parent:
-            parent_class = ' '.join(parent.get('class', [])).lower()
-            parent_id = parent.get('id', '').lower()
-            
-            important_parent_patterns = [
-                'gallery', 'photos', 'images', 'slideshow',
-                'goods', 'products', 'items', 'merchandise',
-                'main', 'content', 'article', 'featured',
-                'hero', 'banner', 'highlight'
-            ]
-            
-            for pattern in important_parent_patterns:
-                if pattern in parent_class or pattern in parent_id:
-                    importance += 2
-                    break
+        if parent is not None:
+            parent_attrs = parent.attrs
+            parent_class = parent_attrs.get('class')
+            parent_id = parent_attrs.get('id')
+            if ((parent_class and self._keyword_importance(' '.join(parent_class).lower(), 'parent')) or
+                    (parent_id and self._keyword_importance(parent_id.lower(), 'parent'))):
+                importance += 2
         
         # 画像サイズ（width, height属性）
-        width = img_tag.get('width')
-        height = img_tag.get('height')
+        width = attrs.get('width')
+        height = attrs.get('height')
         
         if width and height:
             try:
@@ -435,6 +931,26 @@ class WebScraper:
                 pass
         
         return importance
+    
+    def _keyword_importance(self, text: str, kind: str) -> int:
+        """alt・クラス名・親要素の文字列による加点（同じ文字列はキーワード照合をやり直さない）"""
+        key = (kind, text)
+        score = self._importance_memo.get(key)
+        if score is not None:
+            return score
+        
+        hits = self.keyword_matcher.find(text)
+        if kind == 'alt':
+            score = 0 if IMPORTANT_ALT_KEYWORDS.isdisjoint(hits) else 3
+        elif kind == 'class':
+            score = 2 * len(IMPORTANT_CLASS_KEYWORDS & hits) - 3 * len(UNIMPORTANT_CLASS_KEYWORDS & hits)
+        else:
+            score = 0 if IMPORTANT_PARENT_PATTERNS.isdisjoint(hits) else 1
+        
+        if len(self._importance_memo) >= self.keyword_matcher.memo_size:
+            self._importance_memo.clear()
+        self._importance_memo[key] = score
+        return score
 
     def _is_valid_image_url(self, url: str) -> bool:
         """画像URLの有効性をチェック（緩和版）"""
@@ -442,51 +958,26 @@ class WebScraper:
             return False
         
         url_lower = url.lower()
-        
-        # 重要：除外パターンを大幅に緩和
-        exclude_patterns = [
-            'data:image',  # base64画像
-            'placeholder',
-            'loading',
-            'spinner',
-            '.svg',  # SVGは除外
-            '1x1',   # トラッキングピクセル
-            'pixel',  # トラッキングピクセル
-            'spacer',  # スペーサー画像
-            'blank',  # 空白画像
-            'transparent',  # 透明画像
-            'favicon',  # ファビコン
-            'noimage',  # 画像なし
-            'analytics',  # アナリティクス
-            'tracking',  # トラッキング
-        ]
+        hits = self.keyword_matcher.find(url_lower)
         
         # URLパスから除外パターンをチェック（緩和）
-        if any(pattern in url_lower for pattern in exclude_patterns):
+        if not EXCLUDE_URL_PATTERNS.isdisjoint(hits):
             print(f"除外対象画像: {url}")
             return False
         
         # ファイル名から除外パターンをチェック（緩和）
         filename = url_lower.split('/')[-1].split('?')[0]  # クエリパラメータを除去
-        filename_exclude_patterns = [
-            'btn_',  # ボタン画像
-            'spacer_',  # スペーサー
-            'blank_',  # 空白画像
-        ]
-        
-        if any(pattern in filename for pattern in filename_exclude_patterns):
+        if any(pattern in filename for pattern in FILENAME_EXCLUDE_PATTERNS):
             print(f"ファイル名による除外: {url}")
             return False
         
         # 有効な拡張子をチェック
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']
-        if any(ext in url_lower for ext in valid_extensions):
+        if not VALID_IMAGE_EXTENSIONS.isdisjoint(hits):
             print(f"有効な画像URL: {url}")
             return True
         
         # 拡張子がない場合でも、画像っぽいパスなら有効とする
-        image_keywords = ['image', 'img', 'photo', 'picture', 'gallery', 'media']
-        if any(keyword in url_lower for keyword in image_keywords):
+        if not IMAGE_PATH_KEYWORDS.isdisjoint(hits):
             print(f"画像キーワードマッチ: {url}")
             return True
         
@@ -496,66 +987,11 @@ class WebScraper:
         """画像の品質スコアを計算（緩和版）"""
         score = 10  # ベーススコアを上げる
         url_lower = url.lower()
+        hits = self.keyword_matcher.find(url_lower)
         
-        # 高品質を示すキーワード（スコア上昇）
-        quality_keywords = {
-            'large': 4,
-            'big': 3,
-            'full': 4,
-            'original': 5,
-            'high': 3,
-            'main': 4,
-            'hero': 5,
-            'featured': 4,
-            'gallery': 3,
-            'photo': 3,
-            'image': 2,
-            'picture': 2,
-            'visual': 2,
-            'artwork': 4,
-            'character': 4,  # キャラクター画像
-            'anime': 4,  # アニメ関連
-            'goods': 4,  # グッズ画像
-            'product': 4,  # 商品画像
-            'item': 3,   # アイテム画像
-            'merchandise': 3,  # 商品
-            'collaboration': 3,  # コラボ関連
-            'event': 3,  # イベント関連
-            'popup': 4,  # ポップアップ関連
-            'store': 2,  # ストア関連
-            'campaign': 3,  # キャンペーン
-            'special': 3,  # 特別な
-            'limited': 3,  # 限定
-            'exclusive': 3,  # 限定
-            'new': 2,    # 新商品
-            'latest': 2,  # 最新
-            'banner': 2,  # バナー（緩和）
-            'logo': 1,   # ロゴ（完全除外から緩和）
-            'icon': 1,   # アイコン（完全除外から緩和）
-        }
-        
-        for keyword, points in quality_keywords.items():
-            if keyword in url_lower:
-                score += points
-        
-        # 低品質を示すキーワード（減点を緩和）
-        low_quality_keywords = {
-            'thumb': -2,  # -4から-2に緩和
-            'thumbnail': -2,  # -4から-2に緩和
-            'small': -1,  # -3から-1に緩和
-            'mini': -1,   # -3から-1に緩和
-            'tiny': -2,   # -4から-2に緩和
-            'pixel': -5,  # トラッキングピクセルは厳格に
-            'tracking': -5,  # トラッキングは厳格に
-            'spacer': -5,    # スペーサーは厳格に
-            'blank': -5,     # 空白画像は厳格に
-            'placeholder': -3,  # プレースホルダーは減点
-            'default': -1,      # デフォルト画像は軽減点
-        }
-        
-        for keyword, points in low_quality_keywords.items():
-            if keyword in url_lower:
-                score += points
+        # 高品質・低品質を示すキーワード（1回の走査結果から加点・減点）
+        for keyword in hits:
+            score += QUALITY_KEYWORD_POINTS.get(keyword, 0)
         
         # URLの構造による判定
         path_parts = url_lower.split('/')
@@ -565,69 +1001,119 @@ class WebScraper:
             score += 2
         
         # CDNやメディアサーバーの画像は品質が高い可能性
-        if any(cdn in url_lower for cdn in ['cdn', 'media', 'assets', 'static', 'images']):
+        if not CDN_KEYWORDS.isdisjoint(hits):
             score += 2
         
         # ファイル名に数字が多い場合（商品コードなど）
         filename = path_parts[-1].split('?')[0] if path_parts else ''
-        if len([c for c in filename if c.isdigit()]) >= 3:
+        if sum(c.isdigit() for c in filename) >= 3:
             score += 1
         
         # URLの長さ（長いURLは詳細な画像の可能性）
         if len(url) > 100:
             score += 1
-        elif len(url) > 150:
-            score += 2
         
         # 画像サイズの推測（URLに含まれるサイズ情報）
-        size_patterns = [
-            r'(\d{3,4})x(\d{3,4})',  # 640x480のような形式
-            r'w(\d{3,4})',  # w640のような形式
-            r'h(\d{3,4})',  # h480のような形式
-        ]
+        dimension = SIZE_DIMENSION_PATTERN.search(url_lower)
+        if dimension:
+            width, height = int(dimension.group(1)), int(dimension.group(2))
+            # 大きな画像にボーナス
+            if width >= 800 or height >= 600:
+                score += 3
+            elif width >= 400 or height >= 300:
+                score += 1
         
-        import re
-        for pattern in size_patterns:
-            matches = re.findall(pattern, url_lower)
-            if matches:
-                if isinstance(matches[0], tuple):
-                    width, height = int(matches[0][0]), int(matches[0][1])
-                    # 大きな画像にボーナス
-                    if width >= 800 or height >= 600:
-                        score += 3
-                    elif width >= 400 or height >= 300:
-                        score += 1
-                else:
-                    size = int(matches[0])
-                    if size >= 800:
-                        score += 3
-                    elif size >= 400:
-                        score += 1
+        for pattern in SIZE_SINGLE_PATTERNS:
+            match = pattern.search(url_lower)
+            if match:
+                size = int(match.group(1))
+                if size >= 800:
+                    score += 3
+                elif size >= 400:
+                    score += 1
         
         return max(5, score)  # 最低スコアを5に設定（0から変更）
     
-    def _extract_text_content(self, soup: BeautifulSoup) -> Optional[str]:
+    def _extract_text_content(self, doc: ParsedDocument) -> Optional[str]:
         """テキストコンテンツの抽出"""
-        # メインコンテンツエリアを探す
-        main_content = (
-            soup.find('main') or 
-            soup.find('article') or 
-            soup.find('div', class_=re.compile(r'content|main|article', re.I)) or
-            soup.find('div', id=re.compile(r'content|main|article', re.I))
-        )
+        main_content, noise = self._text_content_area(doc)
         
         if main_content:
-            # 不要なタグを削除
-            for tag in main_content.find_all(['script', 'style', 'nav', 'header', 'footer']):
-                tag.decompose()
-            
-            return main_content.get_text().strip()
+            # 不要なタグは削除せず読み飛ばす（文書は他の抽出処理と共有）
+            return doc.get_text(main_content, exclude=noise).strip()
         
         return None
     
-    def _extract_metadata(self, soup, url: str) -> Dict[str, str]:
+    def _text_content_area(self, doc: ParsedDocument):
+        """本文エリアと、その中の不要なタグ（script, style, nav, header, footer）"""
+        def find_area():
+            soup = doc.soup
+            # メインコンテンツエリアを探す
+            main_content = (
+                soup.find('main') or 
+                soup.find('article') or 
+                soup.find('div', class_=re.compile(r'content|main|article', re.I)) or
+                soup.find('div', id=re.compile(r'content|main|article', re.I))
+            )
+            if not main_content:
+                return None, []
+            return main_content, main_content.find_all(['script', 'style', 'nav', 'header', 'footer'])
+        
+        return doc.memo('text_content_area', find_area)
+    
+    def _extract_structured_data(self, doc: ParsedDocument, url: str) -> Optional[StructuredData]:
+        """ページに埋め込まれたイベント・商品の構造化データを抽出"""
+        try:
+            structured_data = extract_structured_data(doc.soup, url)
+            if structured_data:
+                print(f"構造化データを取得: {', '.join(structured_data.sources)}")
+            return structured_data
+        except Exception as e:
+            print(f"構造化データ抽出エラー: {e}")
+            return None
+    
+    def _extract_subpage_links(self, doc: ParsedDocument, url: str) -> List[Dict[str, Any]]:
+        """同一サイト内の関連ページへのリンクを関連度順に抽出（ナビゲーション・フッター内は除く）"""
+        from urllib.parse import urlparse, urldefrag
+        try:
+            site = site_domain(url)
+            page = urldefrag(url)[0]
+
+            links = {}
+            for order, anchor in enumerate(doc.soup.find_all('a', href=True)):
+                href = anchor['href'].strip()
+                if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
+                    continue
+                link_url = urldefrag(self._resolve_url(href, url) or '')[0]
+                parsed = urlparse(link_url)
+                if parsed.scheme not in ('http', 'https') or link_url == page or site_domain(link_url) != site:
+                    continue
+                if os.path.splitext(parsed.path.lower())[1] in NON_PAGE_EXTENSIONS:
+                    continue
+
+                text = re.sub(r'\s+', ' ', anchor.get_text(' ', strip=True))[:100]
+                hint = f"{parsed.path} {parsed.query} {text} {anchor.get('title', '')}".lower()
+                score = sum(weight for keyword, weight in SUBPAGE_LINK_KEYWORDS.items() if keyword in hint)
+                if not score or anchor.find_parent(['nav', 'header', 'footer']) is not None:
+                    continue
+
+                # 同じリンクが複数あれば高い方の点数を使う
+                if link_url not in links or links[link_url]['score'] < score:
+                    links[link_url] = {'url': link_url, 'text': text, 'score': score, 'order': order}
+
+            ranked = sorted(links.values(), key=lambda link: (-link['score'], link['order']))
+            return [
+                {'url': link['url'], 'text': link['text'], 'score': link['score']}
+                for link in ranked[:SUBPAGE_LINK_LIMIT]
+            ]
+        except Exception as e:
+            print(f"関連リンク抽出エラー: {e}")
+            return []
+
+    def _extract_metadata(self, doc: ParsedDocument, url: str) -> Dict[str, str]:
         """メタデータと全文テキストを抽出（シンプル版）"""
         metadata = {'source_url': url}
+        soup = doc.soup
         
         try:
             print("全文テキスト抽出開始...")
@@ -643,15 +1129,25 @@ class WebScraper:
             if meta_desc:
                 metadata['meta_description'] = meta_desc.get('content', '').strip()
             
-            # サイト全体のテキストを取得（情報を絞らない）
-            full_text = soup.get_text()
+            # サイト全体のテキストを取得（情報を絞らない。本文エリア内の不要なタグのみ除外）
+            _, noise = self._text_content_area(doc)
+            full_text = doc.get_text(exclude=noise)
             
             # 不要な空白・改行を整理するだけ
             clean_text = re.sub(r'\s+', ' ', full_text).strip()
             metadata['full_content'] = clean_text
             
-            print(f"全文テキスト取得完了: {len(clean_text)}文字")
-            print(f"テキスト冒頭: {clean_text[:200]}...")
+            # ナビゲーション・フッター・関連商品等を除いた本文に絞る（短すぎる場合は全文のまま）
+            if self.content_distiller.enabled:
+                main_content, _ = self._text_content_area(doc)
+                distilled = self.content_distiller.distill(soup, main_content)
+                metadata.update(self.content_distiller.get_report(clean_text, distilled))
+                if distilled is not None:
+                    metadata['full_content'] = distilled
+                    print(f"本文抽出: {len(clean_text)}文字 → {len(distilled)}文字")
+            
+            print(f"全文テキスト取得完了: {len(metadata['full_content'])}文字")
+            print(f"テキスト冒頭: {metadata['full_content'][:200]}...")
             
             return metadata
             
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import asyncio
+from urllib.parse import urlparse
+from typing import Optional, Dict, Any
+
+# 判定に使う最低限の観測回数（減衰後の重み）
+DEFAULT_MIN_SAMPLES = 2.0
+
+# 動的スクレイピングで増える画像がこれ未満なら静的のみで十分とみなす
+MIN_DYNAMIC_GAIN = 0.5
+
+
+def site_domain(url: str) -> str:
+    """プロファイルのキーにするドメイン（www.は除く）"""
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class SiteProfileStore:
+    """ドメイン別のスクレイピング実績（静的/動的の画像数・所要時間・有効なメインコンテンツセレクタ）
+
+    観測値は半減期に従って減衰させた重み付き平均で持ち、古い実績ほど効かなくなる。
+    relearn_every回に1回は従来どおりの判定で実行し、サイト側の変化を学び直す。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        half_life_days: Optional[float] = None,
+        relearn_every: Optional[int] = None,
+        min_samples: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        if enabled is None:
+            enabled = os.getenv('SITE_PROFILES_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.path = path or os.getenv('SITE_PROFILES_PATH', '.cache/site_profiles.json')
+        self.half_life_days = half_life_days or float(os.getenv('SITE_PROFILE_HALF_LIFE_DAYS', '7'))
+        self.relearn_every = relearn_every or int(os.getenv('SITE_PROFILE_RELEARN_EVERY', '10'))
+        self.min_samples = min_samples or float(os.getenv('SITE_PROFILE_MIN_SAMPLES', str(DEFAULT_MIN_SAMPLES)))
+
+        self._profiles: Optional[Dict[str, Dict[str, Any]]] = None
+        self._save_lock = asyncio.Lock()
+        self._stats = {
+            'planned_auto': 0,
+            'planned_static': 0,
+            'planned_dynamic': 0,
+            'relearns': 0,
+            'selector_hints': 0,
+        }
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """保存済みプロファイルを読み込む（初回のみ）"""
+        if self._profiles is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._profiles = json.load(f)
+            except FileNotFoundError:
+                self._profiles = {}
+            except (OSError, ValueError) as e:
+                print(f"サイトプロファイル読み込みエラー: {e}")
+                self._profiles = {}
+        return self._profiles
+
+    def _decayed(self, profile: Dict[str, Any], now: float) -> Dict[str, Any]:
+        """経過時間に応じて重みと合計値を減衰させたプロファイル"""
+        age_days = max(0.0, now - profile['updated_at']) / 86400
+        factor = 0.5 ** (age_days / self.half_life_days)
+
+        def scale(entry: Dict[str, float]) -> Dict[str, float]:
+            return {key: value * factor for key, value in entry.items()}
+
+        return {
+            **profile,
+            'updated_at': now,
+            'static': scale(profile['static']),
+            'dynamic': scale(profile['dynamic']),
+            'selectors': {name: scale(entry) for name, entry in profile['selectors'].items()},
+        }
+
+    def _average(self, entry: Dict[str, float], key: str) -> Optional[float]:
+        """重み付き平均（観測がなければNone）"""
+        if entry['weight'] <= 0:
+            return None
+        return entry[key] / entry['weight']
+
+    def plan(self, url: str) -> Dict[str, Any]:
+        """このURLで使う戦略（auto / static / dynamic）と優先するメインコンテンツセレクタ"""
+        plan = {'strategy': 'auto', 'main_selector': None}
+        if not self.enabled:
+            return plan
+
+        profile = self._load().get(site_domain(url))
+        if profile is None:
+            self._stats['planned_auto'] += 1
+            return plan
+
+        # 定期的に従来の判定で実行して学び直す
+        if (profile['visits'] + 1) % self.relearn_every == 0:
+            self._stats['relearns'] += 1
+            self._stats['planned_auto'] += 1
+            return plan
+
+        profile = self._decayed(profile, time.time())
+        static, dynamic = profile['static'], profile['dynamic']
+
+        if static['weight'] >= self.min_samples and dynamic['weight'] >= self.min_samples:
+            gain = self._average(dynamic, 'gain')
+            static_images = self._average(static, 'images')
+            if gain < MIN_DYNAMIC_GAIN:
+                plan['strategy'] = 'static'
+            elif static_images < 3:
+                plan['strategy'] = 'dynamic'
+        elif static['weight'] >= self.min_samples and dynamic['weight'] < 1 and self._average(static, 'images') >= 3:
+            # 静的だけで十分な画像が取れ続けているサイト
+            plan['strategy'] = 'static'
+
+        best_selector, best_images = None, 0.0
+        for name, entry in profile['selectors'].items():
+            images = self._average(entry, 'images')
+            if entry['weight'] >= 1 and images and images > best_images:
+                best_selector, best_images = name, images
+        if best_selector:
+            plan['main_selector'] = best_selector
+            self._stats['selector_hints'] += 1
+
+        self._stats[f"planned_{plan['strategy']}"] += 1
+        return plan
+
+    async def record(
+        self,
+        url: str,
+        static_images: int,
+        static_seconds: float,
+        dynamic_gain: Optional[int] = None,
+        dynamic_seconds: Optional[float] = None,
+        selector_images: Optional[Dict[str, int]] = None
+    ):
+        """スクレイピング結果を記録（動的スクレイピングを実行しなかった場合はdynamic_gain=None）"""
+        if not self.enabled:
+            return
+
+        profiles = self._load()
+        domain = site_domain(url)
+        now = time.time()
+        profile = profiles.get(domain)
+        if profile is None:
+            profile = {
+                'updated_at': now,
+                'visits': 0,
+                'static': {'weight': 0.0, 'images': 0.0, 'seconds': 0.0},
+                'dynamic': {'weight': 0.0, 'gain': 0.0, 'seconds': 0.0},
+                'selectors': {},
+            }
+        else:
+            profile = self._decayed(profile, now)
+
+        profile['visits'] += 1
+        static = profile['static']
+        static['weight'] += 1
+        static['images'] += static_images
+        static['seconds'] += static_seconds
+
+        if dynamic_gain is not None:
+            dynamic = profile['dynamic']
+            dynamic['weight'] += 1
+            dynamic['gain'] += dynamic_gain
+            dynamic['seconds'] += dynamic_seconds or 0.0
+
+        # ページ内で見つかったメインコンテンツセレクタごとの画像数
+        for name, images in (selector_images or {}).items():
+            entry = profile['selectors'].setdefault(name, {'weight': 0.0, 'images': 0.0})
+            entry['weight'] += 1
+            entry['images'] += images
+
+        profiles[domain] = profile
+        await self._save()
+
+    async def _save(self):
+        """プロファイルをファイルに保存"""
+        payload = json.dumps(self._profiles, ensure_ascii=False)
+        async with self._save_lock:
+            await asyncio.to_thread(self._write, payload)
+
+    def _write(self, payload: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"サイトプロファイル保存エラー: {e}")
+
+    def get_profile(self, url: str) -> Optional[Dict[str, Any]]:
+        """ドメインのプロファイル（平均値に換算したもの）"""
+        profile = self._load().get(site_domain(url))
+        if profile is None:
+            return None
+        profile = self._decayed(profile, time.time())
+        return {
+            'visits': profile['visits'],
+            'static_images': self._average(profile['static'], 'images'),
+            'static_seconds': self._average(profile['static'], 'seconds'),
+            'dynamic_gain': self._average(profile['dynamic'], 'gain'),
+            'dynamic_seconds': self._average(profile['dynamic'], 'seconds'),
+            'selectors': {
+                name: self._average(entry, 'images') for name, entry in profile['selectors'].items()
+            },
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """プロファイルの統計情報"""
+        return {
+            **self._stats,
+            'enabled': self.enabled,
+            'domains': len(self._profiles) if self._profiles is not None else None,
+        }
+
+
+_shared_store: Optional[SiteProfileStore] = None
+
+
+def get_site_profiles() -> SiteProfileStore:
+    """プロセス内で共有するSiteProfileStoreを取得"""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = SiteProfileStore()
+    return _shared_store
@@ -0,0 +1,265 @@
+import re
+import json
+from urllib.parse import urljoin
+from typing import Optional, List, Dict, Any, Iterable
+from models.structured_data import StructuredData, StructuredProduct
+
+# microdataで値を属性から読むタグ
+MICRODATA_URL_ATTRS = {
+    'a': 'href', 'link': 'href', 'area': 'href',
+    'img': 'src', 'audio': 'src', 'video': 'src', 'source': 'src', 'embed': 'src', 'iframe': 'src',
+    'object': 'data',
+}
+
+JSON_LINE_COMMENT_PATTERN = re.compile(r'^\s*//.*$', re.MULTILINE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def _schema_types(item: Dict[str, Any]) -> List[str]:
+    """@typeを型名のリストに（URL形式も名前だけにする）"""
+    types = item.get('@type') or item.get('type') or []
+    if isinstance(types, str):
+        types = [types]
+    return [str(t).rstrip('/').rsplit('/', 1)[-1] for t in types]
+
+
+def _is_event(item: Dict[str, Any]) -> bool:
+    return any(t == 'Event' or t.endswith('Event') for t in _schema_types(item))
+
+
+def _is_product(item: Dict[str, Any]) -> bool:
+    return any(t in ('Product', 'ProductGroup', 'IndividualProduct') for t in _schema_types(item))
+
+
+def _text(value: Any) -> Optional[str]:
+    """文字列・名前付きオブジェクト・リストから表示用の文字列を取り出す"""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        for entry in value:
+            text = _text(entry)
+            if text:
+                return text
+        return None
+    if isinstance(value, dict):
+        return _text(value.get('name') or value.get('@value') or value.get('url'))
+    text = WHITESPACE_PATTERN.sub(' ', str(value)).strip()
+    return text or None
+
+
+def _address(value: Any) -> Optional[str]:
+    """PostalAddressを1行の住所に"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        parts = [
+            _text(value.get(key)) for key in
+            ('postalCode', 'addressRegion', 'addressLocality', 'streetAddress')
+        ]
+        return ' '.join(part for part in parts if part) or _text(value.get('name'))
+    return _text(value)
+
+
+def _image_urls(value: Any, base_url: str) -> List[str]:
+    """image（文字列・ImageObject・リスト）を絶対URLのリストに"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        urls = []
+        for entry in value:
+            urls.extend(_image_urls(entry, base_url))
+        return urls
+    if isinstance(value, dict):
+        value = value.get('url') or value.get('contentUrl')
+        if not isinstance(value, str):
+            return []
+    url = str(value).strip()
+    if not url or url.startswith('data:'):
+        return []
+    return [urljoin(base_url, url)]
+
+
+def _walk_items(data: Any) -> Iterable[Dict[str, Any]]:
+    """JSON-LDの@graph・配列・入れ子をたどって型を持つオブジェクトを列挙"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            if _schema_types(node):
+                yield node
+            graph = node.get('@graph')
+            if graph is not None:
+                stack.append(graph)
+            # WebPage.mainEntity 等に入っている場合
+            for key in ('mainEntity', 'about', 'subjectOf', 'itemListElement', 'item'):
+                if key in node:
+                    stack.append(node[key])
+
+
+def _load_json_ld(raw: str) -> Optional[Any]:
+    """JSON-LDを読み込む（HTMLコメントやCDATAで囲まれたものも許容）"""
+    raw = raw.strip()
+    for prefix, suffix in (('<!--', '-->'), ('<![CDATA[', ']]>'), ('//<![CDATA[', '//]]>')):
+        if raw.startswith(prefix) and raw.endswith(suffix):
+            raw = raw[len(prefix):-len(suffix)].strip()
+    try:
+        return json.loads(raw)
+    except ValueError:
+        pass
+    try:
+        return json.loads(JSON_LINE_COMMENT_PATTERN.sub('', raw), strict=False)
+    except ValueError:
+        return None
+
+
+def _json_ld_items(soup) -> List[Dict[str, Any]]:
+    items = []
+    for script in soup.find_all('script', attrs={'type': re.compile(r'ld\+json', re.I)}):
+        data = _load_json_ld(script.string or script.get_text() or '')
+        if data is not None:
+            items.extend(_walk_items(data))
+    return items
+
+
+def _microdata_value(element) -> Any:
+    """itemprop要素の値（入れ子のitemscopeはオブジェクトに）"""
+    if element.has_attr('itemscope'):
+        return _microdata_item(element)
+    if element.has_attr('content'):
+        return element['content']
+    if element.name == 'time' and element.has_attr('datetime'):
+        return element['datetime']
+    if element.name == 'meta':
+        return element.get('content')
+    attr = MICRODATA_URL_ATTRS.get(element.name)
+    if attr and element.has_attr(attr):
+        return element[attr]
+    return element.get_text(' ', strip=True)
+
+
+def _microdata_item(scope) -> Dict[str, Any]:
+    """itemscope要素をJSON-LDと同じ形の辞書に"""
+    item: Dict[str, Any] = {}
+    itemtype = scope.get('itemtype')
+    if itemtype:
+        item['@type'] = itemtype.split() if isinstance(itemtype, str) else itemtype
+
+    # 入れ子のitemscopeの中は、そのスコープのプロパティなので読み飛ばす
+    stack = list(reversed([child for child in scope.contents if child.name is not None]))
+    while stack:
+        element = stack.pop()
+        props = element.get('itemprop')
+        if props:
+            value = _microdata_value(element)
+            for prop in props.split() if isinstance(props, str) else props:
+                if prop in item:
+                    existing = item[prop]
+                    item[prop] = (existing if isinstance(existing, list) else [existing]) + [value]
+                else:
+                    item[prop] = value
+        if not element.has_attr('itemscope'):
+            stack.extend(reversed([child for child in element.contents if child.name is not None]))
+    return item
+
+
+def _microdata_items(soup) -> List[Dict[str, Any]]:
+    items = []
+    for scope in soup.find_all(attrs={'itemscope': True}):
+        # 他のアイテムのプロパティになっているものは親側で読む
+        if scope.has_attr('itemprop'):
+            continue
+        items.extend(_walk_items(_microdata_item(scope)))
+    return items
+
+
+def _open_graph(soup) -> Dict[str, List[str]]:
+    properties: Dict[str, List[str]] = {}
+    for meta in soup.find_all('meta'):
+        key = meta.get('property') or meta.get('name') or ''
+        if key.startswith('og:') and meta.get('content'):
+            properties.setdefault(key, []).append(meta['content'].strip())
+    return properties
+
+
+def _apply_event(result: StructuredData, item: Dict[str, Any], base_url: str):
+    """Eventの項目を未設定のフィールドに反映"""
+    result.event_name = result.event_name or _text(item.get('name'))
+    result.start_date = result.start_date or _text(item.get('startDate'))
+    result.end_date = result.end_date or _text(item.get('endDate'))
+    result.description = result.description or _text(item.get('description'))
+    result.organizer = result.organizer or _text(item.get('organizer'))
+
+    location = item.get('location')
+    if isinstance(location, list):
+        location = location[0] if location else None
+    if isinstance(location, dict):
+        result.venue_name = result.venue_name or _text(location.get('name'))
+        result.venue_address = result.venue_address or _address(location.get('address'))
+    elif location:
+        result.venue_name = result.venue_name or _text(location)
+
+    result.images.extend(_image_urls(item.get('image'), base_url))
+    _apply_offers(result, item.get('offers'), base_url)
+
+
+def _apply_offers(result: StructuredData, offers: Any, base_url: str):
+    """Event・Productのoffersに含まれる商品を追加"""
+    if isinstance(offers, dict):
+        offers = [offers]
+    for offer in offers or []:
+        if isinstance(offer, dict) and isinstance(offer.get('itemOffered'), dict):
+            _apply_product(result, {**offer['itemOffered'], 'offers': {k: v for k, v in offer.items() if k != 'itemOffered'}}, base_url)
+
+
+def _apply_product(result: StructuredData, item: Dict[str, Any], base_url: str):
+    """Productを商品リストに追加"""
+    offers = item.get('offers')
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    price = currency = None
+    if isinstance(offers, dict):
+        price = _text(offers.get('price') or offers.get('lowPrice'))
+        currency = _text(offers.get('priceCurrency'))
+    images = _image_urls(item.get('image'), base_url)
+    product = StructuredProduct(
+        name=_text(item.get('name')),
+        price=price,
+        currency=currency,
+        image=images[0] if images else None
+    )
+    if product.name and product not in result.products:
+        result.products.append(product)
+
+
+def extract_structured_data(soup, base_url: str) -> Optional[StructuredData]:
+    """JSON-LD・microdata・OpenGraphからイベント・商品情報を取得（何もなければNone）"""
+    result = StructuredData()
+
+    for source, items in (('json-ld', _json_ld_items(soup)), ('microdata', _microdata_items(soup))):
+        found = False
+        for item in items:
+            if _is_event(item):
+                _apply_event(result, item, base_url)
+                found = True
+            elif _is_product(item):
+                _apply_product(result, item, base_url)
+                found = True
+        if found:
+            result.sources.append(source)
+
+    og = _open_graph(soup)
+    if og:
+        result.page_title = _text(og.get('og:title'))
+        result.site_name = _text(og.get('og:site_name'))
+        result.description = result.description or _text(og.get('og:description'))
+        for url in og.get('og:image', []):
+            result.images.extend(_image_urls(url, base_url))
+        result.sources.append('opengraph')
+
+    if not result.sources:
+        return None
+
+    result.images = list(dict.fromkeys(result.images))
+    return result
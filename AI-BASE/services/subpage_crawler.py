@@ -0,0 +1,195 @@
+import os
+import time
+import asyncio
+from typing import Optional, Dict, Any, List, Set
+from models.scraped_data import ScrapedData
+from services.scrape_cache import normalize_url
+
+
+class SubpageCrawler:
+    """同一サイト内の関連ページ（グッズ一覧・ノベルティ・会場案内等）を並行して取得し、1件のScrapedDataにまとめる
+
+    リンクはスクレイピング時に関連度で採点済みのもの（metadata['subpage_links']）を使い、
+    深さ・ページ数・時間の上限内で静的スクレイピングする。
+    """
+
+    def __init__(
+        self,
+        max_depth: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        min_score: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        if enabled is None:
+            enabled = os.getenv('SUBPAGE_CRAWL_ENABLED', 'false').lower() == 'true'
+        self.enabled = enabled
+        self.max_depth = max_depth or int(os.getenv('SUBPAGE_CRAWL_MAX_DEPTH', '1'))
+        self.max_pages = max_pages or int(os.getenv('SUBPAGE_CRAWL_MAX_PAGES', '5'))
+        self.time_budget = time_budget or float(os.getenv('SUBPAGE_CRAWL_TIME_BUDGET', '15'))
+        self.max_concurrency = max_concurrency or int(os.getenv('SUBPAGE_CRAWL_CONCURRENCY', '4'))
+        self.min_score = min_score if min_score is not None else int(os.getenv('SUBPAGE_CRAWL_MIN_SCORE', '2'))
+
+        self._stats = {
+            'crawls': 0,
+            'pages_fetched': 0,
+            'pages_failed': 0,
+            'budget_exhausted': 0,
+        }
+
+    async def crawl(self, scraper, root: ScrapedData) -> ScrapedData:
+        """rootから関連ページをたどり、本文・画像を統合したScrapedDataを返す（rootは変更しない）"""
+        self._stats['crawls'] += 1
+        root_url = root.url or root.metadata.get('source_url', '')
+        deadline = time.monotonic() + self.time_budget
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        visited: Set[str] = {normalize_url(root_url)}
+        subpages: List[Dict[str, Any]] = []
+        frontier = self._next_links(root, 1, visited)
+
+        while frontier and len(subpages) < self.max_pages:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats['budget_exhausted'] += 1
+                break
+
+            batch = frontier[:self.max_pages - len(subpages)]
+            tasks = [asyncio.create_task(self._fetch(scraper, link, semaphore)) for link in batch]
+            done, pending = await asyncio.wait(tasks, timeout=remaining)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._stats['budget_exhausted'] += 1
+
+            # 上限で取得しなかったリンクは次の回に回す
+            frontier = frontier[len(batch):]
+            # 採点順を保つため、完了順ではなくリンク順に取り出す
+            for link, task in zip(batch, tasks):
+                if task not in done or task.cancelled() or task.exception() is not None:
+                    continue
+                data = task.result()
+                if data is None:
+                    continue
+                subpages.append({**link, 'data': data})
+                if link['depth'] < self.max_depth:
+                    frontier.extend(self._next_links(data, link['depth'] + 1, visited))
+            frontier.sort(key=lambda item: (item['depth'], -item['score']))
+            if pending:
+                break
+
+        merged = self._merge(root, root_url, subpages)
+        if subpages:
+            print(f"関連ページを統合: {len(subpages)}ページ")
+            # 関連ページの画像も含めて実寸による選別と重複除去をやり直す
+            await scraper._finalize_images(merged)
+            provenance = merged.metadata['provenance']
+            provenance['images'] = {
+                image_url: provenance['images'].get(image_url, root_url) for image_url in merged.images
+            }
+        return merged
+
+    def _next_links(self, data: ScrapedData, depth: int, visited: Set[str]) -> List[Dict[str, Any]]:
+        """未訪問で関連度が基準以上のリンク"""
+        links = []
+        for link in data.metadata.get('subpage_links', []):
+            key = normalize_url(link['url'])
+            if link['score'] < self.min_score or key in visited:
+                continue
+            visited.add(key)
+            links.append({'url': link['url'], 'text': link.get('text', ''), 'score': link['score'], 'depth': depth})
+        return links
+
+    async def _fetch(self, scraper, link: Dict[str, Any], semaphore: asyncio.Semaphore) -> Optional[ScrapedData]:
+        """関連ページを静的スクレイピング（失敗時はNone）"""
+        async with semaphore:
+            try:
+                data = await scraper._static_scrape(link['url'])
+            except Exception as e:
+                print(f"関連ページ取得エラー: {link['url']} ({e})")
+                data = None
+
+        if data is None or not data.url:
+            self._stats['pages_failed'] += 1
+            return None
+        self._stats['pages_fetched'] += 1
+        return data
+
+    def _merge(self, root: ScrapedData, root_url: str, subpages: List[Dict[str, Any]]) -> ScrapedData:
+        """本文・画像・構造化データを統合し、各項目の取得元をmetadata['provenance']に記録"""
+        image_sources = {image_url: root_url for image_url in root.images}
+        images = list(root.images)
+        text_parts = [root.text_content or '']
+        structured_data = root.structured_data
+        pages = []
+
+        for page in subpages:
+            data: ScrapedData = page['data']
+            for image_url in data.images:
+                if image_url not in image_sources:
+                    image_sources[image_url] = data.url
+                    images.append(image_url)
+
+            if data.text_content:
+                text_parts.append(f"【関連ページ: {data.title or page['text']}（{data.url}）】\n{data.text_content}")
+
+            if data.structured_data is not None:
+                if structured_data is None:
+                    structured_data = data.structured_data
+                else:
+                    structured_data = structured_data.copy(update={
+                        'products': structured_data.products + [
+                            product for product in data.structured_data.products
+                            if product not in structured_data.products
+                        ]
+                    })
+
+            pages.append({
+                'url': data.url,
+                'title': data.title,
+                'link_text': page['text'],
+                'score': page['score'],
+                'depth': page['depth'],
+                'text_chars': len(data.text_content or ''),
+                'images': len(data.images),
+            })
+
+        metadata = {
+            **root.metadata,
+            'subpages_crawled': True,
+            'provenance': {
+                'text': [root_url] + [page['url'] for page in pages if page['text_chars']],
+                'images': image_sources,
+                'subpages': pages,
+            },
+        }
+        return ScrapedData(
+            url=root.url,
+            title=root.title,
+            description=root.description,
+            images=images,
+            text_content='\n\n'.join(part for part in text_parts if part),
+            metadata=metadata,
+            structured_data=structured_data
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """関連ページ取得の統計情報"""
+        return {
+            **self._stats,
+            'enabled': self.enabled,
+            'max_depth': self.max_depth,
+            'max_pages': self.max_pages,
+        }
+
+
+_shared_crawler: Optional[SubpageCrawler] = None
+
+
+def get_subpage_crawler() -> SubpageCrawler:
+    """プロセス内で共有するSubpageCrawlerを取得"""
+    global _shared_crawler
+    if _shared_crawler is None:
+        _shared_crawler = SubpageCrawler()
+    return _shared_crawler